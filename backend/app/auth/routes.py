@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, Body
-from app.database import users_collection, style_quizzes_collection
+from fastapi.concurrency import run_in_threadpool
+from app.repository import repo
 from app.auth.dependencies import get_current_user_id
+from app.services.quota_service import get_week_usage, next_week_start
 from app.models.user import User, UserCreate, Token, UserLogin, GoogleAuthRequest
 from app.auth.auth_utils import create_access_token, verify_password, hash_password
 from app.services.google_auth_service import google_auth_service
@@ -22,7 +24,7 @@ def validate_username_format(username: str) -> bool:
     return bool(re.match(username_regex, username))
 
 @router.post("/register", response_model=Token)
-def register(user: UserCreate):
+async def register(user: UserCreate):
     # Validate email format
     if not validate_email_format(user.email):
         raise HTTPException(status_code=400, detail="Invalid email format")
@@ -31,13 +33,13 @@ def register(user: UserCreate):
     if not validate_username_format(user.username):
         raise HTTPException(status_code=400, detail="Invalid username format. Username must be 3-30 characters and contain only letters, numbers, and underscores")
     
-    if users_collection.find_one({"email": user.email}):
+    if await repo.users_collection.find_one({"email": user.email}):
         raise HTTPException(status_code=400, detail="Email already registered")
-    if users_collection.find_one({"username": user.username}):
+    if await repo.users_collection.find_one({"username": user.username}):
         raise HTTPException(status_code=400, detail="Username already taken")
     
     user_dict = user.model_dump()
-    user_dict["password"] = hash_password(user.password)  # Hash the password
+    user_dict["password"] = await run_in_threadpool(hash_password, user.password)  # Hash the password (bcrypt is CPU-bound)
     user_dict["followers"] = []
     user_dict["following"] = []
     # Initialize subscription fields for new users
@@ -49,7 +51,7 @@ def register(user: UserCreate):
     user_dict["stripe_customer_id"] = None
     user_dict["auth_provider"] = "email"
     
-    result = users_collection.insert_one(user_dict)
+    result = await repo.users_collection.insert_one(user_dict)
     user_dict["id"] = str(result.inserted_id)
     
     # Create initial style quiz for the new user
@@ -60,7 +62,7 @@ def register(user: UserCreate):
         "created_at": datetime.utcnow(),
         "completed_at": None
     }
-    style_quizzes_collection.insert_one(quiz)
+    await repo.style_quizzes_collection.insert_one(quiz)
     
     token = create_access_token({"sub": user.email})
     return {
@@ -71,17 +73,17 @@ def register(user: UserCreate):
     }
 
 @router.post("/login", response_model=Token)
-def login(user: UserLogin):
+async def login(user: UserLogin):
     # Validate email format
     if not validate_email_format(user.email):
         raise HTTPException(status_code=400, detail="Invalid email format")
     
-    user_data = users_collection.find_one({"email": user.email})
-    if not user_data or not verify_password(user.password, user_data["password"]):
+    user_data = await repo.users_collection.find_one({"email": user.email})
+    if not user_data or not await run_in_threadpool(verify_password, user.password, user_data["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Check if user has completed their style quiz
-    quiz = style_quizzes_collection.find_one({"user_id": user.email})
+    quiz = await repo.style_quizzes_collection.find_one({"user_id": user.email})
     needs_quiz = not quiz or not quiz.get("completed", False)
     
     token = create_access_token({"sub": user.email})
@@ -122,9 +124,9 @@ def get_google_auth_url():
     return {"auth_url": auth_url}
 
 @router.post("/refresh")
-def refresh_token(user_id: str = Depends(get_current_user_id)):
+async def refresh_token(user_id: str = Depends(get_current_user_id)):
     """Refresh the access token"""
-    user_data = users_collection.find_one({"email": user_id})
+    user_data = await repo.users_collection.find_one({"email": user_id})
     if not user_data:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -136,13 +138,13 @@ def refresh_token(user_id: str = Depends(get_current_user_id)):
     }
 
 @router.get("/me", response_model=User)
-def get_current_user(user_id: str = Depends(get_current_user_id)):
-    user = users_collection.find_one({"email": user_id})
+async def get_current_user(user_id: str = Depends(get_current_user_id)):
+    user = await repo.users_collection.find_one({"email": user_id})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Check if user has completed their style quiz
-    quiz = style_quizzes_collection.find_one({"user_id": user_id})
+    quiz = await repo.style_quizzes_collection.find_one({"user_id": user_id})
     needs_quiz = not quiz or not quiz.get("completed", False)
     
     # Convert MongoDB user to User model
@@ -161,8 +163,8 @@ def get_current_user(user_id: str = Depends(get_current_user_id)):
         subscription_status=user.get("subscription_status", "free"),
         subscription_tier=user.get("subscription_tier"),
         subscription_end_date=user.get("subscription_end_date"),
-        weekly_uploads_used=user.get("weekly_uploads_used", 0),
-        weekly_uploads_reset_date=user.get("weekly_uploads_reset_date"),
+        weekly_uploads_used=get_week_usage(user, "uploads"),
+        weekly_uploads_reset_date=next_week_start(),
         stripe_customer_id=user.get("stripe_customer_id"),
         pending_cancellation=user.get("pending_cancellation", False)
     )
@@ -12,6 +12,22 @@ class Settings:
     # MongoDB
     MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
     MONGO_DB = os.getenv("MONGO_DB", "openfashion_db")
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+    # Apply the index registry (app.indexes) when the API starts; disable to run apply_indexes.py instead
+    APPLY_INDEXES_ON_STARTUP = os.getenv("APPLY_INDEXES_ON_STARTUP", "true").lower() == "true"
+    # Opt-in: when set, a TTL index deletes analysis jobs (existing history included) this long after
+    # creation. 0 keeps jobs forever.
+    ANALYSIS_JOB_TTL_SECONDS = int(os.getenv("ANALYSIS_JOB_TTL_SECONDS", 0))
+    # Write-behind buffer for user_interactions
+    INTERACTION_BATCH_SIZE = int(os.getenv("INTERACTION_BATCH_SIZE", 100))
+    INTERACTION_FLUSH_INTERVAL_SECONDS = float(os.getenv("INTERACTION_FLUSH_INTERVAL_SECONDS", 2))
+    INTERACTION_SPILL_DIR = os.getenv("INTERACTION_SPILL_DIR", "spill")
+    # Tracked interactions trigger at most one style profile recompute per user per window
+    STYLE_PROFILE_RECOMPUTE_WINDOW_SECONDS = float(os.getenv("STYLE_PROFILE_RECOMPUTE_WINDOW_SECONDS", 30))
+
+    # Closet category pages (GET /api/closet/category/{name})
+    CLOSET_PAGE_SIZE = int(os.getenv("CLOSET_PAGE_SIZE", 24))
+    CLOSET_MAX_PAGE_SIZE = int(os.getenv("CLOSET_MAX_PAGE_SIZE", 100))
 
     # S3
     S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "openfashion-user-closets")
@@ -24,9 +40,55 @@ class Settings:
     # SerpAPI
     SERP_API_KEY = os.getenv("SERP_API_KEY")
 
+    # Shopping result cache (seconds)
+    SHOPPING_CACHE_TTL_SECONDS = int(os.getenv("SHOPPING_CACHE_TTL_SECONDS", 900))
+    # Concurrent SerpAPI lookups when warming shopping results for discovery queries
+    SEARCH_WARM_CONCURRENCY = int(os.getenv("SEARCH_WARM_CONCURRENCY", 5))
+
     # OpenAI
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+    # GPT search query rewrite cache (seconds)
+    QUERY_REWRITE_CACHE_TTL_SECONDS = int(os.getenv("QUERY_REWRITE_CACHE_TTL_SECONDS", 86400))
+
+    # Precomputed search suggestions are regenerated in the background after this age (seconds)
+    SEARCH_SUGGESTIONS_MAX_AGE_SECONDS = int(os.getenv("SEARCH_SUGGESTIONS_MAX_AGE_SECONDS", 7 * 86400))
+
+    # Stored For You recommendations are regenerated when the top style categories change, after this many
+    # new interactions, or once older than the max age (seconds)
+    FOR_YOU_REFRESH_INTERACTIONS = int(os.getenv("FOR_YOU_REFRESH_INTERACTIONS", 20))
+    FOR_YOU_MAX_AGE_SECONDS = int(os.getenv("FOR_YOU_MAX_AGE_SECONDS", 86400))
+
+    # Per-user style context snapshots are invalidated on profile/quiz writes; the TTL bounds staleness otherwise
+    STYLE_CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("STYLE_CONTEXT_CACHE_TTL_SECONDS", 600))
+
+    # Chat sessions: rolling window of turns kept on the session document, and in-process cache lifetime
+    CHAT_SESSION_MAX_TURNS = int(os.getenv("CHAT_SESSION_MAX_TURNS", 20))
+    CHAT_SESSION_CACHE_TTL_SECONDS = int(os.getenv("CHAT_SESSION_CACHE_TTL_SECONDS", 1800))
+    # Older turns are folded into a rolling summary once the history exceeds this many (estimated) tokens
+    CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", 800))
+    CHAT_RECENT_TURNS = int(os.getenv("CHAT_RECENT_TURNS", 3))
+
+    # External provider resilience (deadlines, circuit breakers, hedged requests)
+    SERPAPI_TIMEOUT_SECONDS = float(os.getenv("SERPAPI_TIMEOUT_SECONDS", 15))
+    OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", 30))
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5))
+    CIRCUIT_BREAKER_RECOVERY_SECONDS = float(os.getenv("CIRCUIT_BREAKER_RECOVERY_SECONDS", 30))
+    SERPAPI_HEDGE_ENABLED = os.getenv("SERPAPI_HEDGE_ENABLED", "false").lower() == "true"
+    OPENAI_HEDGE_ENABLED = os.getenv("OPENAI_HEDGE_ENABLED", "false").lower() == "true"
+    PROVIDER_THREAD_POOL_SIZE = int(os.getenv("PROVIDER_THREAD_POOL_SIZE", 32))
+
+    # GET /api/metrics/ requires this token in the X-Metrics-Token header; unset disables the endpoint
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+    # LLM gateway: shared OpenAI clients, concurrency limits and retries
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+    LLM_MAX_CONCURRENCY_PER_CALL_SITE = int(os.getenv("LLM_MAX_CONCURRENCY_PER_CALL_SITE", 8))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+    LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", 0.5))
+    LLM_RETRY_MAX_DELAY_SECONDS = float(os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", 4))
+    LLM_CONNECTION_POOL_SIZE = int(os.getenv("LLM_CONNECTION_POOL_SIZE", 32))
+
     # Hugging Face
     HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
     
@@ -229,4 +229,7 @@ STYLE_QUIZ_QUESTIONS = [
         ],
         "type": "multiple_choice"
     }
-]
\ No newline at end of file
+]
+
+# Question lookup by id, used to validate submitted responses
+QUESTIONS_BY_ID = {question["id"]: question for question in STYLE_QUIZ_QUESTIONS}
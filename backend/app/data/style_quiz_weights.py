@@ -0,0 +1,73 @@
+# How much each quiz answer counts toward each style category, keyed by question id and
+# then by the option text in STYLE_QUIZ_QUESTIONS. Picking a primary style is the strongest
+# signal (1.0); the other questions nudge categories up by 0.1–0.5.
+STYLE_CATEGORIES = [
+    "minimalist", "streetwear", "casual chic", "bohemian", "athletic",
+    "vintage", "avant-garde", "preppy", "eclectic"
+]
+
+QUIZ_STYLE_WEIGHTS = {
+    "primary_style": {
+        "Minimalist": {"minimalist": 1.0},
+        "Streetwear": {"streetwear": 1.0},
+        "Casual Chic": {"casual chic": 1.0},
+        "Bohemian": {"bohemian": 1.0},
+        "Athletic / Sporty": {"athletic": 1.0},
+        "Vintage / Retro": {"vintage": 1.0},
+        "High Fashion / Avant-Garde": {"avant-garde": 1.0},
+        "Preppy / Classic": {"preppy": 1.0},
+        "Eclectic / Experimental": {"eclectic": 1.0},
+    },
+    "silhouette_preference": {
+        "Tailored & structured": {"preppy": 0.4, "minimalist": 0.3, "avant-garde": 0.1},
+        "Oversized & relaxed": {"streetwear": 0.4, "casual chic": 0.2, "athletic": 0.1},
+        "Form-fitting & body-conscious": {"athletic": 0.3, "avant-garde": 0.2, "casual chic": 0.2},
+        "Flowy & drapey": {"bohemian": 0.5, "casual chic": 0.1},
+        "Layered & textured": {"eclectic": 0.3, "vintage": 0.2, "bohemian": 0.2, "streetwear": 0.1},
+        "Monochrome block shapes": {"minimalist": 0.4, "avant-garde": 0.3},
+    },
+    "color_palette": {
+        "Neutrals (black, white, gray, beige)": {"minimalist": 0.4, "casual chic": 0.2, "preppy": 0.1},
+        "Bold primaries (red, blue, yellow)": {"streetwear": 0.3, "eclectic": 0.3},
+        "Soft pastels (pink, mint, lavender)": {"casual chic": 0.3, "preppy": 0.1, "bohemian": 0.1},
+        "Earth tones (olive, brown, rust)": {"bohemian": 0.4, "vintage": 0.3},
+        "Jewel tones (emerald, sapphire, ruby)": {"avant-garde": 0.3, "vintage": 0.2, "eclectic": 0.1},
+        "High-contrast (black & white only)": {"minimalist": 0.3, "avant-garde": 0.3, "streetwear": 0.1},
+    },
+    "pattern_prints": {
+        "All-over bold prints (florals, geometrics)": {"eclectic": 0.4, "bohemian": 0.3},
+        "Subtle textures (pinstripes, tweed)": {"preppy": 0.4, "vintage": 0.2},
+        "Graphic logos & slogans": {"streetwear": 0.5},
+        "Color-blocking": {"athletic": 0.2, "eclectic": 0.2, "streetwear": 0.1},
+        "I prefer solids only": {"minimalist": 0.5},
+    },
+    "material_preference": {
+        "Breathable cotton / linen": {"casual chic": 0.2, "bohemian": 0.2, "minimalist": 0.1},
+        "Stretchy knits / jersey": {"athletic": 0.2, "casual chic": 0.2},
+        "Denim / canvas": {"streetwear": 0.2, "vintage": 0.2, "casual chic": 0.1},
+        "Silk / satin": {"avant-garde": 0.3, "casual chic": 0.1},
+        "Leather / faux leather": {"avant-garde": 0.2, "streetwear": 0.2, "vintage": 0.1},
+        "Technical / performance fabrics": {"athletic": 0.5},
+    },
+    "comfort_vs_style": {
+        "1": {"avant-garde": 0.3},
+        "2": {"avant-garde": 0.1, "preppy": 0.1},
+        "3": {"casual chic": 0.1},
+        "4": {"casual chic": 0.2, "athletic": 0.1},
+        "5": {"athletic": 0.3, "casual chic": 0.2},
+    },
+    "brand_loyalty": {
+        "I chase new emerging labels": {"avant-garde": 0.2, "eclectic": 0.2},
+        "I prefer sustainable / ethical brands": {"minimalist": 0.1, "bohemian": 0.1},
+    },
+    "event_focus": {
+        "Everyday casual": {"casual chic": 0.3, "streetwear": 0.1},
+        "Work / Professional": {"preppy": 0.3, "minimalist": 0.2},
+        "Night out / Social": {"avant-garde": 0.2, "eclectic": 0.1},
+        "Athletic / Active": {"athletic": 0.4},
+        "Special events (weddings, parties)": {"avant-garde": 0.2, "preppy": 0.1},
+    },
+    "fit_pic_importance": {
+        "Very important": {"avant-garde": 0.2, "streetwear": 0.2},
+    },
+}
@@ -0,0 +1,221 @@
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from pymongo.errors import OperationFailure
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+INDEX_NOT_FOUND = 27
+
+
+class IndexSpec:
+    """One index in the registry. Names follow MongoDB's default (e.g. "user_id_1_created_at_-1")."""
+
+    def __init__(
+        self,
+        keys: Sequence[Tuple[str, int]],
+        unique: bool = False,
+        sparse: bool = False,
+        expire_after_seconds: Optional[int] = None,
+    ):
+        self.keys = [(field, int(direction)) for field, direction in keys]
+        self.unique = unique
+        self.sparse = sparse
+        self.expire_after_seconds = expire_after_seconds
+
+    @property
+    def name(self) -> str:
+        return "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+    @property
+    def options(self) -> Dict[str, Any]:
+        options: Dict[str, Any] = {}
+        if self.unique:
+            options["unique"] = True
+        if self.sparse:
+            options["sparse"] = True
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        return options
+
+    def matches(self, info: Dict[str, Any]) -> bool:
+        """True if an existing index (from index_information()) has the same keys and options."""
+        return self.matches_except_ttl(info) and info.get("expireAfterSeconds") == self.expire_after_seconds
+
+    def matches_except_ttl(self, info: Dict[str, Any]) -> bool:
+        """True if only expireAfterSeconds (if anything) differs, which collMod can change in place."""
+        keys = [(field, int(direction)) for field, direction in info.get("key", [])]
+        return (
+            keys == self.keys
+            and bool(info.get("unique")) == self.unique
+            and bool(info.get("sparse")) == self.sparse
+        )
+
+
+# Collection name -> indexes it should have. Anything else found on a collection (apart from _id)
+# is reported as unmanaged but left in place.
+INDEXES: Dict[str, List[IndexSpec]] = {
+    "users": [
+        IndexSpec([("email", 1)], unique=True),
+        IndexSpec([("username", 1)], unique=True),
+        IndexSpec([("stripe_customer_id", 1)]),
+    ],
+    "closets": [
+        # Closet preview and category pages
+        IndexSpec([("user_id", 1), ("category", 1), ("_id", 1)]),
+    ],
+    "wishlists": [
+        IndexSpec([("user_id", 1)]),
+        IndexSpec([("tags", 1)]),
+        IndexSpec([("category", 1)]),
+    ],
+    "style_profiles": [
+        IndexSpec([("user_id", 1)]),
+    ],
+    "user_interactions": [
+        # Recent interactions per user, newest first
+        IndexSpec([("user_id", 1), ("created_at", -1)]),
+        IndexSpec([("interaction_type", 1)]),
+    ],
+    "style_quizzes": [
+        IndexSpec([("user_id", 1)]),
+    ],
+    "outfit_posts": [
+        IndexSpec([("user_id", 1), ("timestamp", -1)]),
+    ],
+    "analysis_jobs": [
+        IndexSpec([("job_id", 1)], unique=True),
+        IndexSpec([("user_id", 1), ("created_at", -1)]),
+        IndexSpec([("status", 1)]),
+        # Jobs only expire if ANALYSIS_JOB_TTL_SECONDS is set (opt-in: it also deletes existing history)
+        IndexSpec([("created_at", 1)], expire_after_seconds=settings.ANALYSIS_JOB_TTL_SECONDS or None),
+    ],
+    # One document per user
+    "chat_sessions": [IndexSpec([("user_id", 1)], unique=True)],
+    "chat_insights": [IndexSpec([("user_id", 1)], unique=True)],
+    "for_you_recommendations": [IndexSpec([("user_id", 1)], unique=True)],
+}
+
+# Representative filters (and sorts) for the queries made on every request; check_query_plans
+# warns when one of them is planned as a collection scan.
+HOT_QUERIES: List[Tuple[str, Dict[str, Any], Optional[List[Tuple[str, int]]]]] = [
+    ("users", {"email": ""}, None),
+    ("users", {"username": ""}, None),
+    ("users", {"stripe_customer_id": ""}, None),
+    ("closets", {"user_id": "", "category": ""}, [("_id", 1)]),
+    ("wishlists", {"user_id": ""}, None),
+    ("style_profiles", {"user_id": ""}, None),
+    ("style_quizzes", {"user_id": "", "completed": True}, None),
+    ("user_interactions", {"user_id": ""}, [("created_at", -1)]),
+    ("outfit_posts", {"user_id": ""}, [("timestamp", -1)]),
+    ("analysis_jobs", {"job_id": ""}, None),
+    ("analysis_jobs", {"user_id": ""}, [("created_at", -1)]),
+    ("chat_sessions", {"user_id": ""}, None),
+    ("chat_insights", {"user_id": ""}, None),
+    ("for_you_recommendations", {"user_id": ""}, None),
+]
+
+
+def _get_database(database):
+    if database is None:
+        from app.database import db
+        return db
+    return database
+
+
+def _apply_index(database, collection_name: str, spec: IndexSpec, info: Optional[Dict[str, Any]], rebuild: bool) -> str:
+    collection = database[collection_name]
+    if info is None:
+        collection.create_index(spec.keys, name=spec.name, **spec.options)
+        return "created"
+    if spec.matches(info):
+        return "unchanged"
+    if spec.matches_except_ttl(info) and spec.expire_after_seconds is not None:
+        # Change the TTL in place; the index stays usable throughout
+        database.command("collMod", collection_name, index={"name": spec.name, "expireAfterSeconds": spec.expire_after_seconds})
+        return "updated"
+    if not rebuild:
+        # Dropping leaves queries without the index until it is rebuilt, so that is left to apply_indexes.py --rebuild
+        logger.warning(f"Index {collection_name}.{spec.name} differs from the registry; run apply_indexes.py --rebuild")
+        return "mismatched"
+    try:
+        collection.drop_index(spec.name)
+    except OperationFailure as e:
+        # Another process dropped it first
+        if e.code != INDEX_NOT_FOUND:
+            raise
+    collection.create_index(spec.keys, name=spec.name, **spec.options)
+    return "rebuilt"
+
+
+def apply_indexes(database=None, rebuild: bool = False) -> List[Dict[str, str]]:
+    """
+    Bring every collection's indexes in line with INDEXES. Missing indexes are created and TTL
+    changes are applied in place with collMod. Indexes whose keys or other options differ are
+    only dropped and rebuilt with rebuild=True. Returns one entry per index with its action:
+    "created", "updated", "rebuilt", "unchanged", "mismatched" (left as is), "unmanaged" (present
+    but not in the registry) or "failed" (with "error"). A failure does not stop the other indexes,
+    so concurrent workers racing on the same index cannot abort startup.
+    """
+    database = _get_database(database)
+    report = []
+    for collection_name, specs in INDEXES.items():
+        try:
+            existing = database[collection_name].index_information()
+        except OperationFailure as e:
+            logger.error(f"Could not read indexes of {collection_name}: {e}")
+            report.extend({"collection": collection_name, "index": spec.name, "action": "failed", "error": str(e)} for spec in specs)
+            continue
+        for spec in specs:
+            entry = {"collection": collection_name, "index": spec.name}
+            try:
+                entry["action"] = _apply_index(database, collection_name, spec, existing.get(spec.name), rebuild)
+            except OperationFailure as e:
+                logger.error(f"Index {collection_name}.{spec.name} could not be applied: {e}")
+                entry.update(action="failed", error=str(e))
+            if entry["action"] in ("created", "updated", "rebuilt"):
+                logger.info(f"Index {collection_name}.{spec.name} {entry['action']}")
+            report.append(entry)
+
+        managed = {spec.name for spec in specs}
+        for name in existing:
+            if name != "_id_" and name not in managed:
+                logger.warning(f"Index {collection_name}.{name} is not in the index registry")
+                report.append({"collection": collection_name, "index": name, "action": "unmanaged"})
+    return report
+
+
+def _plan_stages(plan: Dict[str, Any]) -> Iterator[str]:
+    yield plan.get("stage", "")
+    for child in plan.get("inputStages", []) + [plan[key] for key in ("inputStage", "queryPlan") if key in plan]:
+        yield from _plan_stages(child)
+
+
+def check_query_plans(database=None) -> List[Dict[str, Any]]:
+    """Explain each HOT_QUERIES entry and warn about the ones that would scan the whole collection."""
+    database = _get_database(database)
+    collection_scans = []
+    for collection_name, query, sort in HOT_QUERIES:
+        cursor = database[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        except Exception as e:
+            logger.debug(f"Could not explain query on {collection_name}: {e}")
+            continue
+        if "COLLSCAN" in _plan_stages(plan):
+            logger.warning(f"Query {query} on {collection_name} (sort {sort}) runs as a collection scan")
+            collection_scans.append({"collection": collection_name, "query": query, "sort": sort})
+    return collection_scans
+
+
+def ensure_indexes(database=None) -> List[Dict[str, str]]:
+    """Startup step: apply the registry, log a summary of what changed and check hot query plans."""
+    report = apply_indexes(database)
+    changed = sum(entry["action"] in ("created", "updated") for entry in report)
+    failed = sum(entry["action"] == "failed" for entry in report)
+    mismatched = sum(entry["action"] == "mismatched" for entry in report)
+    logger.info(f"Indexes applied: {changed} changed, {mismatched} mismatched, {failed} failed")
+    check_query_plans(database)
+    return report
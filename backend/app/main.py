@@ -1,21 +1,36 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
-from app.routes import upload, closet, wishlist, fashion_search
+from app.routes import upload, closet, wishlist, fashion_search, metrics
 from app.auth.routes import router as auth_router
 from app.routes.users import router as users_router
 from app.routes.subscription import router as subscription_router
 from app.routers.style_quiz import router as style_quiz_router
+from app.config.settings import settings
+from app.indexes import ensure_indexes
+from app.repository import close_repository
+from app.services.interaction_writer import interaction_writer
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
 
-app = FastAPI(title="OpenFashion API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.APPLY_INDEXES_ON_STARTUP:
+        await asyncio.to_thread(ensure_indexes)
+    interaction_writer.start()
+    yield
+    await interaction_writer.stop()
+    await close_repository()
+
+app = FastAPI(title="OpenFashion API", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -42,6 +57,7 @@ app.include_router(
 app.include_router(
     fashion_search.router, prefix="/api/fashion", tags=["Fashion Search"]
 )  # Fashion Search
+app.include_router(metrics.router, prefix="/api/metrics", tags=["Metrics"])  # Metrics
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
 
@@ -16,6 +16,7 @@ class ClosetItem(BaseModel):
     price: str
     link: str
     thumbnail: str
+    color: Optional[str] = None  # Dominant color as hex, e.g. "#1f2a44"
     notes: Optional[str] = None
 
     class Config:
@@ -0,0 +1,107 @@
+from typing import Any, Dict, List, Optional
+from pymongo import AsyncMongoClient
+from app.config.settings import settings
+
+# Attribute name -> collection name, matching app.database
+COLLECTIONS = {
+    "users_collection": "users",
+    "closets_collection": "closets",
+    "wishlist_collection": "wishlists",
+    "style_profiles_collection": "style_profiles",
+    "user_interactions_collection": "user_interactions",
+    "style_quizzes_collection": "style_quizzes",
+    "outfit_posts_collection": "outfit_posts",
+    "analysis_jobs_collection": "analysis_jobs",
+    "chat_sessions_collection": "chat_sessions",
+    "chat_insights_collection": "chat_insights",
+    "for_you_recommendations_collection": "for_you_recommendations",
+}
+
+
+class Repository:
+    """
+    Async access to the app's collections under the same attribute names as app.database,
+    e.g. `await repo.users_collection.find_one(...)`. Indexes are managed by app.indexes.
+    """
+
+    def __init__(self, database):
+        self.use_database(database)
+
+    def use_database(self, database) -> None:
+        """Point every collection at another database (tests pass a MongomockAsyncDatabase)."""
+        self.database = database
+        for attr, name in COLLECTIONS.items():
+            setattr(self, attr, database[name])
+
+
+class MongomockAsyncCursor:
+    """Awaitable facade over a synchronous (mongomock or pymongo) cursor."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs) -> "MongomockAsyncCursor":
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count: int) -> "MongomockAsyncCursor":
+        self._cursor = self._cursor.skip(count)
+        return self
+
+    def limit(self, count: int) -> "MongomockAsyncCursor":
+        self._cursor = self._cursor.limit(count)
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        docs = list(self._cursor)
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        try:
+            return next(self._cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class MongomockAsyncCollection:
+    """
+    Async collection backed by a synchronous one, mirroring PyMongo's async API:
+    `find` returns a cursor synchronously, every other method is awaited.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, *args, **kwargs) -> MongomockAsyncCursor:
+        return MongomockAsyncCursor(self._collection.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline, **kwargs) -> MongomockAsyncCursor:
+        return MongomockAsyncCursor(iter(list(self._collection.aggregate(pipeline, **kwargs))))
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class MongomockAsyncDatabase:
+    """Wraps a mongomock database so the repository can run without a server in tests."""
+
+    def __init__(self, database):
+        self._database = database
+
+    def __getitem__(self, name: str) -> MongomockAsyncCollection:
+        return MongomockAsyncCollection(self._database[name])
+
+
+client = AsyncMongoClient(settings.MONGO_URI, maxPoolSize=settings.MONGO_MAX_POOL_SIZE)
+repo = Repository(client[settings.MONGO_DB])
+
+
+async def close_repository() -> None:
+    await client.close()
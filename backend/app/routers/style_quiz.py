@@ -1,32 +1,36 @@
 import logging
-import openai
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List, Optional
-from models.user_models import StyleQuiz, StyleQuizResponse, UserStyleProfile, UserInteraction, SubmitQuizResponseRequest
+from models.user_models import StyleQuiz, StyleQuizResponse, UserStyleProfile, UserInteraction, SubmitQuizResponseRequest, BulkQuizSubmitRequest
 from uuid import UUID, uuid4
 from bson import ObjectId
-from app.database import style_profiles_collection, user_interactions_collection, style_quizzes_collection
+from app.repository import repo
 from app.auth.dependencies import get_current_user_id
-from app.data.style_quiz_questions import STYLE_QUIZ_QUESTIONS
-import json
-from openai import AsyncOpenAI
+from app.data.style_quiz_questions import STYLE_QUIZ_QUESTIONS, QUESTIONS_BY_ID
 from app.config.settings import settings
+from app.services.background_service import debounce, spawn
+from app.services.for_you_service import get_for_you_recommendations, schedule_for_you_refresh
+from app.services.interaction_writer import get_recent_interactions, interaction_writer
+from app.services.llm_gateway import create_response
+from app.services.profile_events import notify_style_profile_changed
+from app.services.search_query_service import get_search_queries
+from app.services.style_scorer import local_style_summary, score_style_preferences
+from app.services.user_context_service import get_style_context, invalidate_style_context
+import json
 from datetime import datetime
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client with API key from settings
-client = AsyncOpenAI(
-    api_key=settings.OPENAI_API_KEY,
-)
+# Bulk submissions re-read and retry this many times when answers land concurrently
+QUIZ_UPDATE_ATTEMPTS = 3
 
 @router.post("/quiz/start")
 async def start_style_quiz(user_id: str = Depends(get_current_user_id)):
     """Start a new style quiz for a user"""
     # Check if user already has a completed quiz
-    existing_quiz = style_quizzes_collection.find_one({
+    existing_quiz = await repo.style_quizzes_collection.find_one({
         "user_id": user_id,
         "completed": True
     })
@@ -36,9 +40,10 @@ async def start_style_quiz(user_id: str = Depends(get_current_user_id)):
     quiz = {
         "user_id": user_id,
         "responses": [],
+        "responses_version": 0,
         "completed": False,
     }
-    result = style_quizzes_collection.insert_one(quiz)
+    result = await repo.style_quizzes_collection.insert_one(quiz)
     quiz["id"] = str(result.inserted_id)
     return quiz
 
@@ -61,25 +66,110 @@ async def submit_quiz_response(
     response_dict['id'] = str(full_response.id)
 
     # Validate question exists
-    if not any(q["id"] == full_response.question_id for q in STYLE_QUIZ_QUESTIONS):
+    if full_response.question_id not in QUESTIONS_BY_ID:
         raise HTTPException(status_code=400, detail="Invalid question ID")
 
     # Add response to quiz
-    style_quizzes_collection.update_one(
+    await repo.style_quizzes_collection.update_one(
         {"user_id": user_id, "completed": False},
         {
             "$push": {
                 "responses": response_dict
-            }
+            },
+            "$inc": {"responses_version": 1}
         }
     )
     return full_response
 
+def validate_quiz_response(question_id: str, response) -> Optional[str]:
+    """Check an answer against its question's options; returns an error message or None."""
+    question = QUESTIONS_BY_ID.get(question_id)
+    if question is None:
+        return "Invalid question ID"
+    answers = response if isinstance(response, list) else [response]
+    if question["type"] == "text":
+        return None if isinstance(response, str) else "Expected a text answer"
+    if question["type"] == "multiple_choice" and len(answers) != 1:
+        return "Expected a single choice"
+    if not answers:
+        return "Select at least one option"
+    if len(set(answers)) != len(answers):
+        return "Duplicate options"
+    max_selections = question.get("max_selections", len(question["options"]))
+    if len(answers) > max_selections:
+        return f"Select at most {max_selections} options"
+    invalid = [a for a in answers if a not in question["options"]]
+    if invalid:
+        return f"Invalid option(s): {', '.join(invalid)}"
+    return None
+
+@router.post("/quiz/submit-responses")
+async def submit_quiz_responses(
+    request: BulkQuizSubmitRequest,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Submit any number of quiz answers in one request, optionally completing the quiz too.
+    Answers replace earlier ones for the same questions; everything is validated before writing.
+    """
+    errors = {}
+    seen = set()
+    for r in request.responses:
+        error = "Duplicate question ID" if r.question_id in seen else validate_quiz_response(r.question_id, r.response)
+        seen.add(r.question_id)
+        if error:
+            errors[r.question_id] = error
+    if errors:
+        raise HTTPException(status_code=400, detail={"message": "Invalid quiz responses", "errors": errors})
+
+    new_responses = []
+    for r in request.responses:
+        response_dict = StyleQuizResponse(
+            id=uuid4(), user_id=user_id, question_id=r.question_id, response=r.response
+        ).dict()
+        response_dict['id'] = str(response_dict['id'])
+        new_responses.append(response_dict)
+
+    quiz = await repo.style_quizzes_collection.find_one({"user_id": user_id, "completed": False})
+    if not quiz:
+        raise HTTPException(status_code=404, detail="No active quiz found")
+    # Optimistic concurrency: the merged list is only written if no other answer landed
+    # since it was read (every write to responses bumps responses_version), else re-read and retry
+    for _ in range(QUIZ_UPDATE_ATTEMPTS):
+        responses = [r for r in quiz.get("responses", []) if r.get("question_id") not in seen] + new_responses
+        update = {"responses": responses}
+        if request.complete:
+            update["completed"] = True
+        result = await repo.style_quizzes_collection.update_one(
+            # Quizzes started before the field existed match on None
+            {"_id": quiz["_id"], "completed": False, "responses_version": quiz.get("responses_version")},
+            {"$set": update, "$inc": {"responses_version": 1}}
+        )
+        if result.matched_count:
+            break
+        quiz = await repo.style_quizzes_collection.find_one({"_id": quiz["_id"], "completed": False})
+        if not quiz:
+            raise HTTPException(status_code=409, detail="Quiz was completed by another request")
+    else:
+        raise HTTPException(status_code=409, detail="Quiz is being updated by another request, please retry")
+
+    style_profile = None
+    if request.complete:
+        style_profile = await create_style_profile_from_quiz(user_id, {**quiz, "responses": responses})
+    return {
+        "responses": new_responses,
+        "completed": request.complete,
+        "style_profile": style_profile
+    }
+
 @router.post("/quiz/complete")
 async def complete_style_quiz(user_id: str = Depends(get_current_user_id)):
-    """Complete the style quiz and generate initial style profile"""
+    """
+    Complete the style quiz and create the initial style profile. Preferences are scored locally
+    from the structured answers; the LLM-written summary replaces the template one in the background.
+    """
     # Get the user's quiz
-    quiz = style_quizzes_collection.find_one({
+    quiz = await repo.style_quizzes_collection.find_one({
         "user_id": user_id,
         "completed": False
     })
@@ -87,7 +177,7 @@ async def complete_style_quiz(user_id: str = Depends(get_current_user_id)):
         raise HTTPException(status_code=404, detail="No active quiz found")
     
     # Mark quiz as completed
-    style_quizzes_collection.update_one(
+    await repo.style_quizzes_collection.update_one(
         {"_id": quiz["_id"]},
         {
             "$set": {
@@ -95,12 +185,21 @@ async def complete_style_quiz(user_id: str = Depends(get_current_user_id)):
             }
         }
     )
+    return await create_style_profile_from_quiz(user_id, quiz)
+
+async def create_style_profile_from_quiz(user_id: str, quiz: dict) -> UserStyleProfile:
+    """Score, save and announce the initial style profile for a just-completed quiz."""
+    invalidate_style_context(user_id)
     
-    # Generate style profile using GPT
-    style_profile = await generate_initial_style_profile(quiz)
+    # Score the style profile locally
+    preferences = score_style_preferences(quiz["responses"])
+    style_profile = UserStyleProfile(
+        user_id=user_id,
+        style_summary=local_style_summary(quiz["responses"], preferences),
+        style_preferences=preferences
+    )
     
-    # Log the GPT output
-    logger.info("=== Style Quiz GPT Output ===")
+    logger.info("=== Style Quiz Scored Profile ===")
     logger.info("User ID: %s", user_id)
     logger.info("Quiz Responses:")
     for response in quiz["responses"]:
@@ -124,8 +223,13 @@ async def complete_style_quiz(user_id: str = Depends(get_current_user_id)):
     # Convert UUID id to string before saving to MongoDB
     profile_to_save = style_profile.dict()
     profile_to_save['id'] = str(profile_to_save['id'])
-    result = style_profiles_collection.insert_one(profile_to_save)
+    result = await repo.style_profiles_collection.insert_one(profile_to_save)
     style_profile.id = str(result.inserted_id)
+    await notify_style_profile_changed(user_id)
+    spawn(
+        enrich_style_summary(result.inserted_id, style_profile, quiz["responses"]),
+        "style summary enrichment"
+    )
     
     return style_profile
 
@@ -134,7 +238,10 @@ async def track_user_interaction(
     interaction: UserInteraction,
     user_id: str = Depends(get_current_user_id)
 ):
-    """Track a user interaction and update their style profile"""
+    """
+    Track a user interaction and return the current style profile. The profile is recomputed in
+    the background, at most once per STYLE_PROFILE_RECOMPUTE_WINDOW_SECONDS per user.
+    """
     if interaction.user_id != user_id:
         raise HTTPException(status_code=403, detail="Cannot track interaction for another user")
     
@@ -145,27 +252,33 @@ async def track_user_interaction(
         interaction_dict['id'] = str(interaction_dict['id'])
     if isinstance(interaction_dict.get('item_id'), UUID):
         interaction_dict['item_id'] = str(interaction_dict['item_id'])
-    user_interactions_collection.insert_one(interaction_dict)
+    interaction_dict['created_at'] = datetime.utcnow()
+    interaction_writer.add(interaction_dict)
     
-    # Update style profile
-    updated_profile = await update_style_profile(interaction)
-    return updated_profile
+    profile = await repo.style_profiles_collection.find_one({"user_id": user_id})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Style profile not found")
+    schedule_style_profile_recompute(user_id)
+    return UserStyleProfile(
+        id=str(profile["_id"]),
+        user_id=user_id,
+        style_summary=profile.get("style_summary", ""),
+        style_preferences=profile.get("style_preferences", [])
+    )
 
 @router.get("/for-you/recommendations")
 async def get_recommendations(user_id: str = Depends(get_current_user_id)):
-    """Get personalized recommendations for the user"""
-    # Get user's style profile
-    profile = style_profiles_collection.find_one({"user_id": user_id})
-    if not profile:
+    """
+    Get personalized recommendations for the user. Served from the stored copy (with its
+    generated_at timestamp); regeneration happens in the background.
+    """
+    context = await get_style_context(user_id)
+    if not context.has_profile:
         raise HTTPException(status_code=404, detail="Style profile not found")
-    
-    # Get recent interactions
-    recent_interactions = list(user_interactions_collection.find(
-        {"user_id": user_id}
-    ).sort("created_at", -1).limit(50))
-    
-    # Generate recommendations
-    recommendations = await generate_recommendations(profile, recent_interactions)
+
+    recommendations = await get_for_you_recommendations(user_id)
+    if recommendations is None:
+        raise HTTPException(status_code=500, detail="Error generating recommendations")
     return recommendations
 
 @router.get("/test-gpt-output")
@@ -207,7 +320,7 @@ async def test_gpt_output():
 @router.get("/quiz-status")
 async def get_quiz_status(user_id: str = Depends(get_current_user_id)):
     """Get the current status of the user's style quiz"""
-    quiz = style_quizzes_collection.find_one({"user_id": user_id})
+    quiz = await repo.style_quizzes_collection.find_one({"user_id": user_id})
     if not quiz:
         return {
             "has_quiz": False,
@@ -225,21 +338,23 @@ async def get_quiz_status(user_id: str = Depends(get_current_user_id)):
 async def retake_quiz(user_id: str = Depends(get_current_user_id)):
     """Start a new quiz, invalidating the previous one"""
     # Archive the old quiz if it exists
-    old_quiz = style_quizzes_collection.find_one({"user_id": user_id})
+    old_quiz = await repo.style_quizzes_collection.find_one({"user_id": user_id})
     if old_quiz:
-        style_quizzes_collection.update_one(
+        await repo.style_quizzes_collection.update_one(
             {"_id": old_quiz["_id"]},
             {"$set": {"archived": True}}
         )
+        invalidate_style_context(user_id)
     
     # Create new quiz
     quiz = {
         "user_id": user_id,
         "responses": [],
+        "responses_version": 0,
         "completed": False,
         "archived": False
     }
-    result = style_quizzes_collection.insert_one(quiz)
+    result = await repo.style_quizzes_collection.insert_one(quiz)
     quiz["_id"] = str(result.inserted_id)
     
     return quiz
@@ -252,7 +367,7 @@ async def get_quiz_questions():
 @router.get("/current-quiz")
 async def get_current_quiz(user_id: str = Depends(get_current_user_id)):
     """Get the user's current active quiz"""
-    quiz = style_quizzes_collection.find_one({
+    quiz = await repo.style_quizzes_collection.find_one({
         "user_id": user_id,
         "archived": False
     })
@@ -289,7 +404,8 @@ async def generate_initial_style_profile(quiz: dict) -> UserStyleProfile:
     """
     
     try:
-        response = await client.responses.create(
+        response = await create_response(
+            "quiz.initial_profile",
             model="gpt-4.1",
             input=[
                 {"role": "system", "content": "You are a fashion expert analyzing style preferences. Always respond with valid JSON."},
@@ -324,21 +440,76 @@ async def generate_initial_style_profile(quiz: dict) -> UserStyleProfile:
         logger.error("OpenAI API Error: %s", str(e))
         raise HTTPException(status_code=500, detail=f"Error calling OpenAI API: {str(e)}")
 
-async def update_style_profile(interaction: UserInteraction) -> UserStyleProfile:
-    """Update user's style profile based on new interaction"""
+async def enrich_style_summary(profile_id: ObjectId, style_profile: UserStyleProfile, responses: List[dict]) -> None:
+    """
+    Replace the template summary of a freshly scored profile with an LLM-written one. Skipped if
+    the summary was changed in the meantime (e.g. by a chat or interaction update).
+    """
+    responses_text = "\n".join(
+        f"Q: {r['question_id']}\nA: {r['response']}" for r in responses
+    )
+    preferences_text = ", ".join(
+        f"{p.category} ({p.confidence_score})" for p in style_profile.style_preferences
+    ) or "None scored"
+    prompt = f"""Write a 2-3 sentence style summary for a user, addressed to them as "you".
+It must agree with their scored style categories and reflect their quiz answers.
+
+Scored style categories (confidence): {preferences_text}
+
+Quiz responses:
+{responses_text}
+
+Respond with JSON: {{"style_summary": "string"}}"""
+
+    try:
+        response = await create_response(
+            "quiz.initial_profile",
+            model="gpt-4.1",
+            input=[
+                {"role": "system", "content": "You are a fashion expert analyzing style preferences. Always respond with valid JSON."},
+                {"role": "user", "content": prompt}
+            ]
+        )
+        summary = json.loads(response.output_text)["style_summary"].strip()
+    except Exception as e:
+        logger.error("Style summary enrichment failed for %s: %s", style_profile.user_id, str(e))
+        return
+
+    result = await repo.style_profiles_collection.update_one(
+        {"_id": profile_id, "style_summary": style_profile.style_summary},
+        {"$set": {"style_summary": summary, "updated_at": datetime.utcnow()}}
+    )
+    if result.modified_count:
+        await notify_style_profile_changed(style_profile.user_id)
+
+def schedule_style_profile_recompute(user_id: str) -> None:
+    """Coalesce bursts of tracked interactions into one background profile update."""
+    debounce(
+        ("style_profile_recompute", user_id),
+        lambda: recompute_after_interactions(user_id),
+        settings.STYLE_PROFILE_RECOMPUTE_WINDOW_SECONDS,
+        "style profile recompute"
+    )
+
+async def recompute_after_interactions(user_id: str) -> None:
+    await update_style_profile(user_id)
+    # Enough new interactions can make the For You feed stale even if the profile barely moved
+    schedule_for_you_refresh(user_id)
+
+async def update_style_profile(user_id: str) -> Optional[UserStyleProfile]:
+    """Recompute the user's style profile from their recent interactions (runs in the background)"""
     # Get current profile
-    profile = style_profiles_collection.find_one({"user_id": interaction.user_id})
+    profile = await repo.style_profiles_collection.find_one({"user_id": user_id})
     if not profile:
-        raise HTTPException(status_code=404, detail="Style profile not found")
+        logger.warning("No style profile to update for %s", user_id)
+        return None
     
     # Get recent interactions
-    recent_interactions = list(user_interactions_collection.find(
-        {"user_id": interaction.user_id}
-    ).sort("created_at", -1).limit(50))
+    recent_interactions = await get_recent_interactions(user_id, limit=50)
     
     # Create prompt for GPT
     interactions_text = "\n".join([
-        f"Type: {i['interaction_type']}, Item: {i['item_id']}, Metadata: {i['metadata']}"
+        f"Type: {i['interaction_type']}, Item: {i.get('item_id')}, Metadata: {i.get('metadata', {})}"
         for i in recent_interactions
     ])
 
@@ -368,7 +539,8 @@ async def update_style_profile(interaction: UserInteraction) -> UserStyleProfile
     )
     
     try:
-        response = await client.responses.create(
+        response = await create_response(
+            "quiz.profile_update",
             model="gpt-4.1",
             input=[
                 {"role": "system", "content": "You are a fashion expert analyzing style preferences. Always respond with valid JSON."},
@@ -388,169 +560,47 @@ async def update_style_profile(interaction: UserInteraction) -> UserStyleProfile
                 
             updated_profile = UserStyleProfile(
                 id=str(profile["_id"]),
-                user_id=str(interaction.user_id),
+                user_id=user_id,
                 style_summary=updated_data["style_summary"],
                 style_preferences=updated_data["style_preferences"]
             )
             
             # Update in database
-            style_profiles_collection.update_one(
+            await repo.style_profiles_collection.update_one(
                 {"_id": profile["_id"]},
                 {"$set": updated_profile.dict()}
             )
+            await notify_style_profile_changed(user_id)
             
             return updated_profile
         except json.JSONDecodeError as e:
             logger.error("JSON Decode Error: %s", str(e))
             logger.error("Raw response: %s", response.output_text)
-            raise HTTPException(status_code=500, detail=f"Invalid JSON response from GPT: {str(e)}")
         except ValueError as e:
             logger.error("Validation Error: %s", str(e))
             logger.error("Updated data: %s", updated_data)
-            raise HTTPException(status_code=500, detail=f"Invalid profile data structure: {str(e)}")
-    except Exception as e:
-        logger.error("OpenAI API Error: %s", str(e))
-        raise HTTPException(status_code=500, detail=f"Error calling OpenAI API: {str(e)}")
-
-async def generate_recommendations(profile: dict, recent_interactions: List[dict]):
-    """Generate personalized recommendations using GPT"""
-    # Create prompt for GPT
-    interactions_text = "\n".join([
-        f"Type: {i['interaction_type']}, Item: {i['item_id']}, Metadata: {i['metadata']}"
-        for i in recent_interactions
-    ])
-    
-    prompt = f"""Based on the user's style profile and recent interactions, generate personalized recommendations:
-    
-    Style Profile:
-    {profile['style_summary']}
-    
-    Recent Interactions:
-    {interactions_text}
-    
-    Please provide recommendations in the following JSON format:
-    {{
-        "recommendations": [
-            {{
-                "item_type": "string",
-                "description": "string",
-                "reasoning": "string",
-                "confidence_score": float
-            }}
-        ]
-    }}
-    """
-    
-    try:
-        response = await client.responses.create(
-            model="gpt-4.1",
-            input=[
-                {"role": "system", "content": "You are a fashion expert providing personalized recommendations. Always respond with valid JSON."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        # Add debug logging
-        logger.info("OpenAI Response: %s", response)
-        logger.info("Response output_text: %s", response.output_text)
-        
-        try:
-            recommendations = json.loads(response.output_text)
-            # Validate the required fields
-            if "recommendations" not in recommendations:
-                raise ValueError("Missing recommendations field in response")
-                
-            return recommendations
-        except json.JSONDecodeError as e:
-            logger.error("JSON Decode Error: %s", str(e))
-            logger.error("Raw response: %s", response.output_text)
-            raise HTTPException(status_code=500, detail=f"Invalid JSON response from GPT: {str(e)}")
-        except ValueError as e:
-            logger.error("Validation Error: %s", str(e))
-            logger.error("Recommendations data: %s", recommendations)
-            raise HTTPException(status_code=500, detail=f"Invalid recommendations structure: {str(e)}")
     except Exception as e:
         logger.error("OpenAI API Error: %s", str(e))
-        raise HTTPException(status_code=500, detail=f"Error calling OpenAI API: {str(e)}")
+    return None
 
 @router.get("/generate-search-queries")
 async def generate_search_queries(user_id: str = Depends(get_current_user_id)):
-    """Generate search queries based on user's style profile using GPT"""
-    # Get user's style profile
-    profile = style_profiles_collection.find_one({"user_id": user_id})
-    if not profile:
+    """
+    Search queries for the user's style profile. Generated with GPT once per profile version;
+    their shopping results are warmed in the background so the discovery page loads from cache.
+    """
+    context = await get_style_context(user_id)
+    if not context.has_profile:
         raise HTTPException(status_code=404, detail="Style profile not found")
-
-    style_summary = profile.get("style_summary", "")
-    style_preferences = profile.get("style_preferences", [])
-
-    if not style_summary:
+    if not context.style_summary:
         raise HTTPException(status_code=404, detail="Style summary not available for this user.")
 
-    # Get user's gender from quiz responses
-    quiz = style_quizzes_collection.find_one({"user_id": user_id, "completed": True})
-    user_gender = "Not specified"
-    if quiz:
-        for response in quiz.get("responses", []):
-            if response["question_id"] == "gender":
-                user_gender = response["response"]
-                break
-
-    # Format style preferences for the prompt
-    preferences_text = ", ".join([pref["category"] for pref in style_preferences])
-
-    prompt = f"""Based on the following style summary and preferences, generate a list of 5-10 search queries related to fashion items or styles that this user might be interested in.
-
-IMPORTANT: This user's gender is {user_gender}. ALWAYS include gender-specific terms in your search queries (e.g., "men's", "women's", "men", "women") to ensure the results are appropriate for their gender.
-
-Here is a very brief description of what a user's style preferences are:
-Style Summary: {style_summary}
-Style Preferences: {preferences_text}
-User Gender: {user_gender}
-
-Use this information to create a list of 5-10 search queries that you think the user would be most interested in to help them explore and discover styles and clothes that they may like.
-
-CRITICAL REQUIREMENTS:
-- ALWAYS include the user's gender in each search query (e.g., "men's streetwear", "women's minimalist fashion")
-- Make sure all queries are gender-appropriate for {user_gender}
-- Focus on their style preferences while ensuring gender specificity
-
-Please provide the search queries in a JSON array of strings.
-[
-  "query 1",
-  "query 2",
-  ...
-]"""
-
     try:
-        response = await client.responses.create(
-            model="gpt-4.1",
-            input=[
-                {"role": "system", "content": "You are a fashion search query generator. Always respond with a valid JSON array of strings. ALWAYS include gender-specific terms in search queries."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-
-        # Add debug logging
-        logger.info("OpenAI Search Query Response: %s", response)
-        logger.info("Search Query Response output_text: %s", response.output_text)
-
-        try:
-            search_queries = json.loads(response.output_text)
-            if not isinstance(search_queries, list) or not all(isinstance(q, str) for q in search_queries):
-                 raise ValueError("Invalid JSON response format: expected a list of strings.")
-
-            return {"search_queries": search_queries}
-
-        except json.JSONDecodeError as e:
-            logger.error("JSON Decode Error: %s", str(e))
-            logger.error("Raw response: %s", response.output_text)
-            raise HTTPException(status_code=500, detail=f"Invalid JSON response from GPT: {str(e)}")
-        except ValueError as e:
-            logger.error("Validation Error: %s", str(e))
-            logger.error("Response data: %s", search_queries)
-            raise HTTPException(status_code=500, detail=f"Invalid response data structure: {str(e)}")
+        search_queries = await get_search_queries(user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=f"Invalid response data structure: {str(e)}")
     except Exception as e:
         logger.error("OpenAI API Error: %s", str(e))
         raise HTTPException(status_code=500, detail=f"Error calling OpenAI API: {str(e)}")
+    return {"search_queries": search_queries}
 
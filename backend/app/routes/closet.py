@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, Form, UploadFile, File, Body
+from fastapi import APIRouter, Depends, HTTPException, Form, UploadFile, File, Body, Query
 from app.auth.dependencies import get_current_user_id
-from app.database import closets_collection, users_collection
+from app.repository import repo
 from app.models.closet import ClosetItem
 from bson import ObjectId
-import os, time
+from bson.errors import InvalidId
+import asyncio, base64, binascii, os, time
+from app.config.settings import settings
 from app.services.s3_service import upload_to_s3
+from app.services.color_service import nearest_color_names
 from app.models.closet import OutfitPost, OutfitComponent
-from app.database import outfit_posts_collection
 from datetime import datetime
+from typing import Optional
 
 router = APIRouter(tags=["Closet"])
 
@@ -26,24 +29,102 @@ def convert_objectid(doc):
     else:
         return doc
 
-@router.get("/")
-def get_closet(user_id: str = Depends(get_current_user_id)):
-    user_closet = closets_collection.find({"user_id": user_id})
-    grouped = {}
-    for item in user_closet:
-        item = convert_objectid(item)  # ✅ Convert ObjectId to string
-        category = item["category"]
-        grouped.setdefault(category, []).append(item)
+# Items shown per category in the closet preview
+PREVIEW_ITEMS_PER_CATEGORY = 6
+
+def color_counts_pipeline(user_id: str) -> list:
+    """Item counts per stored color across the whole closet (one small row per distinct color)."""
+    return [
+        {"$match": {"user_id": user_id, "color": {"$nin": [None, ""]}}},
+        {"$group": {"_id": "$color", "count": {"$sum": 1}}}
+    ]
+
+async def preview_category(user_id: str, category: str) -> dict:
+    """The first PREVIEW_ITEMS_PER_CATEGORY items of a category, read off the (user_id, category, _id) index."""
+    query = {"user_id": user_id, "category": category}
+    items = await repo.closets_collection.find(query).sort("_id", 1).limit(PREVIEW_ITEMS_PER_CATEGORY).to_list(PREVIEW_ITEMS_PER_CATEGORY)
+    return {"_id": category, "items": items}
+
+def build_color_facets(groups: list, color_counts: list) -> list:
+    """Name every distinct color in one batch lookup, count items per name and label the preview items."""
+    colors = [row["_id"] for row in color_counts]
+    names = dict(zip(colors, nearest_color_names(colors)))
+    counts = {}
+    for row in color_counts:
+        name = names.get(row["_id"])
+        if name:
+            counts[name] = counts.get(name, 0) + row["count"]
+    for group in groups:
+        for item in group["items"]:
+            if names.get(item.get("color")):
+                item["color_name"] = names[item["color"]]
+    return [
+        {"name": name, "count": count}
+        for name, count in sorted(counts.items(), key=lambda entry: (-entry[1], entry[0]))
+    ]
 
+async def get_closet_preview(user_id: str) -> dict:
+    """
+    Closet preview: the first items of each category, categories in the order they were first
+    added, plus color facets. Each category is one bounded index read, so the work per category
+    stays constant however large the closet grows.
+    """
+    categories = await repo.closets_collection.distinct("category", {"user_id": user_id})
+    groups = await asyncio.gather(*(preview_category(user_id, category) for category in categories))
+    groups = sorted((group for group in groups if group["items"]), key=lambda group: group["items"][0]["_id"])
+    cursor = await repo.closets_collection.aggregate(color_counts_pipeline(user_id))
+    color_counts = await cursor.to_list(None)
+    color_facets = build_color_facets(groups, color_counts)
     component_groups = [
         {
-            "name": category,
-            "image_url": items[0]["thumbnail"] if items else "",
-            "clothing_items": items[:6]
+            "name": group["_id"],
+            "image_url": group["items"][0]["thumbnail"] if group["items"] else "",
+            "clothing_items": convert_objectid(group["items"])
         }
-        for category, items in grouped.items()
+        for group in groups
     ]
-    return {"closet": component_groups}
+    return {"closet": component_groups, "color_facets": color_facets}
+
+@router.get("/")
+async def get_closet(user_id: str = Depends(get_current_user_id)):
+    return await get_closet_preview(user_id)
+
+def encode_cursor(item_id: ObjectId) -> str:
+    """Opaque page cursor: the last item's ObjectId, URL-safe base64 encoded."""
+    return base64.urlsafe_b64encode(item_id.binary).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> ObjectId:
+    try:
+        return ObjectId(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, InvalidId, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/category/{name}")
+async def get_closet_category(
+    name: str,
+    after: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    limit: int = Query(settings.CLOSET_PAGE_SIZE, ge=1, le=settings.CLOSET_MAX_PAGE_SIZE),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Page through one closet category, oldest items first. Pages are keyset-paginated on the
+    (user_id, category, _id) index, so every page costs the same however deep it is.
+    """
+    query = {"user_id": user_id, "category": name}
+    if after:
+        query["_id"] = {"$gt": decode_cursor(after)}
+    items = await repo.closets_collection.find(query).sort("_id", 1).limit(limit + 1).to_list(limit + 1)
+    has_more = len(items) > limit
+    items = items[:limit]
+    colored = [item for item in items if item.get("color")]
+    for item, color_name in zip(colored, nearest_color_names([item["color"] for item in colored])):
+        if color_name:
+            item["color_name"] = color_name
+    return {
+        "category": name,
+        "clothing_items": convert_objectid(items),
+        "next_cursor": encode_cursor(items[-1]["_id"]) if has_more else None
+    }
 
 @router.post("/add")
 async def add_closet_item(
@@ -52,6 +133,7 @@ async def add_closet_item(
     price: str = Form(...),
     link: str = Form(...),
     thumbnail: UploadFile = File(...),
+    color: Optional[str] = Form(None),
     user_id: str = Depends(get_current_user_id)
 ):
     # Upload image to S3
@@ -67,15 +149,17 @@ async def add_closet_item(
         "link": link,
         "thumbnail": s3_url
     }
-    closets_collection.insert_one(item)
+    if color:
+        item["color"] = color
+    await repo.closets_collection.insert_one(item)
     print(f"[FASHION AGENT LEARNED] User {user_id} added closet item: {name}, {category}, {link}")
     return {"message": "Item added to closet", "item": convert_objectid(item)}
 
 @router.put("/update")
-def update_closet_item(item: ClosetItem, user_id: str = Depends(get_current_user_id)):
+async def update_closet_item(item: ClosetItem, user_id: str = Depends(get_current_user_id)):
     if not item.id:
         raise HTTPException(status_code=400, detail="Item id is required for update")
-    result = closets_collection.update_one(
+    result = await repo.closets_collection.update_one(
         {"user_id": user_id, "_id": ObjectId(item.id)},
         {"$set": item.dict(exclude={"id"})}
     )
@@ -84,36 +168,21 @@ def update_closet_item(item: ClosetItem, user_id: str = Depends(get_current_user
     return {"message": "Item updated"}
 
 @router.delete("/delete")
-def delete_closet_item(id: str, user_id: str = Depends(get_current_user_id)):
-    result = closets_collection.delete_one({"user_id": user_id, "_id": ObjectId(id)})
+async def delete_closet_item(id: str, user_id: str = Depends(get_current_user_id)):
+    result = await repo.closets_collection.delete_one({"user_id": user_id, "_id": ObjectId(id)})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Item not found")
     return {"message": "Item deleted"}
 
 @router.get("/user/{username}")
-def get_user_closet(username: str):
+async def get_user_closet(username: str):
     # First get the user's ID from their username
-    user = users_collection.find_one({"username": username})
+    user = await repo.users_collection.find_one({"username": username})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Use user['email'] to match how user_id is stored in closet items
-    user_closet = closets_collection.find({"user_id": user["email"]})
-    grouped = {}
-    for item in user_closet:
-        item = convert_objectid(item)
-        category = item["category"]
-        grouped.setdefault(category, []).append(item)
-
-    component_groups = [
-        {
-            "name": category,
-            "image_url": items[0]["thumbnail"] if items else "",
-            "clothing_items": items[:6]
-        }
-        for category, items in grouped.items()
-    ]
-    return {"closet": component_groups}
+    return await get_closet_preview(user["email"])
 
 @router.post("/outfit/create")
 async def create_outfit_post(
@@ -132,32 +201,32 @@ async def create_outfit_post(
         "timestamp": datetime.utcnow(),
         "components": []
     }
-    result = outfit_posts_collection.insert_one(post)
+    result = await repo.outfit_posts_collection.insert_one(post)
     post["_id"] = str(result.inserted_id)
     print(f"[FASHION AGENT LEARNED] User {user_id} created a new outfit post: {caption}")
     return {"message": "Outfit post created", "post": post}
 
 @router.get("/outfit/user/{username}")
-def get_user_outfit_posts(username: str):
-    user = users_collection.find_one({"username": username})
+async def get_user_outfit_posts(username: str):
+    user = await repo.users_collection.find_one({"username": username})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    posts = list(outfit_posts_collection.find({"user_id": user["email"]}).sort("timestamp", -1))
+    posts = await repo.outfit_posts_collection.find({"user_id": user["email"]}).sort("timestamp", -1).to_list(None)
     for post in posts:
         post["_id"] = str(post["_id"])
     return {"outfit_posts": posts}
 
 @router.get("/outfit/{post_id}")
-def get_outfit_post(post_id: str):
+async def get_outfit_post(post_id: str):
     from bson import ObjectId
-    post = outfit_posts_collection.find_one({"_id": ObjectId(post_id)})
+    post = await repo.outfit_posts_collection.find_one({"_id": ObjectId(post_id)})
     if not post:
         raise HTTPException(status_code=404, detail="Outfit post not found")
     post["_id"] = str(post["_id"])
     return post
 
 @router.put("/outfit/{post_id}")
-def update_outfit_post(
+async def update_outfit_post(
     post_id: str,
     data: dict = Body(...),
     user_id: str = Depends(get_current_user_id)
@@ -169,7 +238,7 @@ def update_outfit_post(
     if "image_url" in data:
         update["image_url"] = data["image_url"]
     update["timestamp"] = datetime.utcnow()
-    result = outfit_posts_collection.update_one(
+    result = await repo.outfit_posts_collection.update_one(
         {"_id": ObjectId(post_id), "user_id": user_id},
         {"$set": update}
     )
@@ -178,17 +247,17 @@ def update_outfit_post(
     return {"message": "Outfit post updated"}
 
 @router.delete("/outfit/{post_id}")
-def delete_outfit_post(post_id: str, user_id: str = Depends(get_current_user_id)):
+async def delete_outfit_post(post_id: str, user_id: str = Depends(get_current_user_id)):
     from bson import ObjectId
-    result = outfit_posts_collection.delete_one({"_id": ObjectId(post_id), "user_id": user_id})
+    result = await repo.outfit_posts_collection.delete_one({"_id": ObjectId(post_id), "user_id": user_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Outfit post not found or not authorized")
     return {"message": "Outfit post deleted"}
 
 @router.post("/outfit/{post_id}/add-component")
-def add_outfit_component(post_id: str, component: OutfitComponent, user_id: str = Depends(get_current_user_id)):
+async def add_outfit_component(post_id: str, component: OutfitComponent, user_id: str = Depends(get_current_user_id)):
     from bson import ObjectId
-    result = outfit_posts_collection.update_one(
+    result = await repo.outfit_posts_collection.update_one(
         {"_id": ObjectId(post_id), "user_id": user_id},
         {"$push": {"components": component.dict()}}
     )
@@ -198,29 +267,29 @@ def add_outfit_component(post_id: str, component: OutfitComponent, user_id: str
     return {"message": "Component added"}
 
 @router.put("/outfit/{post_id}/update-component/{index}")
-def update_outfit_component(post_id: str, index: int, component: OutfitComponent, user_id: str = Depends(get_current_user_id)):
+async def update_outfit_component(post_id: str, index: int, component: OutfitComponent, user_id: str = Depends(get_current_user_id)):
     from bson import ObjectId
-    post = outfit_posts_collection.find_one({"_id": ObjectId(post_id), "user_id": user_id})
+    post = await repo.outfit_posts_collection.find_one({"_id": ObjectId(post_id), "user_id": user_id})
     if not post or index < 0 or index >= len(post["components"]):
         raise HTTPException(status_code=404, detail="Component not found or not authorized")
     post["components"][index] = component.dict()
-    outfit_posts_collection.update_one({"_id": ObjectId(post_id)}, {"$set": {"components": post["components"]}})
+    await repo.outfit_posts_collection.update_one({"_id": ObjectId(post_id)}, {"$set": {"components": post["components"]}})
     return {"message": "Component updated"}
 
 @router.delete("/outfit/{post_id}/remove-component/{index}")
-def remove_outfit_component(post_id: str, index: int, user_id: str = Depends(get_current_user_id)):
+async def remove_outfit_component(post_id: str, index: int, user_id: str = Depends(get_current_user_id)):
     from bson import ObjectId
-    post = outfit_posts_collection.find_one({"_id": ObjectId(post_id), "user_id": user_id})
+    post = await repo.outfit_posts_collection.find_one({"_id": ObjectId(post_id), "user_id": user_id})
     if not post or index < 0 or index >= len(post["components"]):
         raise HTTPException(status_code=404, detail="Component not found or not authorized")
     post["components"].pop(index)
-    outfit_posts_collection.update_one({"_id": ObjectId(post_id)}, {"$set": {"components": post["components"]}})
+    await repo.outfit_posts_collection.update_one({"_id": ObjectId(post_id)}, {"$set": {"components": post["components"]}})
     return {"message": "Component removed"}
 
 @router.put("/outfit/{post_id}/replace-components")
-def replace_outfit_components(post_id: str, components: list[OutfitComponent], user_id: str = Depends(get_current_user_id)):
+async def replace_outfit_components(post_id: str, components: list[OutfitComponent], user_id: str = Depends(get_current_user_id)):
     from bson import ObjectId
-    result = outfit_posts_collection.update_one(
+    result = await repo.outfit_posts_collection.update_one(
         {"_id": ObjectId(post_id), "user_id": user_id},
         {"$set": {"components": [c.dict() for c in components]}}
     )
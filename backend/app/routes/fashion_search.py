@@ -1,118 +1,142 @@
+import asyncio
+import json
 import logging
+import anyio
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any
-import openai
-from app.config.settings import settings
 from app.auth.dependencies import get_current_user_id
 from app.routes.users import require_premium
-from app.services.search_service import get_shopping_results_from_serpapi
-from app.database import users_collection
+from app.services.search_service import (
+    get_shopping_results_from_serpapi,
+    get_google_shopping_light_results,
+    get_cached_shopping_results,
+    dedupe_shopping_results,
+    canonicalize_query,
+    shopping_results_cache,
+)
+from app.services.llm_gateway import chat_completion
+from app.services.query_rewrite_service import get_cached_rewrite, store_rewrite
+from app.services.user_context_service import NO_PROFILE_HASH, get_style_context, format_style_profile
+from app.services.query_analyzer import analyze_query, normalize_query, build_fallback_query
+from app.services.metrics_service import metrics
+from app.services.resilience_service import ProviderUnavailableError
+from app.services.quota_service import get_quota_status, reserve_quota, release_quota
+from app.services.suggestion_service import (
+    DEFAULT_SEARCH_SUGGESTIONS,
+    suggestions_are_stale,
+    schedule_suggestion_refresh,
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
 
-def check_search_limit(user_id: str) -> dict:
+async def check_search_limit(user_id: str) -> dict:
     """
     Check if user has reached their search limit based on subscription tier.
-    Returns dict with limit info and current usage.
+    Returns dict with limit info and current usage for this week.
     """
     try:
-        user = users_collection.find_one({"email": user_id})
-        if not user:
-            return {"error": "User not found"}
-        
-        subscription_status = user.get("subscription_status", "basic")
-        
-        if subscription_status == "premium":
-            return {
-                "limit": -1,  # Unlimited
-                "used": 0,
-                "remaining": -1,
-                "subscription": "premium"
-            }
-        
-        # Basic tier: 3 searches per week
-        searches_used = user.get("fashion_searches_used", 0)
-        last_search_date = user.get("last_fashion_search_date")
-        
-        from datetime import datetime, date, timedelta
-        today = date.today()
-        
-        # Reset counter if it's a new week (Monday)
-        if last_search_date:
-            last_date = datetime.fromisoformat(last_search_date).date()
-            # Calculate days since last search
-            days_diff = (today - last_date).days
-            
-            # Reset if it's been more than 7 days or if we're in a new week
-            if days_diff >= 7 or (last_date.isocalendar()[1] != today.isocalendar()[1]):
-                searches_used = 0
-        
-        return {
-            "limit": 3,
-            "used": searches_used,
-            "remaining": max(0, 3 - searches_used),
-            "subscription": "basic"
-        }
-        
+        return await get_quota_status(user_id, "fashion_search")
     except Exception as e:
         logger.error(f"Error checking search limit: {e}")
         return {"error": "Failed to check search limit"}
 
-def increment_search_count(user_id: str):
+async def reserve_search(user_id: str) -> dict:
     """
-    Increment the search count for a user.
+    Atomically reserve one search from the user's weekly allowance.
+    Raises 403 when a basic user has no searches left. Returns the updated limit info.
     """
     try:
-        from datetime import datetime
-        today = datetime.now().isoformat()
-        
-        users_collection.update_one(
-            {"email": user_id},
-            {
-                "$inc": {"fashion_searches_used": 1},
-                "$set": {"last_fashion_search_date": today}
-            }
-        )
+        reservation = await reserve_quota(user_id, "fashion_search")
     except Exception as e:
-        logger.error(f"Error incrementing search count: {e}")
+        logger.error(f"Error reserving search: {e}")
+        raise HTTPException(status_code=500, detail="Failed to check search limit")
+
+    if "error" in reservation:
+        raise HTTPException(status_code=500, detail=reservation["error"])
+    if not reservation["allowed"]:
+        raise HTTPException(
+            status_code=403,
+            detail=f"You've reached your weekly search limit of {reservation['limit']} searches. Upgrade to premium for unlimited searches."
+        )
+    return reservation
+
+async def refund_search(user_id: str, reservation: dict) -> dict:
+    """
+    Give back a reserved search when the search itself failed. Returns the refreshed limit info.
+    """
+    await release_quota(user_id, "fashion_search", reservation["week"])
+    limit_info = await check_search_limit(user_id)
+    return reservation if "error" in limit_info else limit_info
+
+def record_query_optimizer_path(path: str):
+    """
+    Count how each query was optimized ("local", "cache", "llm", "error") and update the LLM skip rate.
+    """
+    metrics.increment("query_optimizer_total", path=path)
+    paths = ("local", "cache", "llm", "error")
+    total = sum(metrics.get_counter("query_optimizer_total", path=p) for p in paths)
+    skipped = metrics.get_counter("query_optimizer_total", path="local")
+    metrics.set_gauge("query_optimizer_llm_skip_rate", skipped / total if total else 0.0)
+
+def get_demo_results(optimized_query: str) -> list:
+    """
+    Placeholder results shown when SerpAPI returns nothing.
+    """
+    return [
+        {
+            "title": f"Sample {optimized_query} Product",
+            "link": "https://example.com/product",
+            "price": "$49.99",
+            "thumbnail": "https://via.placeholder.com/300x400/FF6B6B/FFFFFF?text=Fashion+Item",
+            "source": "Demo Store",
+            "rating": "4.5",
+            "reviews": "128"
+        },
+        {
+            "title": f"Premium {optimized_query} Item",
+            "link": "https://example.com/product2",
+            "price": "$89.99",
+            "thumbnail": "https://via.placeholder.com/300x400/4ECDC4/FFFFFF?text=Premium+Item",
+            "source": "Fashion Boutique",
+            "rating": "4.8",
+            "reviews": "256"
+        }
+    ]
 
 async def generate_optimized_search_query(user_query: str, user_id: str = None) -> str:
     """
     Use GPT to convert a natural language fashion query into an optimized Google search query.
+    Queries that are already concise shopping queries are normalized locally and skip GPT.
     """
     try:
+        analysis = analyze_query(user_query)
+        if analysis["is_well_formed"]:
+            optimized_query = normalize_query(user_query)
+            record_query_optimizer_path("local")
+            logger.info(f"Query already well-formed, skipping GPT: '{user_query}' → '{optimized_query}'")
+            return optimized_query
+
         # Get user's style profile for personalization
         user_context = ""
+        profile_hash = NO_PROFILE_HASH
         if user_id:
             try:
-                from app.database import style_profiles_collection
-                style_profile = style_profiles_collection.find_one({"user_id": user_id})
-                if style_profile:
-                    style_summary = style_profile.get("style_summary", "")
-                    style_preferences = style_profile.get("style_preferences", [])
-                    
-                    # Handle style preferences that might be dictionaries or strings
-                    if style_preferences and len(style_preferences) > 0:
-                        if isinstance(style_preferences[0], dict):
-                            # Extract values from dictionaries
-                            preference_values = [pref.get('value', str(pref)) for pref in style_preferences]
-                        else:
-                            preference_values = style_preferences
-                        preferences_str = ', '.join(str(p) for p in preference_values)
-                    else:
-                        preferences_str = 'Not specified'
-                    
-                    user_context = f"""
-User Style Profile:
-- Style Summary: {style_summary}
-- Style Preferences: {preferences_str}
-"""
+                style_context = await get_style_context(user_id)
+                user_context = format_style_profile(style_context)
+                profile_hash = style_context.fingerprint
             except Exception as e:
                 logger.warning(f"Could not fetch user style profile: {e}")
 
+        # Rewrites depend only on the query and the profile, so repeat queries skip GPT
+        cached_query = get_cached_rewrite(user_query, profile_hash, user_id)
+        if cached_query:
+            record_query_optimizer_path("cache")
+            logger.info(f"Using cached optimized query: '{user_query}' → '{cached_query}'")
+            return cached_query
+
         prompt = f"""
 You are a fashion expert who converts natural language fashion queries into optimized Google Shopping search queries.
 
@@ -142,7 +166,8 @@ Examples:
 Generate only the optimized search query, nothing else:
 """
 
-        response = await client.chat.completions.create(
+        response = await chat_completion(
+            "search.query_rewrite",
             model="gpt-4",
             messages=[
                 {"role": "system", "content": "You are a fashion search optimization expert. Respond with only the optimized search query, no additional text."},
@@ -156,30 +181,16 @@ Generate only the optimized search query, nothing else:
         
         # Fallback if GPT response is too long or invalid
         if len(optimized_query) > 50 or not optimized_query:
-            # Simple fallback: extract key terms
-            fallback_terms = []
-            query_lower = user_query.lower()
-            
-            # Common fashion terms
-            fashion_terms = ["dress", "shirt", "pants", "jeans", "shoes", "sneakers", "jacket", "hoodie", "sweater", "blouse", "skirt", "shorts"]
-            for term in fashion_terms:
-                if term in query_lower:
-                    fallback_terms.append(term)
-                    break
-            
-            # Add gender if mentioned
-            if any(word in query_lower for word in ["men", "male", "guy"]):
-                fallback_terms.insert(0, "men's")
-            elif any(word in query_lower for word in ["women", "female", "girl", "lady"]):
-                fallback_terms.insert(0, "women's")
-            
-            optimized_query = " ".join(fallback_terms) if fallback_terms else user_query
+            optimized_query = build_fallback_query(user_query)
 
+        record_query_optimizer_path("llm")
+        store_rewrite(user_query, profile_hash, optimized_query)
         logger.info(f"Generated optimized query: '{user_query}' → '{optimized_query}'")
         return optimized_query
 
     except Exception as e:
         logger.error(f"Error generating optimized search query: {e}")
+        record_query_optimizer_path("error")
         return user_query
 
 @router.post("/fashion-search")
@@ -194,51 +205,24 @@ async def fashion_search(
     try:
         logger.info(f"Fashion search request: '{query}' for user {user_id}")
         
-        # Check search limits
-        limit_info = check_search_limit(user_id)
-        if "error" in limit_info:
-            raise HTTPException(status_code=500, detail=limit_info["error"])
-        
-        # Check if user has reached their limit
-        if limit_info["subscription"] == "basic" and limit_info["remaining"] <= 0:
-            raise HTTPException(
-                status_code=403, 
-                detail=f"You've reached your weekly search limit of {limit_info['limit']} searches. Upgrade to premium for unlimited searches."
-            )
-        
-        # Generate optimized search query using GPT
-        optimized_query = await generate_optimized_search_query(query, user_id)
+        # Reserve a search up front; it is refunded if the search fails
+        limit_info = await reserve_search(user_id)
         
-        # Get shopping results using the optimized query
-        results = get_shopping_results_from_serpapi(optimized_query, num_results)
+        try:
+            # Generate optimized search query using GPT
+            optimized_query = await generate_optimized_search_query(query, user_id)
+            
+            # Get shopping results using the optimized query
+            results = await asyncio.to_thread(get_shopping_results_from_serpapi, optimized_query, num_results)
+        except Exception:
+            await refund_search(user_id, limit_info)
+            raise
         
         # If no results, provide mock data for demonstration
         if not results or (len(results) == 1 and results[0].get("title") == "Search failed"):
             logger.warning(f"No results from SerpAPI, providing mock data for demonstration")
-            results = [
-                {
-                    "title": f"Sample {optimized_query} Product",
-                    "link": "https://example.com/product",
-                    "price": "$49.99",
-                    "thumbnail": "https://via.placeholder.com/300x400/FF6B6B/FFFFFF?text=Fashion+Item",
-                    "source": "Demo Store",
-                    "rating": "4.5",
-                    "reviews": "128"
-                },
-                {
-                    "title": f"Premium {optimized_query} Item",
-                    "link": "https://example.com/product2",
-                    "price": "$89.99",
-                    "thumbnail": "https://via.placeholder.com/300x400/4ECDC4/FFFFFF?text=Premium+Item",
-                    "source": "Fashion Boutique",
-                    "rating": "4.8",
-                    "reviews": "256"
-                }
-            ]
-        
-        # Increment search count for basic users
-        if limit_info["subscription"] == "basic":
-            increment_search_count(user_id)
+            results = get_demo_results(optimized_query)
+            limit_info = await refund_search(user_id, limit_info)
         
         return {
             "original_query": query,
@@ -250,83 +234,116 @@ async def fashion_search(
         
     except HTTPException:
         raise
+    except ProviderUnavailableError as e:
+        logger.warning(f"Fashion search provider unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Shopping search is temporarily unavailable. Please try again shortly.")
     except Exception as e:
         logger.error(f"Fashion search failed: {e}")
         raise HTTPException(status_code=500, detail=f"Fashion search failed: {str(e)}")
 
+def _ndjson_event(event: dict) -> str:
+    return json.dumps(event, default=str) + "\n"
+
+@router.post("/fashion-search/stream")
+async def fashion_search_stream(
+    query: str = Query(..., description="Natural language fashion search query"),
+    num_results: int = Query(10, ge=1, le=20, description="Number of results to return"),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Streaming variant of /fashion-search that returns newline-delimited JSON events.
+    Cached results are sent first, then Google Shopping Light results for the raw query
+    (fetched while GPT optimizes the query), then full Google Shopping results for the
+    optimized query merged and deduped with everything already sent.
+    Each "results" event carries the full merged list so clients can simply replace what they show.
+    """
+    logger.info(f"Streaming fashion search request: '{query}' for user {user_id}")
+
+    # The search is reserved before the stream starts so limit errors keep their HTTP status
+    limit_info = await reserve_search(user_id)
+
+    async def event_stream():
+        optimize_task = asyncio.create_task(generate_optimized_search_query(query, user_id))
+        # The reservation is settled once "done" goes out or the search was refunded. Anything else,
+        # including a client disconnect (CancelledError/GeneratorExit), is refunded in finally.
+        settled = False
+        try:
+            yield _ndjson_event({"type": "start", "original_query": query})
+
+            merged = dedupe_shopping_results(get_cached_shopping_results(query, num_results))
+            if merged:
+                yield _ndjson_event({"type": "results", "stage": "cached", "results": merged, "total_results": len(merged)})
+
+            # Light results for the raw query while the GPT rewrite is in flight
+            light_results = await asyncio.to_thread(get_google_shopping_light_results, query, num_results)
+            light_merged = dedupe_shopping_results(merged, light_results)
+            if len(light_merged) > len(merged):
+                merged = light_merged
+                yield _ndjson_event({"type": "results", "stage": "light", "results": merged, "total_results": len(merged)})
+
+            optimized_query = await optimize_task
+            yield _ndjson_event({"type": "query", "optimized_query": optimized_query})
+
+            full_results = await asyncio.to_thread(get_shopping_results_from_serpapi, optimized_query, num_results)
+            merged = dedupe_shopping_results(merged, full_results)
+            search_limit = limit_info
+            if not merged:
+                logger.warning(f"No results from SerpAPI, providing mock data for demonstration")
+                merged = get_demo_results(optimized_query)
+                settled = True
+                search_limit = await refund_search(user_id, limit_info)
+            else:
+                shopping_results_cache.set(("fashion_search", canonicalize_query(query), num_results), merged)
+            yield _ndjson_event({"type": "results", "stage": "full", "results": merged, "total_results": len(merged)})
+
+            settled = True
+            yield _ndjson_event({
+                "type": "done",
+                "original_query": query,
+                "optimized_query": optimized_query,
+                "total_results": len(merged),
+                "search_limit": search_limit
+            })
+        except ProviderUnavailableError as e:
+            logger.warning(f"Streaming fashion search provider unavailable: {e}")
+            yield _ndjson_event({"type": "error", "status": 503, "detail": "Shopping search is temporarily unavailable. Please try again shortly."})
+        except Exception as e:
+            logger.error(f"Streaming fashion search failed: {e}")
+            yield _ndjson_event({"type": "error", "status": 500, "detail": f"Fashion search failed: {str(e)}"})
+        finally:
+            if not optimize_task.done():
+                optimize_task.cancel()
+            if not settled:
+                # A disconnect cancels the enclosing scope, which would cancel the refund at its first await
+                with anyio.CancelScope(shield=True):
+                    await refund_search(user_id, limit_info)
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @router.get("/fashion-search/suggestions")
 async def get_search_suggestions(
     user_id: str = Depends(get_current_user_id)
 ):
     """
     Get personalized fashion search suggestions based on user's style profile.
+    Suggestions are generated when the profile changes; stale ones are refreshed in the background.
     """
     try:
         # Check search limits to show remaining searches
-        limit_info = check_search_limit(user_id)
+        limit_info = await check_search_limit(user_id)
         if "error" in limit_info:
             raise HTTPException(status_code=500, detail=limit_info["error"])
         
-        # Get user's style profile
-        from app.database import style_profiles_collection
-        style_profile = style_profiles_collection.find_one({"user_id": user_id})
-        
-        if not style_profile:
+        # Suggestions are precomputed on the style profile and served from the cached style context
+        style_context = await get_style_context(user_id)
+
+        if not style_context.has_profile:
             # Return generic suggestions if no profile exists
-            suggestions = [
-                "summer dresses",
-                "streetwear hoodies", 
-                "vintage denim",
-                "formal shoes",
-                "casual sneakers",
-                "oversized sweaters",
-                "minimalist tops",
-                "pastel colored clothing"
-            ]
+            suggestions = DEFAULT_SEARCH_SUGGESTIONS
         else:
-            # Generate personalized suggestions based on style profile
-            style_summary = style_profile.get("style_summary", "")
-            style_preferences = style_profile.get("style_preferences", [])
-            
-            # Handle style preferences that might be dictionaries or strings
-            if style_preferences and len(style_preferences) > 0:
-                if isinstance(style_preferences[0], dict):
-                    # Extract values from dictionaries
-                    preference_values = [pref.get('value', str(pref)) for pref in style_preferences]
-                else:
-                    preference_values = style_preferences
-                preferences_str = ', '.join(str(p) for p in preference_values)
-            else:
-                preferences_str = 'Not specified'
-            
-            prompt = f"""
-Based on this user's style profile, generate 8 personalized fashion search suggestions:
-
-Style Summary: {style_summary}
-Style Preferences: {preferences_str}
-
-Generate 8 natural language search queries that this user might want to search for.
-Make them diverse and relevant to their style preferences.
-Respond with only a JSON array of strings, no additional text.
-"""
-
-            response = await client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a fashion expert. Respond with only a JSON array of strings."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=200
-            )
-            
-            try:
-                import json
-                suggestions = json.loads(response.choices[0].message.content.strip())
-                if not isinstance(suggestions, list):
-                    suggestions = []
-            except:
-                suggestions = []
+            suggestions = style_context.search_suggestions or DEFAULT_SEARCH_SUGGESTIONS
+            if suggestions_are_stale(style_context):
+                schedule_suggestion_refresh(user_id)
         
         return {
             "suggestions": suggestions,
@@ -343,7 +360,7 @@ async def get_search_limit(user_id: str = Depends(get_current_user_id)):
     Get current search limit information for the user.
     """
     try:
-        limit_info = check_search_limit(user_id)
+        limit_info = await check_search_limit(user_id)
         if "error" in limit_info:
             raise HTTPException(status_code=500, detail=limit_info["error"])
         
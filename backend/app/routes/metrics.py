@@ -0,0 +1,23 @@
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from app.config.settings import settings
+from app.services.metrics_service import metrics
+from app.services.resilience_service import get_provider_status
+
+router = APIRouter(tags=["Metrics"])
+
+def require_metrics_token(x_metrics_token: Optional[str] = Header(None)):
+    """Metrics expose per-call-site traffic and error counts, so they are only served to operators."""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_metrics_token or not secrets.compare_digest(x_metrics_token, settings.METRICS_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid metrics token")
+
+@router.get("/", dependencies=[Depends(require_metrics_token)])
+def get_metrics():
+    """Return in-process counters, gauges and latency summaries plus provider circuit state."""
+    return {
+        **metrics.snapshot(),
+        "providers": get_provider_status()
+    }
@@ -101,7 +101,7 @@ async def stripe_webhook(request: Request):
         except stripe.error.SignatureVerificationError as e:
             raise HTTPException(status_code=400, detail="Invalid signature")
         
-        result = handle_subscription_webhook(event)
+        result = await handle_subscription_webhook(event)
         return result
         
     except Exception as e:
@@ -109,10 +109,10 @@ async def stripe_webhook(request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/upload-limit")
-def check_upload_limits(user_id: str = Depends(get_current_user_id)):
+async def check_upload_limits(user_id: str = Depends(get_current_user_id)):
     """Check user's upload limits"""
     try:
-        result = check_upload_limit(user_id)
+        result = await check_upload_limit(user_id)
         return result
     except Exception as e:
         logger.error(f"Error checking upload limits: {e}")
@@ -5,9 +5,8 @@ import time
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Depends, BackgroundTasks
 from app.services.vision_service import analyze_image
 from app.auth.dependencies import get_current_user_id
-from app.services.similar_service import generate_similar_item_queries
 from app.services.search_service import get_shopping_results_from_serpapi
-from app.services.subscription_service import check_upload_limit, increment_upload_count
+from app.services.subscription_service import increment_upload_count, refund_upload_count
 from app.config.settings import settings
 from app.services.s3_service import upload_to_s3
 from app.services.job_service import create_analysis_job, process_analysis_job
@@ -29,8 +28,8 @@ async def upload_image(
 ):
     logger.info("📸 Upload endpoint hit. is_owner=%s, user_id=%s", is_owner, user_id)
     
-    # Check upload limits
-    upload_check = check_upload_limit(user_id)
+    # Reserve an upload up front; it is refunded if the analysis job fails
+    upload_check = await increment_upload_count(user_id)
     if not upload_check['can_upload']:
         raise HTTPException(
             status_code=403, 
@@ -42,6 +41,8 @@ async def upload_image(
         )
     
     if not image.content_type.startswith("image/"):
+        if upload_check.get('week'):
+            await refund_upload_count(user_id, upload_check['week'])
         raise HTTPException(status_code=400, detail="Invalid file type")
 
     os.makedirs("uploads", exist_ok=True)
@@ -55,7 +56,7 @@ async def upload_image(
 
     try:
         # Create analysis job
-        job_id = create_analysis_job(user_id, temp_path, filename)
+        job_id = await create_analysis_job(user_id, temp_path, filename, quota_week=upload_check.get('week'))
         
         # Start background processing
         if background_tasks:
@@ -71,6 +72,8 @@ async def upload_image(
 
     except Exception as e:
         logger.error("❌ Error during job creation: %s", str(e))
+        if upload_check.get('week'):
+            await refund_upload_count(user_id, upload_check['week'])
         # Clean up temp file
         if os.path.exists(temp_path):
             os.remove(temp_path)
@@ -81,7 +84,7 @@ async def get_job_status(job_id: str, user_id: str = Depends(get_current_user_id
     """Get the status of an analysis job"""
     from app.services.job_service import get_job_status
     
-    job = get_job_status(job_id)
+    job = await get_job_status(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
@@ -96,13 +99,13 @@ async def get_user_jobs(user_id: str = Depends(get_current_user_id), limit: int
     """Get recent analysis jobs for the user"""
     from app.services.job_service import get_user_jobs
     
-    jobs = get_user_jobs(user_id, limit)
+    jobs = await get_user_jobs(user_id, limit)
     return {"jobs": jobs}
 
 @router.delete("/job/{job_id}")
 async def delete_job(job_id: str, user_id: str = Depends(get_current_user_id)):
     """Delete an analysis job by job_id for the current user"""
-    deleted = delete_analysis_job(job_id, user_id)
+    deleted = await delete_analysis_job(job_id, user_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Job not found or not authorized to delete")
     return {"message": "Job deleted"}
@@ -1,11 +1,18 @@
 from fastapi import APIRouter, HTTPException, Depends, Body, Query
-from app.database import users_collection
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from app.repository import repo
 from app.auth.dependencies import get_current_user_id
+from app.services.quota_service import get_week_usage, next_week_start
+from app.services.user_context_service import invalidate_style_context
+from app.services.chat_session_service import clear_chat_session
 from app.models.user import User, UserCreate, UsernameUpdate
 from typing import List, Optional
+from app.services.resilience_service import ProviderUnavailableError
 from app.services.search_service import get_shopping_results_from_serpapi, get_google_shopping_light_results
 from app.services.chatbot_service import StyleChatbot
 from bson import ObjectId
+import json
 import re
 
 router = APIRouter(tags=["Users"])
@@ -13,6 +20,10 @@ router = APIRouter(tags=["Users"])
 # Initialize the style chatbot
 style_chatbot = StyleChatbot()
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 def validate_username_format(username: str) -> bool:
     """Validate username format"""
     username_regex = r'^[a-zA-Z0-9_]{3,30}$'
@@ -35,8 +46,8 @@ def user_to_model(user) -> User:
         subscription_status=user.get("subscription_status", "free"),
         subscription_tier=user.get("subscription_tier"),
         subscription_end_date=user.get("subscription_end_date"),
-        weekly_uploads_used=user.get("weekly_uploads_used", 0),
-        weekly_uploads_reset_date=user.get("weekly_uploads_reset_date"),
+        weekly_uploads_used=get_week_usage(user, "uploads"),
+        weekly_uploads_reset_date=next_week_start(),
         stripe_customer_id=user.get("stripe_customer_id"),
         stripe_subscription_id=user.get("stripe_subscription_id"),
         pending_cancellation=user.get("pending_cancellation", False),
@@ -54,20 +65,20 @@ def convert_objectid(doc):
         return doc
 
 @router.get("/user/{username}", response_model=User)
-def get_user_by_username(username: str):
-    user = users_collection.find_one({"username": username})
+async def get_user_by_username(username: str):
+    user = await repo.users_collection.find_one({"username": username})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user_to_model(user)
 
 @router.put("/user/profile", response_model=User)
-def update_profile(
+async def update_profile(
     display_name: Optional[str] = Body(None),
     avatar_url: Optional[str] = Body(None),
     bio: Optional[str] = Body(None),
     user_id: str = Depends(get_current_user_id)
 ):
-    user = users_collection.find_one({"email": user_id})
+    user = await repo.users_collection.find_one({"email": user_id})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     update_fields = {}
@@ -78,12 +89,12 @@ def update_profile(
     if bio is not None:
         update_fields["bio"] = bio
     if update_fields:
-        users_collection.update_one({"email": user_id}, {"$set": update_fields})
-    user = users_collection.find_one({"email": user_id})
+        await repo.users_collection.update_one({"email": user_id}, {"$set": update_fields})
+    user = await repo.users_collection.find_one({"email": user_id})
     return user_to_model(user)
 
 @router.put("/user/username", response_model=User)
-def update_username(
+async def update_username(
     username_update: UsernameUpdate,
     user_id: str = Depends(get_current_user_id)
 ):
@@ -98,12 +109,12 @@ def update_username(
         )
     
     # Check if username is already taken
-    existing_user = users_collection.find_one({"username": username_update.username})
+    existing_user = await repo.users_collection.find_one({"username": username_update.username})
     if existing_user and existing_user["email"] != user_id:
         raise HTTPException(status_code=400, detail="Username already taken")
     
     # Get current user
-    current_user = users_collection.find_one({"email": user_id})
+    current_user = await repo.users_collection.find_one({"email": user_id})
     if not current_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -112,17 +123,17 @@ def update_username(
         raise HTTPException(status_code=400, detail="Username is already set to this value")
     
     # Update username
-    users_collection.update_one(
+    await repo.users_collection.update_one(
         {"email": user_id}, 
         {"$set": {"username": username_update.username}}
     )
     
     # Update the updated user
-    updated_user = users_collection.find_one({"email": user_id})
+    updated_user = await repo.users_collection.find_one({"email": user_id})
     return user_to_model(updated_user)
 
 @router.get("/user/username/check/{username}")
-def check_username_availability(username: str, user_id: str = Depends(get_current_user_id)):
+async def check_username_availability(username: str, user_id: str = Depends(get_current_user_id)):
     """
     Check if a username is available for the current user
     """
@@ -134,7 +145,7 @@ def check_username_availability(username: str, user_id: str = Depends(get_curren
         }
     
     # Check if username is taken by another user
-    existing_user = users_collection.find_one({"username": username})
+    existing_user = await repo.users_collection.find_one({"username": username})
     if existing_user and existing_user["email"] != user_id:
         return {
             "available": False,
@@ -142,7 +153,7 @@ def check_username_availability(username: str, user_id: str = Depends(get_curren
         }
     
     # Check if it's the user's current username
-    current_user = users_collection.find_one({"email": user_id})
+    current_user = await repo.users_collection.find_one({"email": user_id})
     if current_user and current_user["username"] == username:
         return {
             "available": False,
@@ -155,66 +166,70 @@ def check_username_availability(username: str, user_id: str = Depends(get_curren
     }
 
 @router.post("/user/follow/{username}")
-def follow_user(username: str, user_id: str = Depends(get_current_user_id)):
-    if not users_collection.find_one({"username": username}):
+async def follow_user(username: str, user_id: str = Depends(get_current_user_id)):
+    if not await repo.users_collection.find_one({"username": username}):
         raise HTTPException(status_code=404, detail="User not found")
-    if users_collection.find_one({"email": user_id, "following": username}):
+    if await repo.users_collection.find_one({"email": user_id, "following": username}):
         raise HTTPException(status_code=400, detail="Already following")
-    users_collection.update_one({"email": user_id}, {"$addToSet": {"following": username}})
-    users_collection.update_one({"username": username}, {"$addToSet": {"followers": user_id}})
+    await repo.users_collection.update_one({"email": user_id}, {"$addToSet": {"following": username}})
+    await repo.users_collection.update_one({"username": username}, {"$addToSet": {"followers": user_id}})
     return {"message": f"Now following {username}"}
 
 @router.post("/user/unfollow/{username}")
-def unfollow_user(username: str, user_id: str = Depends(get_current_user_id)):
-    if not users_collection.find_one({"username": username}):
+async def unfollow_user(username: str, user_id: str = Depends(get_current_user_id)):
+    if not await repo.users_collection.find_one({"username": username}):
         raise HTTPException(status_code=404, detail="User not found")
-    users_collection.update_one({"email": user_id}, {"$pull": {"following": username}})
-    users_collection.update_one({"username": username}, {"$pull": {"followers": user_id}})
+    await repo.users_collection.update_one({"email": user_id}, {"$pull": {"following": username}})
+    await repo.users_collection.update_one({"username": username}, {"$pull": {"followers": user_id}})
     return {"message": f"Unfollowed {username}"}
 
 @router.get("/users/search", response_model=List[User])
-def search_users(query: str):
-    users = users_collection.find({
+async def search_users(query: str):
+    users = await repo.users_collection.find({
         "$or": [
             {"username": {"$regex": query, "$options": "i"}},
             {"display_name": {"$regex": query, "$options": "i"}}
         ]
-    })
+    }).to_list(None)
     return [user_to_model(u) for u in users]
 
-def require_premium(user_id: str):
-    user = users_collection.find_one({"email": user_id})
+async def require_premium(user_id: str):
+    user = await repo.users_collection.find_one({"email": user_id})
     if not user or user.get("subscription_status") != "premium":
         raise HTTPException(status_code=403, detail="Google Shopping search is only available for premium users.")
 
 @router.get("/shopping/search")
-def shopping_search(query: str = Query(..., description="Shopping search query"), num_results: int = Query(10, ge=1, le=20), user_id: str = Depends(get_current_user_id)):
+async def shopping_search(query: str = Query(..., description="Shopping search query"), num_results: int = Query(10, ge=1, le=20), user_id: str = Depends(get_current_user_id)):
     """
     Proxy endpoint for Google Shopping search via SerpAPI.
     Returns a list of shopping results for the given query.
     """
-    require_premium(user_id)
+    await require_premium(user_id)
     print(f"[Backend] Shopping search request received - Query: '{query}', Num results: {num_results}")
     try:
-        results = get_shopping_results_from_serpapi(query, num_results)
+        results = await run_in_threadpool(get_shopping_results_from_serpapi, query, num_results)
         print(f"[Backend] Shopping search completed - Returning {len(results)} results")
         return results
+    except ProviderUnavailableError:
+        raise HTTPException(status_code=503, detail="Shopping search is temporarily unavailable. Please try again shortly.")
     except Exception as e:
         print(f"[Backend] Shopping search error: {e}")
         raise HTTPException(status_code=500, detail=f"Shopping search failed: {str(e)}")
 
 @router.get("/shopping/light/search")
-def shopping_light_search(query: str = Query(..., description="Shopping search query"), num_results: int = Query(10, ge=1, le=20), user_id: str = Depends(get_current_user_id)):
+async def shopping_light_search(query: str = Query(..., description="Shopping search query"), num_results: int = Query(10, ge=1, le=20), user_id: str = Depends(get_current_user_id)):
     """
     Proxy endpoint for Google Shopping Light search via SerpAPI.
     Returns a list of shopping results for the given query using the faster Google Shopping Light engine.
     """
-    require_premium(user_id)
+    await require_premium(user_id)
     print(f"[Backend] Google Shopping Light search request received - Query: '{query}', Num results: {num_results}")
     try:
-        results = get_google_shopping_light_results(query, num_results)
+        results = await run_in_threadpool(get_google_shopping_light_results, query, num_results)
         print(f"[Backend] Google Shopping Light search completed - Returning {len(results)} results")
         return results
+    except ProviderUnavailableError:
+        raise HTTPException(status_code=503, detail="Shopping search is temporarily unavailable. Please try again shortly.")
     except Exception as e:
         print(f"[Backend] Google Shopping Light search error: {e}")
         raise HTTPException(status_code=500, detail=f"Google Shopping Light search failed: {str(e)}")
@@ -243,6 +258,39 @@ async def chat_with_style_bot(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
+@router.post("/chat/style/stream")
+async def stream_chat_with_style_bot(
+    message: str = Body(..., embed=True),
+    context: Optional[dict] = Body({}, embed=True),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Server-Sent Events version of /chat/style.
+    Emits "token" events with reply text as it is generated, then one "final" event carrying
+    response, suggestions, style_insights and next_questions, followed by "done".
+    """
+    async def event_stream():
+        try:
+            async for event in style_chatbot.stream_message(user_id=user_id, message=message, context=context):
+                if event["type"] == "token":
+                    yield sse_event("token", {"text": event["text"]})
+                else:
+                    yield sse_event("final", {
+                        "response": event["message"],
+                        "suggestions": event.get("suggestions", []),
+                        "style_insights": event.get("style_insights", {}),
+                        "next_questions": event.get("next_questions", [])
+                    })
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Chat error: {str(e)}"})
+        yield sse_event("done", {})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/chat/style/start")
 async def start_style_chat(user_id: str = Depends(get_current_user_id)):
     """
@@ -275,18 +323,8 @@ async def delete_account(user_id: str = Depends(get_current_user_id)):
     Delete user account and all associated data.
     """
     try:
-        # Import collections
-        from app.database import (
-            users_collection, 
-            closets_collection, 
-            wishlist_collection,
-            style_profiles_collection,
-            style_quizzes_collection,
-            analysis_jobs_collection
-        )
-        
         # Get user details first
-        user = users_collection.find_one({"email": user_id})
+        user = await repo.users_collection.find_one({"email": user_id})
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -312,12 +350,17 @@ async def delete_account(user_id: str = Depends(get_current_user_id)):
             print(f"Failed to delete uploads from S3: {e}")
         
         # Delete user's data from all collections
-        users_collection.delete_one({"email": user_id})
-        closets_collection.delete_many({"user_id": user_id})
-        wishlist_collection.delete_many({"user_id": user_id})
-        style_profiles_collection.delete_many({"user_id": user_id})
-        style_quizzes_collection.delete_many({"user_id": user_id})
-        analysis_jobs_collection.delete_many({"user_id": user_id})
+        await repo.users_collection.delete_one({"email": user_id})
+        await repo.closets_collection.delete_many({"user_id": user_id})
+        await repo.wishlist_collection.delete_many({"user_id": user_id})
+        await repo.style_profiles_collection.delete_many({"user_id": user_id})
+        await repo.style_quizzes_collection.delete_many({"user_id": user_id})
+        await repo.chat_sessions_collection.delete_many({"user_id": user_id})
+        await repo.chat_insights_collection.delete_many({"user_id": user_id})
+        await repo.for_you_recommendations_collection.delete_many({"user_id": user_id})
+        invalidate_style_context(user_id)
+        clear_chat_session(user_id)
+        await repo.analysis_jobs_collection.delete_many({"user_id": user_id})
         
         # Cancel Stripe subscription if exists
         if user.get("stripe_subscription_id"):
@@ -2,7 +2,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Form, UploadFile, File
 from typing import List, Optional
 from datetime import datetime
-from app.database import wishlist_collection
+from app.repository import repo
 from app.auth.dependencies import get_current_user_id
 from app.models.wishlist import WishlistItem
 from bson import ObjectId
@@ -25,9 +25,9 @@ async def get_wishlist(
     limit: int = Query(20, ge=1, le=100)
 ):
     """Get the current user's wishlist items with pagination"""
-    items = list(wishlist_collection.find(
+    items = await repo.wishlist_collection.find(
         {"user_id": user_id}
-    ).skip(skip).limit(limit))
+    ).skip(skip).limit(limit).to_list(limit)
     return items
 
 @router.get("/user/{target_user_id}", response_model=List[WishlistItem])
@@ -37,9 +37,9 @@ async def get_user_wishlist(
     limit: int = Query(20, ge=1, le=100)
 ):
     """Get another user's public wishlist items"""
-    items = list(wishlist_collection.find(
+    items = await repo.wishlist_collection.find(
         {"user_id": target_user_id}
-    ).skip(skip).limit(limit))
+    ).skip(skip).limit(limit).to_list(limit)
     return items
 
 @router.post("/add")
@@ -68,19 +68,19 @@ async def add_to_wishlist(
         "source": "User Save",
         "tags": [category]
     }
-    existing = wishlist_collection.find_one({
+    existing = await repo.wishlist_collection.find_one({
         "user_id": user_id,
         "link": link
     })
     if existing:
         raise HTTPException(status_code=400, detail="Item already in wishlist")
-    result = wishlist_collection.insert_one(item)
+    result = await repo.wishlist_collection.insert_one(item)
     return {"message": "Item added to wishlist", "item": convert_objectid(item)}
 
 @router.delete("/delete")
-def delete_wishlist_item(link: str, category: str, user_id: str = Depends(get_current_user_id)):
+async def delete_wishlist_item(link: str, category: str, user_id: str = Depends(get_current_user_id)):
     """Remove an item from wishlist by link and category"""
-    result = wishlist_collection.delete_one({
+    result = await repo.wishlist_collection.delete_one({
         "user_id": user_id,
         "link": link,
         "category": category
@@ -95,7 +95,7 @@ async def like_wishlist_item(
     user_id: str = Depends(get_current_user_id)
 ):
     """Like another user's wishlist item"""
-    result = wishlist_collection.update_one(
+    result = await repo.wishlist_collection.update_one(
         {"_id": ObjectId(item_id)},
         {"$inc": {"likes": 1}}
     )
@@ -117,8 +117,9 @@ async def discover_items(
     if tags:
         query["tags"] = {"$in": tags}
     
-    items = list(wishlist_collection.find(query)
+    items = await (repo.wishlist_collection.find(query)
         .sort("likes", -1)
         .skip(skip)
-        .limit(limit))
+        .limit(limit)
+        .to_list(limit))
     return items
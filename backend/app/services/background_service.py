@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Strong references so fire-and-forget tasks are not garbage collected mid-flight
+_tasks: Set[asyncio.Task] = set()
+
+# Keyed tasks currently running, used to coalesce duplicate refreshes
+_inflight: Dict[Hashable, asyncio.Task] = {}
+
+def spawn(coro: Awaitable, name: str = "background task") -> asyncio.Task:
+    """Run a coroutine in the background on the current event loop and log any failure."""
+    task = asyncio.ensure_future(coro)
+    _tasks.add(task)
+
+    def _done(t: asyncio.Task):
+        _tasks.discard(t)
+        if t.cancelled():
+            return
+        if t.exception() is not None:
+            logger.error(f"{name} failed: {t.exception()}")
+
+    task.add_done_callback(_done)
+    return task
+
+def spawn_once(key: Hashable, make_coro: Callable[[], Awaitable], name: str = "background task") -> Optional[asyncio.Task]:
+    """
+    Like spawn, but skips scheduling while a task with the same key is still running.
+    Returns None when there is no running event loop (e.g. called from a sync script).
+    """
+    existing = _inflight.get(key)
+    if existing is not None and not existing.done():
+        return existing
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        logger.warning(f"No running event loop, skipping {name} for {key}")
+        return None
+    task = spawn(make_coro(), name)
+    _inflight[key] = task
+    task.add_done_callback(lambda t: _inflight.pop(key, None) if _inflight.get(key) is t else None)
+    return task
+
+# Debounced keys: key -> {"dirty": bool}
+_debounced: Dict[Hashable, dict] = {}
+
+def debounce(key: Hashable, make_coro: Callable[[], Awaitable], window_seconds: float, name: str = "background task") -> bool:
+    """
+    Run make_coro() `window_seconds` after the first call for `key`, coalescing every call made
+    meanwhile. Calls that arrive while it is running schedule one more run after another window,
+    so the work runs at most once per window per key. Returns False when there is no running loop.
+    """
+    state = _debounced.get(key)
+    if state is not None:
+        state["dirty"] = True
+        return True
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        logger.warning(f"No running event loop, skipping {name} for {key}")
+        return False
+
+    state = {"dirty": False}
+    _debounced[key] = state
+
+    async def runner():
+        try:
+            while True:
+                await asyncio.sleep(window_seconds)
+                state["dirty"] = False
+                await make_coro()
+                if not state["dirty"]:
+                    break
+        finally:
+            _debounced.pop(key, None)
+
+    spawn(runner(), name)
+    return True
@@ -0,0 +1,268 @@
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pymongo import ReturnDocument
+from app.repository import repo
+from app.services.background_service import spawn_once
+from app.services.chat_session_service import build_chat_profile
+from app.services.llm_gateway import chat_completion
+from app.services.metrics_service import metrics
+
+logger = logging.getLogger(__name__)
+
+CHAT_INTERACTION_TYPES = ["chat_start", "chat_message"]
+
+FALLBACK_RECOMMENDATIONS = ["Focus on comfort and confidence", "Experiment with new styles gradually"]
+
+# The part of the style profile shown alongside the insights. Profile changes mark the view stale.
+PROFILE_VIEW_PROJECTION = {"_id": 0, "style_summary": 1, "style_preferences": 1}
+
+def _field_key(key: Any) -> str:
+    """Insight keys come from the model; make them safe to use as Mongo field names."""
+    return str(key).replace(".", "_").lstrip("$") or "_"
+
+async def record_chat_interaction(user_id: str, interaction_type: str, insights: Optional[Dict] = None) -> None:
+    """
+    Fold a new chat interaction into the user's running aggregates and schedule a refresh.
+    The counters are bumped first so the message's position is known; a second update records
+    the insight values and, per key, the first and last message position it appeared at.
+    """
+    if interaction_type not in CHAT_INTERACTION_TYPES:
+        return
+    # Called before the interaction is handed to the write buffer, so a first-time backfill
+    # covers only earlier history and this interaction is counted below
+    if await repo.chat_insights_collection.count_documents({"user_id": user_id}, limit=1) == 0:
+        await backfill_chat_insights(user_id)
+
+    now = datetime.utcnow()
+    increments = {"total_interactions": 1}
+    if interaction_type == "chat_message":
+        increments["message_count"] = 1
+    doc = await repo.chat_insights_collection.find_one_and_update(
+        {"user_id": user_id},
+        {"$inc": increments, "$set": {"updated_at": now, "stale": True}, "$setOnInsert": {"created_at": now}},
+        projection={"message_count": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+    if interaction_type == "chat_message" and insights:
+        position = doc["message_count"] - 1
+        keys = [_field_key(k) for k in insights]
+        await repo.chat_insights_collection.update_one(
+            {"user_id": user_id},
+            {
+                "$set": {f"insights.{key}": value for key, value in zip(keys, insights.values())},
+                "$addToSet": {"insight_keys": {"$each": keys}},
+                "$min": {f"key_first_seen.{key}": position for key in keys},
+                "$max": {f"key_last_seen.{key}": position for key in keys}
+            }
+        )
+    schedule_chat_insights_refresh(user_id)
+
+def _backfill_pipeline(user_id: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Aggregation producing one row per (user, insight key) with the key's latest value and the
+    first/last chat message position it appeared at, plus the user's interaction counts.
+    Users without any insights yield a single row with a null key.
+    """
+    match: Dict[str, Any] = {"interaction_type": {"$in": CHAT_INTERACTION_TYPES}}
+    if user_id is not None:
+        match["user_id"] = user_id
+    return [
+        {"$match": match},
+        {"$sort": {"created_at": 1}},
+        {"$group": {
+            "_id": "$user_id",
+            "total_interactions": {"$sum": 1},
+            "messages": {"$push": {"$cond": [
+                {"$eq": ["$interaction_type", "chat_message"]},
+                {"$ifNull": ["$metadata.insights", {}]},
+                "$$REMOVE"
+            ]}}
+        }},
+        {"$addFields": {"message_count": {"$size": "$messages"}}},
+        {"$unwind": {"path": "$messages", "includeArrayIndex": "position", "preserveNullAndEmptyArrays": True}},
+        {"$addFields": {"pairs": {"$objectToArray": {"$ifNull": ["$messages", {}]}}}},
+        {"$unwind": {"path": "$pairs", "preserveNullAndEmptyArrays": True}},
+        {"$group": {
+            "_id": {"user_id": "$_id", "key": "$pairs.k"},
+            "total_interactions": {"$first": "$total_interactions"},
+            "message_count": {"$first": "$message_count"},
+            "value": {"$last": "$pairs.v"},
+            "first_seen": {"$min": "$position"},
+            "last_seen": {"$max": "$position"}
+        }}
+    ]
+
+async def backfill_chat_insights(user_id: Optional[str] = None) -> int:
+    """
+    Seed running aggregates from the interaction log with one aggregation, for one user or
+    (user_id=None) everyone. Users that already have aggregates are left untouched.
+    Returns the number of documents created.
+    """
+    docs: Dict[str, Dict[str, Any]] = {}
+    cursor = await repo.user_interactions_collection.aggregate(_backfill_pipeline(user_id), allowDiskUse=True)
+    async for row in cursor:
+        owner = row["_id"]["user_id"]
+        doc = docs.setdefault(owner, {
+            "total_interactions": row["total_interactions"],
+            "message_count": row["message_count"],
+            "insights": {},
+            "insight_keys": [],
+            "key_first_seen": {},
+            "key_last_seen": {}
+        })
+        key = row["_id"].get("key")
+        if key is None:
+            continue
+        key = _field_key(key)
+        doc["insights"][key] = row["value"]
+        doc["insight_keys"].append(key)
+        doc["key_first_seen"][key] = row["first_seen"]
+        doc["key_last_seen"][key] = row["last_seen"]
+
+    created = 0
+    now = datetime.utcnow()
+    for owner, doc in docs.items():
+        result = await repo.chat_insights_collection.update_one(
+            {"user_id": owner},
+            {"$setOnInsert": {**doc, "stale": True, "created_at": now, "updated_at": now}},
+            upsert=True
+        )
+        created += result.upserted_id is not None
+    if created:
+        logger.info(f"Backfilled chat insights for {created} users")
+    return created
+
+def summarize_chat_insights(doc: Optional[Dict]) -> Dict[str, Any]:
+    """The "chat_insights" block of the profile view, built from the running aggregates."""
+    if not doc or not doc.get("total_interactions"):
+        return {"message": "No chat history available"}
+    return {
+        "total_interactions": doc["total_interactions"],
+        "frequent_topics": [],
+        "style_preferences": [],
+        "challenges_mentioned": [],
+        "goals_mentioned": [],
+        **doc.get("insights", {})
+    }
+
+def style_evolution(doc: Optional[Dict]) -> Dict[str, Any]:
+    """
+    Insight keys mentioned in the first half of the user's chat messages vs the second half.
+    A key was in the first half iff it first appeared before the midpoint, and in the second
+    half iff it last appeared at or after it.
+    """
+    message_count = (doc or {}).get("message_count", 0)
+    if not message_count:
+        return {"evolution": "No chat history available"}
+    mid_point = message_count // 2
+    return {
+        "early_preferences": sorted(k for k, pos in doc.get("key_first_seen", {}).items() if pos < mid_point),
+        "recent_preferences": sorted(k for k, pos in doc.get("key_last_seen", {}).items() if pos >= mid_point),
+        "total_interactions": message_count
+    }
+
+def _recommendations_fingerprint(profile: Dict, insight_keys: List[str]) -> str:
+    """
+    Keyed on the profile summary and which insight topics exist, not their latest values:
+    those change with nearly every message and would regenerate recommendations every turn.
+    """
+    payload = json.dumps({"summary": profile.get("summary", ""), "insight_keys": sorted(insight_keys)}, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+async def generate_chat_recommendations(profile: Dict, insights: Dict) -> List[str]:
+    """Personalized style recommendations from the profile summary and chat insights."""
+    prompt = f"""
+Based on the user's style profile and chat insights, generate 5 personalized style recommendations.
+
+Profile: {profile.get('summary', 'No profile')}
+Insights: {insights}
+
+Generate specific, actionable recommendations that would help this user improve their style.
+"""
+    try:
+        response = await chat_completion(
+            "chat.recommendations",
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": "You are a fashion expert. Provide specific style recommendations."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7
+        )
+        result = json.loads(response.choices[0].message.content)
+        return result.get("recommendations", [])
+    except Exception as e:
+        logger.error(f"Error generating recommendations: {e}")
+        return FALLBACK_RECOMMENDATIONS
+
+async def refresh_chat_insights(user_id: str) -> Dict[str, Any]:
+    """
+    Rebuild the materialized profile view from the running aggregates. Recommendations are only
+    regenerated when the profile summary or the set of insight topics changed since the last run.
+    """
+    doc = await repo.chat_insights_collection.find_one({"user_id": user_id}) or {}
+    existing_profile = await repo.style_profiles_collection.find_one({"user_id": user_id}, PROFILE_VIEW_PROJECTION) or {}
+    chat_insights = summarize_chat_insights(doc)
+
+    profile = await build_chat_profile(user_id)
+    fingerprint = _recommendations_fingerprint(profile, doc.get("insight_keys", []))
+    recommendations = (doc.get("view") or {}).get("recommendations")
+    if recommendations is None or doc.get("recommendations_fingerprint") != fingerprint:
+        recommendations = await generate_chat_recommendations(profile, chat_insights)
+        metrics.increment("chat_insights_recommendations_total", outcome="generated")
+    else:
+        metrics.increment("chat_insights_recommendations_total", outcome="reused")
+
+    view = {
+        "existing_profile": existing_profile,
+        "chat_insights": chat_insights,
+        "recommendations": recommendations,
+        "style_evolution": style_evolution(doc)
+    }
+    # Only clear "stale" if no interaction was recorded while this refresh was running
+    await repo.chat_insights_collection.update_one(
+        {"user_id": user_id},
+        {
+            "$set": {"view": view, "recommendations_fingerprint": fingerprint, "refreshed_at": datetime.utcnow()},
+            "$setOnInsert": {"created_at": datetime.utcnow()}
+        },
+        upsert=True
+    )
+    await repo.chat_insights_collection.update_one(
+        {"user_id": user_id, "updated_at": doc.get("updated_at")},
+        {"$set": {"stale": False}}
+    )
+    return view
+
+def schedule_chat_insights_refresh(user_id: str) -> None:
+    spawn_once(("chat_insights", user_id), lambda: refresh_chat_insights(user_id), "chat insights refresh")
+
+async def mark_chat_insights_stale(user_id: str) -> None:
+    """Flag the view for rebuilding after the style profile changed."""
+    await repo.chat_insights_collection.update_one(
+        {"user_id": user_id, "view": {"$exists": True}},
+        {"$set": {"stale": True, "updated_at": datetime.utcnow()}}
+    )
+    schedule_chat_insights_refresh(user_id)
+
+async def get_chat_insights(user_id: str) -> Dict[str, Any]:
+    """
+    Materialized profile view with a single read. Only the first request for a user builds it
+    inline; stale views are served as-is while a background refresh catches up.
+    """
+    doc = await repo.chat_insights_collection.find_one({"user_id": user_id}, {"view": 1, "stale": 1})
+    if doc and doc.get("view") is not None:
+        metrics.increment("chat_insights_reads_total", outcome="stale" if doc.get("stale") else "fresh")
+        if doc.get("stale"):
+            schedule_chat_insights_refresh(user_id)
+        return doc["view"]
+
+    metrics.increment("chat_insights_reads_total", outcome="built")
+    if doc is None:
+        await backfill_chat_insights(user_id)
+    return await refresh_chat_insights(user_id)
@@ -0,0 +1,241 @@
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.config.settings import settings
+from app.repository import repo
+from app.services.background_service import spawn_once
+from app.services.cache_service import TTLCache
+from app.services.llm_gateway import chat_completion
+from app.services.metrics_service import metrics
+from app.services.user_context_service import get_style_context
+
+logger = logging.getLogger(__name__)
+
+# user_id -> session dict ({"user_id", "turns", "summary", "profile"})
+_session_cache = TTLCache(max_size=5000, ttl_seconds=settings.CHAT_SESSION_CACHE_TTL_SECONDS)
+
+async def build_chat_profile(user_id: str) -> Dict[str, Any]:
+    """Profile snapshot the chatbot puts in its prompts, derived from the cached style context."""
+    context = await get_style_context(user_id)
+
+    if context.has_profile:
+        return {
+            "summary": context.style_summary,
+            "preferences": context.style_preferences,
+            "last_updated": context.profile_updated_at or "",
+            "style_categories": context.style_categories,
+            "color_preferences": context.color_preferences,
+            "fit_preferences": context.fit_preferences,
+            "lifestyle": context.lifestyle,
+            "budget_range": context.budget_range or context.price_sensitivity or "",
+            "occasion_preferences": context.occasion_preferences
+        }
+    elif context.has_completed_quiz:
+        # If no profile but quiz data exists, create a basic summary
+        return {
+            "summary": f"Based on your style quiz, you prefer {context.primary_style or 'versatile'} styles with {context.color_palette or 'neutral'} colors.",
+            "preferences": [p for p in (context.primary_style, context.color_palette) if p],
+            "last_updated": "",
+            "style_categories": [context.primary_style] if context.primary_style else [],
+            "color_preferences": [context.color_palette] if context.color_palette else [],
+            "fit_preferences": [context.silhouette_preference] if context.silhouette_preference else [],
+            "lifestyle": "",
+            "budget_range": context.price_sensitivity or "",
+            "occasion_preferences": []
+        }
+    else:
+        return {
+            "summary": "No existing style profile - ready to discover your unique style!",
+            "preferences": [],
+            "last_updated": "Never",
+            "style_categories": [],
+            "color_preferences": [],
+            "fit_preferences": [],
+            "lifestyle": "",
+            "budget_range": "",
+            "occasion_preferences": []
+        }
+
+async def _bootstrap_turns(user_id: str) -> List[Dict[str, Any]]:
+    """Seed a new session from the interaction log (runs once per user)."""
+    interactions = await repo.user_interactions_collection.find({
+        "user_id": user_id,
+        "interaction_type": {"$in": ["chat_start", "chat_message"]}
+    }).sort("created_at", -1).limit(settings.CHAT_SESSION_MAX_TURNS).to_list()
+
+    turns = []
+    for i in reversed(interactions):
+        metadata = i.get("metadata", {})
+        if i["interaction_type"] == "chat_message":
+            turns.append({
+                "turn_id": uuid.uuid4().hex,
+                "user_message": metadata.get("user_message", ""),
+                "bot_response": metadata.get("bot_response", ""),
+                "created_at": i.get("created_at") or datetime.utcnow()
+            })
+        else:
+            turns.append({"turn_id": uuid.uuid4().hex, "bot_response": metadata.get("message", ""), "created_at": i.get("created_at") or datetime.utcnow()})
+    return turns
+
+async def _create_chat_session(user_id: str) -> Dict[str, Any]:
+    """
+    Insert the bootstrapped session unless another request already created it, and return
+    whichever document won. Only the insert writes the seeded turns, so they are stored once.
+    """
+    turns = await _bootstrap_turns(user_id)
+    now = datetime.utcnow()
+    try:
+        return await repo.chat_sessions_collection.find_one_and_update(
+            {"user_id": user_id},
+            {"$setOnInsert": {"turns": turns, "summary": "", "created_at": now, "updated_at": now}},
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Lost the upsert race on the unique user_id index
+        return await repo.chat_sessions_collection.find_one({"user_id": user_id}, {"_id": 0})
+
+async def load_chat_session(user_id: str) -> Dict[str, Any]:
+    """
+    Current session for a user: served from the in-process cache, otherwise one read of the
+    session document. The profile snapshot is filled in (and persisted with the next turn)
+    when the session does not have one yet.
+    """
+    session = _session_cache.get(user_id)
+    if session is not None:
+        metrics.increment("chat_session_cache_total", outcome="hit")
+        return session
+
+    metrics.increment("chat_session_cache_total", outcome="miss")
+    doc = await repo.chat_sessions_collection.find_one({"user_id": user_id}, {"_id": 0})
+    if doc is None:
+        doc = await _create_chat_session(user_id)
+    session = {
+        "user_id": user_id,
+        "turns": doc.get("turns", []),
+        "summary": doc.get("summary", ""),
+        "profile": doc.get("profile")
+    }
+    if session["profile"] is None:
+        session["profile"] = await build_chat_profile(user_id)
+        session["profile_dirty"] = True
+    # A concurrent request may have loaded the session meanwhile; share its copy
+    cached = _session_cache.get(user_id)
+    if cached is not None:
+        return cached
+    _session_cache.set(user_id, session)
+    return session
+
+async def append_chat_turn(user_id: str, turn: Dict[str, Any]) -> None:
+    """Add a turn to the rolling window with a single upsert of the session document."""
+    session = await load_chat_session(user_id)
+    turn = {**turn, "turn_id": uuid.uuid4().hex, "created_at": turn.get("created_at") or datetime.utcnow()}
+    max_turns = settings.CHAT_SESSION_MAX_TURNS
+    session["turns"] = (session["turns"] + [turn])[-max_turns:]
+
+    update = {
+        "$push": {"turns": {"$each": [turn], "$slice": -max_turns}},
+        "$set": {"updated_at": datetime.utcnow()},
+        "$setOnInsert": {"created_at": datetime.utcnow()}
+    }
+    if session.pop("profile_dirty", False):
+        update["$set"]["profile"] = session["profile"]
+    await repo.chat_sessions_collection.update_one({"user_id": user_id}, update, upsert=True)
+
+    if history_needs_compaction(session):
+        spawn_once(("chat_compaction", user_id), lambda: compact_chat_session(user_id), "chat history compaction")
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English prose)."""
+    return (len(text or "") + 3) // 4
+
+def format_turns(turns: List[Dict[str, Any]]) -> str:
+    """Render turns oldest first as "User:"/"Bot:" lines."""
+    lines = []
+    for turn in turns:
+        if turn.get("user_message"):
+            lines.append(f"User: {turn['user_message']}")
+        if turn.get("bot_response"):
+            lines.append(f"Bot: {turn['bot_response']}")
+    return "\n".join(lines)
+
+def format_conversation(session: Dict[str, Any]) -> str:
+    """Conversation context for a prompt: the rolling summary plus only the most recent turns."""
+    parts = []
+    if session.get("summary"):
+        parts.append(f"Summary of earlier conversation: {session['summary']}")
+    recent = format_turns(session["turns"][-settings.CHAT_RECENT_TURNS:])
+    if recent:
+        parts.append(recent)
+    return "\n".join(parts)
+
+def history_needs_compaction(session: Dict[str, Any]) -> bool:
+    if len(session["turns"]) <= settings.CHAT_RECENT_TURNS:
+        return False
+    history = format_turns(session["turns"])
+    return estimate_tokens(history) + estimate_tokens(session.get("summary", "")) > settings.CHAT_HISTORY_TOKEN_BUDGET
+
+async def compact_chat_session(user_id: str) -> None:
+    """
+    Fold every turn except the most recent ones into the rolling summary. The summarized turns
+    are removed by id, so turns appended while the LLM call runs are kept.
+    """
+    session = await load_chat_session(user_id)
+    older = session["turns"][:-settings.CHAT_RECENT_TURNS]
+    if not older:
+        return
+    tokens_before = estimate_tokens(session.get("summary", "")) + estimate_tokens(format_turns(session["turns"]))
+
+    prompt = f"""Update the running summary of a conversation between a user and their personal fashion stylist.
+Keep facts about the user's style, wardrobe, goals, sizes, budget and advice already given. Drop pleasantries.
+Write at most 120 words of plain text.
+
+Current summary:
+{session.get("summary") or "None"}
+
+New turns to fold in:
+{format_turns(older)}"""
+    response = await chat_completion(
+        "chat.summarize",
+        model="gpt-4.1",
+        messages=[
+            {"role": "system", "content": "You maintain concise conversation summaries for a fashion stylist."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.2,
+        max_tokens=250
+    )
+    summary = response.choices[0].message.content.strip()
+    folded = {turn.get("turn_id") for turn in older}
+
+    await repo.chat_sessions_collection.update_one(
+        {"user_id": user_id},
+        {"$set": {"summary": summary}, "$pull": {"turns": {"turn_id": {"$in": list(folded)}}}}
+    )
+    session["summary"] = summary
+    session["turns"] = [turn for turn in session["turns"] if turn.get("turn_id") not in folded]
+
+    tokens_after = estimate_tokens(summary) + estimate_tokens(format_turns(session["turns"]))
+    metrics.observe("chat_history_tokens", tokens_before, stage="before_compaction")
+    metrics.observe("chat_history_tokens", tokens_after, stage="after_compaction")
+    logger.info(f"Compacted {len(older)} chat turns for {user_id}: ~{tokens_before} -> ~{tokens_after} tokens")
+
+async def refresh_chat_session_profile(user_id: str) -> None:
+    """Rebuild the session's profile snapshot after the style profile changed."""
+    profile = await build_chat_profile(user_id)
+    await repo.chat_sessions_collection.update_one({"user_id": user_id}, {"$set": {"profile": profile}})
+    session = _session_cache.get(user_id)
+    if session is not None:
+        session["profile"] = profile
+        session.pop("profile_dirty", None)
+
+def schedule_chat_session_profile_refresh(user_id: str) -> None:
+    spawn_once(("chat_session_profile", user_id), lambda: refresh_chat_session_profile(user_id), "chat session profile refresh")
+
+def clear_chat_session(user_id: str) -> None:
+    """Drop the cached session, e.g. when the account is deleted."""
+    _session_cache.delete(user_id)
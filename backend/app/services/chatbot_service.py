@@ -1,23 +1,84 @@
 import logging
-import openai
-from typing import Dict, List, Optional, Any
-from app.config.settings import settings
-from app.database import style_profiles_collection, style_quizzes_collection, user_interactions_collection
+from typing import AsyncIterator, Dict, List, Optional, Any
+from app.services.background_service import spawn
+from app.services.chat_insights_service import get_chat_insights, record_chat_interaction
+from app.services.chat_session_service import (
+    load_chat_session,
+    append_chat_turn,
+    build_chat_profile,
+    estimate_tokens,
+    format_conversation,
+    format_turns,
+)
+from app.services.metrics_service import metrics
+from app.services.interaction_writer import interaction_writer
+from app.services.llm_gateway import chat_completion, stream_chat_completion
+from app.services.profile_events import notify_style_profile_changed
+from app.repository import repo
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+CHAT_SYSTEM_PROMPT = "You are a world-class fashion expert and personal stylist. You have deep knowledge of the user's style profile and provide expert-level, personalized advice. Be confident, knowledgeable, and show understanding of their unique style."
+
+CHAT_FALLBACK_RESPONSE = {
+    "message": "I'd love to help you with that! Based on your style profile, I can provide some expert recommendations. What specific aspect of your style would you like to improve?",
+    "style_insights": {},
+    "next_questions": ["What specific style area would you like to focus on?"],
+    "suggestions": ["Get personalized recommendations"]
+}
+
+FOLLOW_UP_INSTRUCTIONS = """For both 'next_questions' and 'suggestions', provide example questions or prompts that a user might ask you, the fashion expert, to further the conversation. Phrase them in the first person, as if the user is asking for advice or information (e.g., "How can I add more variety to my wardrobe?" or "What are some comfortable yet stylish fabrics for summer?").
+"""
+
+MESSAGE_JSON_FORMAT = """
+Respond with a JSON object:
+{
+    "message": "Your expert-level response",
+    "style_insights": {"key_insight": "value"},
+    "next_questions": ["Example user follow-up question"],
+    "suggestions": ["Example quick user prompt asking for advice from the AI fashion expert"]
+}
+""" + FOLLOW_UP_INSTRUCTIONS
+
+# Separates the streamed reply text from the trailing structured data
+STRUCTURED_DELIMITER = "<<<STYLE_DATA>>>"
+
+MESSAGE_STREAM_FORMAT = f"""
+Respond in two parts:
+1. Your expert-level response as plain text (no JSON, no markdown headings).
+2. Then a new line containing exactly {STRUCTURED_DELIMITER} followed by a JSON object:
+{{
+    "style_insights": {{"key_insight": "value"}},
+    "next_questions": ["Example user follow-up question"],
+    "suggestions": ["Example quick user prompt asking for advice from the AI fashion expert"]
+}}
+""" + FOLLOW_UP_INSTRUCTIONS
+
+def parse_structured_reply(raw: str) -> Dict[str, Any]:
+    """Parse the JSON part of a streamed reply; missing or malformed data yields empty fields."""
+    import json
+    data = {}
+    start, end = raw.find("{"), raw.rfind("}")
+    if start != -1 and end > start:
+        try:
+            data = json.loads(raw[start:end + 1])
+        except ValueError:
+            logger.warning("Could not parse structured chat data")
+    return {
+        "style_insights": data.get("style_insights") or {},
+        "next_questions": data.get("next_questions") or [],
+        "suggestions": data.get("suggestions") or []
+    }
+
 class StyleChatbot:
-    def __init__(self):
-        self.client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        
     async def start_conversation(self, user_id: str) -> Dict[str, Any]:
         """
         Start a new style chat conversation with personalized initial questions.
         """
         try:
-            # Get user's existing style profile
-            user_profile = await self._get_user_profile(user_id)
+            # Get user's existing style profile from the chat session
+            user_profile = (await load_chat_session(user_id))["profile"]
             
             # Generate personalized initial message
             prompt = f"""
@@ -51,7 +112,8 @@ Respond with a JSON object containing:
 For both 'next_questions' and 'suggestions', provide example questions or prompts that a user might ask you, the fashion expert, to further the conversation. Phrase them in the first person, as if the user is asking for advice or information (e.g., "How can I add more variety to my wardrobe?" or "What are some comfortable yet stylish fabrics for summer?").
 """
             
-            response = await self.client.chat.completions.create(
+            response = await chat_completion(
+                "chat.start",
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": "You are a world-class fashion expert and personal stylist. You have deep knowledge of the user's style profile and provide expert-level, personalized advice. Be confident, knowledgeable, and show understanding of their unique style. Always respond with valid JSON."},
@@ -64,6 +126,7 @@ For both 'next_questions' and 'suggestions', provide example questions or prompt
             result = json.loads(response.choices[0].message.content)
             
             # Log the conversation start
+            await append_chat_turn(user_id, {"bot_response": result["message"]})
             await self._log_interaction(user_id, "chat_start", {
                 "message": result["message"],
                 "questions_asked": result.get("next_questions", [])
@@ -90,12 +153,89 @@ For both 'next_questions' and 'suggestions', provide example questions or prompt
         Process a user message and provide expert-level personalized style advice.
         """
         try:
-            # Get user's style profile and chat history
-            user_profile = await self._get_user_profile(user_id)
-            chat_history = await self._get_chat_history(user_id)
+            context_prompt = await self._build_message_prompt(user_id, message) + MESSAGE_JSON_FORMAT
+            
+            response = await chat_completion(
+                "chat.message",
+                model="gpt-4",
+                messages=[
+                    {"role": "system", "content": CHAT_SYSTEM_PROMPT + " Always respond with valid JSON."},
+                    {"role": "user", "content": context_prompt}
+                ],
+                temperature=0.8
+            )
             
-            # Build context for the AI
-            context_prompt = f"""
+            import json
+            result = json.loads(response.choices[0].message.content)
+            
+            # Logging and profile updates happen after the response is returned
+            spawn(self._record_turn(user_id, message, result, context), "chat turn recording")
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error processing chat message: {e}")
+            return dict(CHAT_FALLBACK_RESPONSE)
+
+    async def stream_message(self, user_id: str, message: str, context: Dict = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of process_message. Yields {"type": "token", "text": ...} events while the
+        reply is generated, then one {"type": "final", ...} event with the full message and the
+        structured insights, questions and suggestions.
+        """
+        context_prompt = await self._build_message_prompt(user_id, message) + MESSAGE_STREAM_FORMAT
+        text = ""
+        structured = ""
+        in_structured = False
+        emitted = 0
+        try:
+            async for delta in stream_chat_completion(
+                "chat.message_stream",
+                model="gpt-4",
+                messages=[
+                    {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+                    {"role": "user", "content": context_prompt}
+                ],
+                temperature=0.8
+            ):
+                if in_structured:
+                    structured += delta
+                    continue
+                if STRUCTURED_DELIMITER in text + delta:
+                    text, structured = (text + delta).split(STRUCTURED_DELIMITER, 1)
+                    in_structured = True
+                    continue
+                text += delta
+                # Hold back a possible partial delimiter at the end of the buffer
+                safe_end = len(text) - (len(STRUCTURED_DELIMITER) - 1)
+                if safe_end > emitted:
+                    yield {"type": "token", "text": text[emitted:safe_end]}
+                    emitted = safe_end
+        except Exception as e:
+            logger.error(f"Error streaming chat message: {e}")
+            if not text:
+                yield {"type": "final", **CHAT_FALLBACK_RESPONSE}
+                return
+
+        text = text.rstrip()
+        if len(text) > emitted:
+            yield {"type": "token", "text": text[emitted:]}
+        result = {"message": text, **parse_structured_reply(structured)}
+        spawn(self._record_turn(user_id, message, result, context), "chat turn recording")
+        yield {"type": "final", **result}
+
+    async def _build_message_prompt(self, user_id: str, message: str) -> str:
+        """Prompt for a chat turn without the response format instructions."""
+        # Profile snapshot, rolling summary and recent turns all live on the chat session (cached in-process)
+        session = await load_chat_session(user_id)
+        user_profile = session["profile"]
+        conversation = format_conversation(session)
+        
+        # Track how much the summary saves compared with sending every stored turn
+        metrics.observe("chat_prompt_history_tokens", estimate_tokens(format_turns(session["turns"])), variant="raw")
+        metrics.observe("chat_prompt_history_tokens", estimate_tokens(conversation), variant="compacted")
+        
+        return f"""
 You are a world-class fashion expert and personal stylist. You have deep knowledge of the user's complete style profile and can provide expert-level, personalized advice.
 
 User's Complete Style Profile:
@@ -110,7 +250,7 @@ Occasion Preferences: {user_profile.get('occasion_preferences', [])}
 Profile Last Updated: {user_profile.get('last_updated', 'Never')}
 
 Recent Conversation:
-{self._format_chat_history(chat_history) if chat_history else 'No recent history'}
+{conversation or 'No recent history'}
 
 User's Current Message: "{message}"
 
@@ -129,69 +269,29 @@ IMPORTANT:
 - Keep responses concise but impactful
 - Focus on helping them improve and evolve their style
 - If they ask questions, provide expert answers first, then ask strategic follow-ups
-
-Respond with a JSON object:
-{{
-    "message": "Your expert-level response",
-    "style_insights": {{"key_insight": "value"}},
-    "next_questions": ["Example user follow-up question"],
-    "suggestions": ["Example quick user prompt asking for advice from the AI fashion expert"]
-}}
-For both 'next_questions' and 'suggestions', provide example questions or prompts that a user might ask you, the fashion expert, to further the conversation. Phrase them in the first person, as if the user is asking for advice or information (e.g., "How can I add more variety to my wardrobe?" or "What are some comfortable yet stylish fabrics for summer?").
 """
-            
-            response = await self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a world-class fashion expert and personal stylist. You have deep knowledge of the user's style profile and provide expert-level, personalized advice. Be confident, knowledgeable, and show understanding of their unique style. Always respond with valid JSON."},
-                    {"role": "user", "content": context_prompt}
-                ],
-                temperature=0.8
-            )
-            
-            import json
-            result = json.loads(response.choices[0].message.content)
-            
-            # Log the interaction
-            await self._log_interaction(user_id, "chat_message", {
-                "user_message": message,
-                "bot_response": result["message"],
-                "insights": result.get("style_insights", {}),
-                "context": context
-            })
-            
-            # Update user's style profile based on new insights
-            if result.get("style_insights"):
-                await self._update_style_profile(user_id, result["style_insights"])
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"Error processing chat message: {e}")
-            return {
-                "message": "I'd love to help you with that! Based on your style profile, I can provide some expert recommendations. What specific aspect of your style would you like to improve?",
-                "style_insights": {},
-                "next_questions": ["What specific style area would you like to focus on?"],
-                "suggestions": ["Get personalized recommendations"]
-            }
+
+    async def _record_turn(self, user_id: str, message: str, result: Dict, context: Dict = None):
+        """Log a chat turn and fold its insights into the style profile."""
+        await append_chat_turn(user_id, {"user_message": message, "bot_response": result["message"]})
+        await self._log_interaction(user_id, "chat_message", {
+            "user_message": message,
+            "bot_response": result["message"],
+            "insights": result.get("style_insights", {}),
+            "context": context
+        })
+        
+        # Update user's style profile based on new insights
+        if result.get("style_insights"):
+            await self._update_style_profile(user_id, result["style_insights"])
     
     async def get_user_style_profile(self, user_id: str) -> Dict[str, Any]:
         """
         Get comprehensive style profile insights from chat interactions.
         """
         try:
-            # Get existing profile
-            profile = style_profiles_collection.find_one({"user_id": user_id})
-            
-            # Get chat insights
-            chat_insights = await self._analyze_chat_insights(user_id)
-            
-            return {
-                "existing_profile": profile or {},
-                "chat_insights": chat_insights,
-                "recommendations": await self._generate_recommendations(user_id),
-                "style_evolution": await self._get_style_evolution(user_id)
-            }
+            # Materialized per-user view, kept current in the background as chat turns arrive
+            return await get_chat_insights(user_id)
             
         except Exception as e:
             logger.error(f"Error getting style profile: {e}")
@@ -199,71 +299,7 @@ For both 'next_questions' and 'suggestions', provide example questions or prompt
     
     async def _get_user_profile(self, user_id: str) -> Dict[str, Any]:
         """Get user's existing style profile with comprehensive details."""
-        profile = style_profiles_collection.find_one({"user_id": user_id})
-        quiz_data = style_quizzes_collection.find_one({"user_id": user_id})
-        
-        if profile:
-            return {
-                "summary": profile.get("style_summary", ""),
-                "preferences": profile.get("style_preferences", []),
-                "last_updated": profile.get("updated_at", ""),
-                "style_categories": profile.get("style_categories", []),
-                "color_preferences": profile.get("color_preferences", []),
-                "fit_preferences": profile.get("fit_preferences", []),
-                "lifestyle": profile.get("lifestyle", ""),
-                "budget_range": profile.get("budget_range", ""),
-                "occasion_preferences": profile.get("occasion_preferences", [])
-            }
-        elif quiz_data:
-            # If no profile but quiz data exists, create a basic summary
-            return {
-                "summary": f"Based on your style quiz, you prefer {quiz_data.get('style_preference', 'versatile')} styles with {quiz_data.get('color_preference', 'neutral')} colors.",
-                "preferences": [quiz_data.get('style_preference', ''), quiz_data.get('color_preference', '')],
-                "last_updated": quiz_data.get("created_at", ""),
-                "style_categories": [quiz_data.get('style_preference', '')],
-                "color_preferences": [quiz_data.get('color_preference', '')],
-                "fit_preferences": [quiz_data.get('fit_preference', '')],
-                "lifestyle": quiz_data.get('lifestyle', ''),
-                "budget_range": quiz_data.get('budget_range', ''),
-                "occasion_preferences": [quiz_data.get('occasion', '')]
-            }
-        else:
-            return {
-                "summary": "No existing style profile - ready to discover your unique style!",
-                "preferences": [],
-                "last_updated": "Never",
-                "style_categories": [],
-                "color_preferences": [],
-                "fit_preferences": [],
-                "lifestyle": "",
-                "budget_range": "",
-                "occasion_preferences": []
-            }
-    
-    async def _get_chat_history(self, user_id: str, limit: int = 10) -> List[Dict]:
-        """Get recent chat history for context."""
-        interactions = list(user_interactions_collection.find({
-            "user_id": user_id,
-            "interaction_type": {"$in": ["chat_start", "chat_message"]}
-        }).sort("created_at", -1).limit(limit))
-        
-        # Build a more detailed history including user messages
-        history = []
-        for i in interactions:
-            if i["interaction_type"] == "chat_message":
-                metadata = i.get("metadata", {})
-                history.append({
-                    "type": "user_message",
-                    "content": metadata.get("user_message", ""),
-                    "bot_response": metadata.get("bot_response", "")
-                })
-            else:
-                history.append({
-                    "type": "chat_start",
-                    "content": i.get("metadata", {}).get("message", "")
-                })
-        
-        return history
+        return await build_chat_profile(user_id)
     
     async def _log_interaction(self, user_id: str, interaction_type: str, metadata: Dict):
         """Log chat interactions for analysis."""
@@ -273,17 +309,19 @@ For both 'next_questions' and 'suggestions', provide example questions or prompt
             "metadata": metadata,
             "created_at": datetime.utcnow()
         }
-        user_interactions_collection.insert_one(interaction)
+        await record_chat_interaction(user_id, interaction_type, metadata.get("insights"))
+        interaction_writer.add(interaction)
     
     async def _update_style_profile(self, user_id: str, insights: Dict):
         """Update user's style profile with new insights from chat."""
         try:
             # Get current profile
-            current_profile = style_profiles_collection.find_one({"user_id": user_id})
+            current_profile = await repo.style_profiles_collection.find_one({"user_id": user_id}, {"_id": 1})
+            new_preferences = insights.get("new_preferences", [])
             
             if current_profile:
                 # Update existing profile
-                style_profiles_collection.update_one(
+                await repo.style_profiles_collection.update_one(
                     {"user_id": user_id},
                     {
                         "$set": {
@@ -292,7 +330,7 @@ For both 'next_questions' and 'suggestions', provide example questions or prompt
                         },
                         "$push": {
                             "style_preferences": {
-                                "$each": insights.get("new_preferences", [])
+                                "$each": new_preferences
                             }
                         }
                     }
@@ -302,123 +340,17 @@ For both 'next_questions' and 'suggestions', provide example questions or prompt
                 new_profile = {
                     "user_id": user_id,
                     "style_summary": insights.get("style_summary", ""),
-                    "style_preferences": insights.get("new_preferences", []),
+                    "style_preferences": new_preferences,
                     "chat_insights": insights,
                     "created_at": datetime.utcnow(),
                     "updated_at": datetime.utcnow()
                 }
-                style_profiles_collection.insert_one(new_profile)
+                await repo.style_profiles_collection.insert_one(new_profile)
+
+            # Most turns only refresh chat_insights; regenerate derived data only when the summary
+            # or preferences that feed it changed
+            if not current_profile or new_preferences:
+                await notify_style_profile_changed(user_id)
                 
         except Exception as e:
             logger.error(f"Error updating style profile: {e}")
-    
-    async def _analyze_chat_insights(self, user_id: str) -> Dict[str, Any]:
-        """Analyze chat interactions to extract style insights."""
-        try:
-            # Get all chat interactions
-            interactions = list(user_interactions_collection.find({
-                "user_id": user_id,
-                "interaction_type": {"$in": ["chat_start", "chat_message"]}
-            }).sort("created_at", -1))
-            
-            if not interactions:
-                return {"message": "No chat history available"}
-            
-            # Analyze patterns in chat
-            insights = {
-                "total_interactions": len(interactions),
-                "frequent_topics": [],
-                "style_preferences": [],
-                "challenges_mentioned": [],
-                "goals_mentioned": []
-            }
-            
-            # Extract insights from chat metadata
-            for interaction in interactions:
-                metadata = interaction.get("metadata", {})
-                if "insights" in metadata:
-                    insights.update(metadata["insights"])
-            
-            return insights
-            
-        except Exception as e:
-            logger.error(f"Error analyzing chat insights: {e}")
-            return {"error": "Failed to analyze chat insights"}
-    
-    async def _generate_recommendations(self, user_id: str) -> List[str]:
-        """Generate personalized style recommendations based on chat history."""
-        try:
-            profile = await self._get_user_profile(user_id)
-            insights = await self._analyze_chat_insights(user_id)
-            
-            prompt = f"""
-Based on the user's style profile and chat insights, generate 5 personalized style recommendations.
-
-Profile: {profile.get('summary', 'No profile')}
-Insights: {insights}
-
-Generate specific, actionable recommendations that would help this user improve their style.
-"""
-            
-            response = await self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a fashion expert. Provide specific style recommendations."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7
-            )
-            
-            import json
-            result = json.loads(response.choices[0].message.content)
-            return result.get("recommendations", [])
-            
-        except Exception as e:
-            logger.error(f"Error generating recommendations: {e}")
-            return ["Focus on comfort and confidence", "Experiment with new styles gradually"]
-    
-    async def _get_style_evolution(self, user_id: str) -> Dict[str, Any]:
-        """Get style evolution insights from chat interactions."""
-        try:
-            interactions = list(user_interactions_collection.find({
-                "user_id": user_id,
-                "interaction_type": "chat_message"
-            }).sort("created_at", 1))
-            
-            if not interactions:
-                return {"evolution": "No chat history available"}
-            
-            # Analyze style preferences over time
-            early_preferences = []
-            recent_preferences = []
-            
-            mid_point = len(interactions) // 2
-            
-            for i, interaction in enumerate(interactions):
-                insights = interaction.get("metadata", {}).get("insights", {})
-                if i < mid_point:
-                    early_preferences.extend(list(insights.keys()))
-                else:
-                    recent_preferences.extend(list(insights.keys()))
-            
-            return {
-                "early_preferences": list(set(early_preferences)),
-                "recent_preferences": list(set(recent_preferences)),
-                "total_interactions": len(interactions)
-            }
-            
-        except Exception as e:
-            logger.error(f"Error getting style evolution: {e}")
-            return {"error": "Failed to get style evolution"}
-
-    def _format_chat_history(self, chat_history: List[Dict]) -> str:
-        """Format chat history for display in prompt."""
-        formatted_history = []
-        for interaction in chat_history[-5:]:  # Only last 5 interactions
-            if interaction["type"] == "user_message":
-                formatted_history.append(f"User: {interaction['content']}")
-                if interaction.get('bot_response'):
-                    formatted_history.append(f"Bot: {interaction['bot_response']}")
-            elif interaction["type"] == "chat_start":
-                formatted_history.append(f"Bot: {interaction['content']}")
-        return "\n".join(formatted_history) 
\ No newline at end of file
@@ -0,0 +1,131 @@
+import math
+import re
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from app.services.cache_service import TTLCache
+
+# Named palette used to describe garment colors in search queries and facets.
+# Names are the terms shoppers search for, so several near-identical shades share a name.
+NAMED_COLORS = {
+    # Neutrals
+    "black": "#000000", "jet black": "#0a0a0a", "off black": "#1c1c1c", "charcoal": "#36454f",
+    "graphite": "#474a51", "dark gray": "#555555", "gray": "#808080", "heather gray": "#9a9a9a",
+    "light gray": "#c8c8c8", "silver": "#c0c0c0", "ash gray": "#b2beb5", "white": "#ffffff",
+    "off white": "#f8f4ec", "ivory": "#fffff0", "cream": "#fffdd0", "ecru": "#e3dcc2",
+    "bone": "#e3dac9", "oatmeal": "#d9ceb8", "stone": "#b9ad9a", "sand": "#c2b280",
+    "beige": "#d9c7a7", "taupe": "#8b8589", "greige": "#a89f91", "mushroom": "#a39382",
+    "nude": "#e3bc9a", "tan": "#d2b48c", "khaki": "#c3b091", "camel": "#c19a6b",
+    # Browns
+    "light brown": "#a67b5b", "brown": "#8b5a2b", "cognac": "#9a463d", "chestnut": "#954535",
+    "rust": "#b7410e", "terracotta": "#e2725b", "copper": "#b87333", "caramel": "#af6f09",
+    "toffee": "#755139", "mocha": "#6f4e37", "chocolate": "#5c3317", "espresso": "#3c2218",
+    "dark brown": "#4b3621", "walnut": "#5d432c",
+    # Reds and pinks
+    "red": "#d0312d", "bright red": "#ff0000", "cherry red": "#a4161a", "crimson": "#dc143c",
+    "scarlet": "#ff2400", "brick red": "#8b2e23", "burgundy": "#800020", "wine": "#722f37",
+    "maroon": "#800000", "oxblood": "#4a0000", "coral": "#ff7f50", "salmon": "#fa8072",
+    "peach": "#ffcba4", "blush": "#f4c2c2", "dusty pink": "#d8a1a4", "light pink": "#ffc0cb",
+    "pink": "#ff69b4", "hot pink": "#ff1493", "fuchsia": "#ff00ff", "magenta": "#c2185b",
+    "rose": "#e8a0a8", "mauve": "#b784a7", "raspberry": "#b3446c",
+    # Oranges and yellows
+    "orange": "#ff8c00", "burnt orange": "#cc5500", "tangerine": "#f28500", "apricot": "#fbceb1",
+    "mustard": "#e1ad01", "gold": "#d4af37", "amber": "#ffbf00", "yellow": "#ffdd00",
+    "lemon yellow": "#fff44f", "butter yellow": "#fff1a8", "pale yellow": "#fffacd", "ochre": "#cc7722",
+    # Greens
+    "olive": "#708238", "olive green": "#556b2f", "army green": "#4b5320", "khaki green": "#8a865d",
+    "sage": "#9caf88", "sage green": "#b2ac88", "mint": "#98ff98", "mint green": "#aaf0d1",
+    "pistachio": "#93c572", "lime": "#32cd32", "neon green": "#39ff14", "kelly green": "#4cbb17",
+    "green": "#228b22", "emerald": "#50c878", "forest green": "#1b4d3e", "hunter green": "#355e3b",
+    "bottle green": "#006a4e", "dark green": "#013220", "teal": "#008080", "dark teal": "#014d4e",
+    "seafoam": "#93e9be", "moss": "#8a9a5b",
+    # Blues
+    "navy": "#000080", "navy blue": "#1f2a44", "midnight blue": "#191970", "dark blue": "#00008b",
+    "royal blue": "#4169e1", "cobalt": "#0047ab", "blue": "#0000ff", "electric blue": "#7df9ff",
+    "denim blue": "#1560bd", "indigo": "#3f51b5", "light wash denim": "#8fa8c8", "dark wash denim": "#2e3f5c",
+    "slate blue": "#6a5acd", "steel blue": "#4682b4", "dusty blue": "#7393b3", "powder blue": "#b0e0e6",
+    "baby blue": "#89cff0", "sky blue": "#87ceeb", "light blue": "#add8e6", "cornflower blue": "#6495ed",
+    "periwinkle": "#ccccff", "turquoise": "#40e0d0", "aqua": "#00ffff", "cyan": "#00b7eb",
+    "petrol blue": "#005f6a",
+    # Purples
+    "purple": "#800080", "dark purple": "#301934", "plum": "#8e4585", "eggplant": "#614051",
+    "violet": "#8f00ff", "lavender": "#e6e6fa", "lilac": "#c8a2c8", "orchid": "#da70d6",
+    "amethyst": "#9966cc", "grape": "#6f2da8",
+}
+
+_HEX_RE = re.compile(r"^#([0-9a-fA-F]{6}|[0-9a-fA-F]{3})$")
+
+# D65 reference white for sRGB -> CIELAB
+_D65 = np.array([0.95047, 1.0, 1.08883])
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+
+# Results are deterministic, so entries never expire and are only evicted as least recently used
+_name_cache = TTLCache(max_size=4096, ttl_seconds=math.inf)
+
+
+def parse_hex(hex_color: str) -> Optional[str]:
+    """Normalize '#ABC' or '#AABBCC' to '#aabbcc'; None when the value is not a hex color."""
+    match = _HEX_RE.match((hex_color or "").strip())
+    if not match:
+        return None
+    digits = match.group(1).lower()
+    if len(digits) == 3:
+        digits = "".join(c * 2 for c in digits)
+    return f"#{digits}"
+
+
+def hex_to_rgb_array(hex_colors: Iterable[str]) -> np.ndarray:
+    """(N, 3) uint8 array from normalized '#rrggbb' strings."""
+    return np.array([[int(h[i:i + 2], 16) for i in (1, 3, 5)] for h in hex_colors], dtype=np.uint8).reshape(-1, 3)
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Convert an (N, 3) array of 0-255 sRGB values to CIELAB (D65)."""
+    srgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(srgb > 0.04045, ((srgb + 0.055) / 1.055) ** 2.4, srgb / 12.92)
+    xyz = linear @ _RGB_TO_XYZ.T / _D65
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    l = 116 * f[:, 1] - 16
+    a = 500 * (f[:, 0] - f[:, 1])
+    b = 200 * (f[:, 1] - f[:, 2])
+    return np.stack([l, a, b], axis=1)
+
+
+_PALETTE_NAMES = list(NAMED_COLORS)
+_PALETTE_LAB = rgb_to_lab(hex_to_rgb_array(NAMED_COLORS.values()))
+
+
+def nearest_color_names(hex_colors: List[str]) -> List[str]:
+    """
+    Name a batch of colors with one vectorized nearest-neighbour lookup (CIE76 distance in CIELAB).
+    Cached colors skip the lookup; invalid values map to "".
+    """
+    names = [""] * len(hex_colors)
+    misses: Dict[str, List[int]] = {}
+    for i, value in enumerate(hex_colors):
+        hex_color = parse_hex(value)
+        if not hex_color:
+            continue
+        cached = _name_cache.get(hex_color)
+        if cached is not None:
+            names[i] = cached
+        else:
+            misses.setdefault(hex_color, []).append(i)
+
+    if misses:
+        lab = rgb_to_lab(hex_to_rgb_array(misses))
+        distances = ((lab[:, None, :] - _PALETTE_LAB[None, :, :]) ** 2).sum(axis=2)
+        for hex_color, palette_index in zip(misses, distances.argmin(axis=1)):
+            name = _PALETTE_NAMES[palette_index]
+            _name_cache.set(hex_color, name)
+            for i in misses[hex_color]:
+                names[i] = name
+    return names
+
+
+def color_name(hex_color: str) -> str:
+    """Human-readable name for a single hex color ("" when it cannot be parsed)."""
+    return nearest_color_names([hex_color])[0]
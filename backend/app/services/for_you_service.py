@@ -0,0 +1,159 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from pymongo import ReturnDocument
+from app.config.settings import settings
+from app.repository import repo
+from app.services.background_service import spawn_once
+from app.services.interaction_writer import get_recent_interactions, interaction_writer
+from app.services.llm_gateway import create_response
+from app.services.metrics_service import metrics
+from app.services.user_context_service import get_style_context
+from models.user_models import StyleContext
+
+logger = logging.getLogger(__name__)
+
+# Only the strongest categories count toward a "meaningful" profile change; rewording the
+# summary or nudging confidence scores does not regenerate the feed
+SIGNATURE_CATEGORIES = 3
+
+def profile_signature(context: StyleContext) -> List[str]:
+    """Top style categories, strongest first, that the stored recommendations were built from."""
+    preferences = sorted(
+        (p for p in context.style_preferences if isinstance(p, dict) and p.get("category")),
+        key=lambda p: -(p.get("confidence_score") or 0)
+    )
+    return [str(p["category"]).lower() for p in preferences[:SIGNATURE_CATEGORIES]]
+
+async def generate_recommendations(context: StyleContext, recent_interactions: List[dict]) -> Optional[List[dict]]:
+    """Generate personalized recommendations using GPT. Returns None if the model call or its output fails."""
+    interactions_text = "\n".join([
+        f"Type: {i['interaction_type']}, Item: {i.get('item_id')}, Metadata: {i.get('metadata', {})}"
+        for i in recent_interactions
+    ])
+
+    prompt = f"""Based on the user's style profile and recent interactions, generate personalized recommendations:
+
+    Style Profile:
+    {context.style_summary}
+
+    Recent Interactions:
+    {interactions_text}
+
+    Please provide recommendations in the following JSON format:
+    {{
+        "recommendations": [
+            {{
+                "item_type": "string",
+                "description": "string",
+                "reasoning": "string",
+                "confidence_score": float
+            }}
+        ]
+    }}
+    """
+
+    try:
+        response = await create_response(
+            "quiz.recommendations",
+            model="gpt-4.1",
+            input=[
+                {"role": "system", "content": "You are a fashion expert providing personalized recommendations. Always respond with valid JSON."},
+                {"role": "user", "content": prompt}
+            ]
+        )
+        result = json.loads(response.output_text)
+        if not isinstance(result.get("recommendations"), list):
+            raise ValueError("Missing recommendations field in response")
+        return result["recommendations"]
+    except Exception as e:
+        logger.error(f"Error generating For You recommendations: {e}")
+        return None
+
+async def _interactions_since(user_id: str, since: datetime, limit: int) -> int:
+    """Interactions recorded after `since` (stored or still buffered), counted up to `limit`."""
+    pending = sum(1 for e in interaction_writer.pending(user_id) if e.get("created_at") and e["created_at"] > since)
+    if pending >= limit:
+        return pending
+    stored = await repo.user_interactions_collection.count_documents(
+        {"user_id": user_id, "created_at": {"$gt": since}},
+        limit=limit - pending
+    )
+    return pending + stored
+
+async def stale_reason(doc: Optional[Dict[str, Any]], context: StyleContext) -> Optional[str]:
+    """Why the stored recommendations should be regenerated, or None if they are still good."""
+    if not doc or doc.get("recommendations") is None:
+        return "missing"
+    if doc.get("profile_signature") != profile_signature(context):
+        return "profile"
+    generated_at = doc.get("generated_at")
+    if not generated_at or datetime.utcnow() - generated_at > timedelta(seconds=settings.FOR_YOU_MAX_AGE_SECONDS):
+        return "age"
+    threshold = settings.FOR_YOU_REFRESH_INTERACTIONS
+    if await _interactions_since(doc["user_id"], generated_at, threshold) >= threshold:
+        return "interactions"
+    return None
+
+async def refresh_for_you_recommendations(user_id: str, force: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Regenerate and store the user's recommendations if they are stale (or `force`).
+    Returns the stored document, or None if the user has no profile or generation failed.
+    """
+    context = await get_style_context(user_id)
+    if not context.has_profile:
+        return None
+    doc = await repo.for_you_recommendations_collection.find_one({"user_id": user_id})
+    reason = "forced" if force else await stale_reason(doc, context)
+    if reason is None:
+        return doc
+
+    recent_interactions = await get_recent_interactions(user_id, limit=50)
+    recommendations = await generate_recommendations(context, recent_interactions)
+    if recommendations is None:
+        metrics.increment("for_you_refresh_total", outcome="failed")
+        return None
+    metrics.increment("for_you_refresh_total", outcome=reason)
+
+    now = datetime.utcnow()
+    update = {
+        "recommendations": recommendations,
+        "profile_signature": profile_signature(context),
+        "generated_at": now
+    }
+    return await repo.for_you_recommendations_collection.find_one_and_update(
+        {"user_id": user_id},
+        {"$set": update, "$setOnInsert": {"created_at": now}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+def schedule_for_you_refresh(user_id: str) -> None:
+    """Check the stored recommendations in the background and regenerate them if needed."""
+    spawn_once(("for_you", user_id), lambda: refresh_for_you_recommendations(user_id), "For You refresh")
+
+async def get_for_you_recommendations(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Stored recommendations with their freshness. Only the first request for a user generates
+    them inline; later reads return the stored copy and refresh it in the background when old.
+    """
+    doc = await repo.for_you_recommendations_collection.find_one({"user_id": user_id})
+    if doc is None or doc.get("recommendations") is None:
+        metrics.increment("for_you_reads_total", outcome="built")
+        doc = await refresh_for_you_recommendations(user_id, force=True)
+        if doc is None:
+            return None
+    else:
+        metrics.increment("for_you_reads_total", outcome="stored")
+
+    age = datetime.utcnow() - doc["generated_at"]
+    stale = age > timedelta(seconds=settings.FOR_YOU_MAX_AGE_SECONDS)
+    if stale:
+        schedule_for_you_refresh(user_id)
+    return {
+        "recommendations": doc["recommendations"],
+        "generated_at": doc["generated_at"],
+        "age_seconds": int(age.total_seconds()),
+        "stale": stale
+    }
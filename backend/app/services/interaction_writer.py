@@ -0,0 +1,164 @@
+import asyncio
+import glob
+import logging
+import os
+from typing import Any, Dict, List, Optional
+from bson import json_util
+from pymongo.errors import BulkWriteError
+from app.config.settings import settings
+from app.repository import repo
+from app.services.metrics_service import metrics
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class InteractionWriter:
+    """
+    Write-behind buffer for user_interactions. Events are appended in memory and written with
+    insert_many once INTERACTION_BATCH_SIZE are pending or every INTERACTION_FLUSH_INTERVAL_SECONDS.
+    Batches that cannot be written are spilled to JSON lines files in INTERACTION_SPILL_DIR and
+    replayed by the next successful flush (in any worker).
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, spill_dir: str):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_dir = spill_dir
+        self._buffer: List[Dict[str, Any]] = []
+        self._in_flight: List[Dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.Task] = None
+
+    @property
+    def spill_path(self) -> str:
+        return os.path.join(self.spill_dir, f"interactions-{os.getpid()}.jsonl")
+
+    def add(self, event: Dict[str, Any]) -> None:
+        """Queue an interaction; a full batch triggers a background flush."""
+        self._buffer.append(event)
+        metrics.set_gauge("interactions_buffered", len(self._buffer))
+        if len(self._buffer) >= self.batch_size and (self._flush_task is None or self._flush_task.done()):
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                pass  # No loop (e.g. a sync script); the next flush picks it up
+
+    def pending(self, user_id: str) -> List[Dict[str, Any]]:
+        """Events for a user that are not in Mongo yet, newest first (read-your-writes)."""
+        events = [e for e in self._in_flight + self._buffer if e.get("user_id") == user_id]
+        return events[::-1]
+
+    async def flush(self) -> int:
+        """Write everything buffered (plus any spilled batches). Returns the number of events written."""
+        async with self._flush_lock:
+            written = 0
+            while self._buffer:
+                self._in_flight, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+                metrics.set_gauge("interactions_buffered", len(self._buffer))
+                batch = self._in_flight
+                try:
+                    await self._insert(batch)
+                    written += len(batch)
+                    metrics.increment("interactions_flushed_total", len(batch))
+                except (Exception, asyncio.CancelledError) as e:
+                    # Anything taken off the buffer is spilled, including when the flush is cancelled
+                    # (e.g. at shutdown), so a failed or interrupted write never drops events
+                    logger.error(f"Interaction flush failed ({e!r}), spilling {len(batch) + len(self._buffer)} events to disk")
+                    self._spill(batch)
+                    self._spill(self._buffer)
+                    self._buffer = []
+                    metrics.set_gauge("interactions_buffered", 0)
+                    if isinstance(e, asyncio.CancelledError):
+                        raise
+                    return written
+                finally:
+                    self._in_flight = []
+            return written + await self._replay_spilled()
+
+    async def _insert(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            await repo.user_interactions_collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Replays of partially written batches hit duplicate _ids; anything else is a real failure
+            if any(err.get("code") != DUPLICATE_KEY_ERROR for err in e.details.get("writeErrors", [])):
+                raise
+            if e.details.get("writeConcernErrors"):
+                raise
+
+    def _spill(self, events: List[Dict[str, Any]]) -> None:
+        if not events:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json_util.dumps(event) + "\n")
+        metrics.increment("interactions_spilled_total", len(events))
+
+    async def _replay_spilled(self) -> int:
+        """Insert spilled files; each is claimed by an atomic rename so only one worker replays it."""
+        replayed = 0
+        for path in glob.glob(os.path.join(self.spill_dir, "interactions-*.jsonl")):
+            claimed = f"{path}.replay-{os.getpid()}"
+            try:
+                os.replace(path, claimed)
+            except OSError:
+                continue
+            with open(claimed, encoding="utf-8") as f:
+                events = [json_util.loads(line) for line in f if line.strip()]
+            try:
+                for start in range(0, len(events), self.batch_size):
+                    await self._insert(events[start:start + self.batch_size])
+            except (Exception, asyncio.CancelledError) as e:
+                logger.error(f"Replaying spilled interactions failed: {e!r}")
+                self._spill(events)
+                os.remove(claimed)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                break
+            os.remove(claimed)
+            replayed += len(events)
+            logger.info(f"Replayed {len(events)} spilled interactions")
+        return replayed
+
+    async def _run_timer(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Interaction flush failed: {e}")
+
+    def start(self) -> None:
+        """Start the periodic flush on the running event loop."""
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.get_running_loop().create_task(self._run_timer())
+
+    async def stop(self) -> None:
+        """Stop the timer and flush whatever is left (graceful shutdown)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            try:
+                await self._timer
+            except asyncio.CancelledError:
+                pass
+            self._timer = None
+        await self.flush()
+
+
+interaction_writer = InteractionWriter(
+    batch_size=settings.INTERACTION_BATCH_SIZE,
+    flush_interval=settings.INTERACTION_FLUSH_INTERVAL_SECONDS,
+    spill_dir=settings.INTERACTION_SPILL_DIR,
+)
+
+
+async def get_recent_interactions(user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """Newest interactions for a user, including ones still waiting in the write buffer."""
+    pending = interaction_writer.pending(user_id)[:limit]
+    stored = await repo.user_interactions_collection.find(
+        {"user_id": user_id}
+    ).sort("created_at", -1).limit(limit).to_list(limit)
+    return (pending + stored)[:limit]
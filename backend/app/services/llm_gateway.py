@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Tuple
+import httpx
+import openai
+from app.config.settings import settings
+from app.services.metrics_service import metrics
+from app.services.resilience_service import ProviderTimeoutError, openai_provider
+
+logger = logging.getLogger(__name__)
+
+# Shared pooled clients. Retries and deadlines are handled here and by openai_provider,
+# so the SDK's own retry loop is disabled.
+_limits = httpx.Limits(
+    max_connections=settings.LLM_CONNECTION_POOL_SIZE,
+    max_keepalive_connections=settings.LLM_CONNECTION_POOL_SIZE,
+)
+async_client = openai.AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    max_retries=0,
+    timeout=settings.OPENAI_TIMEOUT_SECONDS,
+    http_client=openai.DefaultAsyncHttpxClient(limits=_limits),
+)
+sync_client = openai.OpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    max_retries=0,
+    timeout=settings.OPENAI_TIMEOUT_SECONDS,
+    http_client=openai.DefaultHttpxClient(limits=_limits),
+)
+
+# Errors worth retrying: rate limits, transient server/network failures and deadline misses.
+# An open circuit (ProviderUnavailableError) is not retried.
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    ProviderTimeoutError,
+)
+
+# Async callers share one global limit plus one per call site; blocking callers running in
+# worker threads get thread semaphores with the same limits. asyncio semaphores belong to one
+# event loop, so they are created lazily per running loop (tests and scripts use several).
+GLOBAL_LIMIT = "*"
+_loop_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+_global_thread_semaphore = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY)
+_call_site_thread_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_semaphore_lock = threading.Lock()
+_in_flight = 0
+
+
+def _async_semaphores(call_site: str) -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+    """The global and per-call-site semaphores for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _semaphore_lock:
+        semaphores = _loop_semaphores.setdefault(loop, {})
+        if GLOBAL_LIMIT not in semaphores:
+            semaphores[GLOBAL_LIMIT] = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        if call_site not in semaphores:
+            semaphores[call_site] = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY_PER_CALL_SITE)
+        return semaphores[GLOBAL_LIMIT], semaphores[call_site]
+
+
+def _call_site_thread_semaphore(call_site: str) -> threading.BoundedSemaphore:
+    with _semaphore_lock:
+        if call_site not in _call_site_thread_semaphores:
+            _call_site_thread_semaphores[call_site] = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY_PER_CALL_SITE)
+        return _call_site_thread_semaphores[call_site]
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY_SECONDS, settings.LLM_RETRY_BASE_DELAY_SECONDS * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+@contextmanager
+def _track_in_flight():
+    global _in_flight
+    with _semaphore_lock:
+        _in_flight += 1
+        metrics.set_gauge("llm_in_flight", _in_flight)
+    try:
+        yield
+    finally:
+        with _semaphore_lock:
+            _in_flight -= 1
+            metrics.set_gauge("llm_in_flight", _in_flight)
+
+
+def record_usage(call_site: str, model: str, usage: Any) -> None:
+    """Count prompt/completion tokens from a chat completion or responses API usage object."""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or getattr(usage, "input_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or getattr(usage, "output_tokens", None) or 0
+    metrics.increment("llm_tokens_total", prompt_tokens, call_site=call_site, model=model, kind="prompt")
+    metrics.increment("llm_tokens_total", completion_tokens, call_site=call_site, model=model, kind="completion")
+
+
+def _record_call(call_site: str, model: str, started: float, outcome: str) -> None:
+    metrics.increment("llm_calls_total", call_site=call_site, model=model, outcome=outcome)
+    metrics.observe("llm_latency_seconds", time.monotonic() - started, call_site=call_site, model=model)
+
+
+async def _acall(call_site: str, model: str, make_call: Callable[[], Awaitable[Any]]) -> Any:
+    global_semaphore, call_site_semaphore = _async_semaphores(call_site)
+    async with global_semaphore, call_site_semaphore:
+        with _track_in_flight():
+            for attempt in range(settings.LLM_MAX_RETRIES + 1):
+                started = time.monotonic()
+                try:
+                    response = await openai_provider.acall(make_call)
+                except RETRYABLE_ERRORS as e:
+                    _record_call(call_site, model, started, "error")
+                    if attempt == settings.LLM_MAX_RETRIES:
+                        raise
+                    delay = backoff_delay(attempt)
+                    metrics.increment("llm_retries_total", call_site=call_site, model=model)
+                    logger.warning(f"LLM call {call_site} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                except Exception:
+                    _record_call(call_site, model, started, "error")
+                    raise
+                _record_call(call_site, model, started, "success")
+                record_usage(call_site, model, getattr(response, "usage", None))
+                return response
+
+
+async def chat_completion(call_site: str, **params) -> Any:
+    """
+    Create a chat completion through the shared async client.
+    `call_site` names the caller (e.g. "chat.message") and labels the concurrency limit and metrics.
+    """
+    model = params.get("model", "unknown")
+    return await _acall(call_site, model, lambda: async_client.chat.completions.create(**params))
+
+
+async def create_response(call_site: str, **params) -> Any:
+    """Responses API counterpart of chat_completion."""
+    model = params.get("model", "unknown")
+    return await _acall(call_site, model, lambda: async_client.responses.create(**params))
+
+
+def chat_completion_sync(call_site: str, **params) -> Any:
+    """Blocking chat completion for code that runs outside the event loop (e.g. worker threads)."""
+    model = params.get("model", "unknown")
+    with _global_thread_semaphore, _call_site_thread_semaphore(call_site):
+        with _track_in_flight():
+            for attempt in range(settings.LLM_MAX_RETRIES + 1):
+                started = time.monotonic()
+                try:
+                    response = openai_provider.call(sync_client.chat.completions.create, **params)
+                except RETRYABLE_ERRORS as e:
+                    _record_call(call_site, model, started, "error")
+                    if attempt == settings.LLM_MAX_RETRIES:
+                        raise
+                    delay = backoff_delay(attempt)
+                    metrics.increment("llm_retries_total", call_site=call_site, model=model)
+                    logger.warning(f"LLM call {call_site} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                    time.sleep(delay)
+                    continue
+                except Exception:
+                    _record_call(call_site, model, started, "error")
+                    raise
+                _record_call(call_site, model, started, "success")
+                record_usage(call_site, model, getattr(response, "usage", None))
+                return response
+
+
+async def stream_chat_completion(call_site: str, **params) -> AsyncIterator[str]:
+    """
+    Stream a chat completion as text deltas. Opening the stream is retried like chat_completion;
+    once tokens have been yielded a failure is raised to the caller. The concurrency slots are
+    held until the stream is exhausted or closed.
+    """
+    model = params.get("model", "unknown")
+    params = {**params, "stream": True, "stream_options": {"include_usage": True}}
+    global_semaphore, call_site_semaphore = _async_semaphores(call_site)
+    async with global_semaphore, call_site_semaphore:
+        with _track_in_flight():
+            started = time.monotonic()
+            stream = None
+            for attempt in range(settings.LLM_MAX_RETRIES + 1):
+                try:
+                    stream = await openai_provider.acall(lambda: async_client.chat.completions.create(**params))
+                    break
+                except RETRYABLE_ERRORS as e:
+                    if attempt == settings.LLM_MAX_RETRIES:
+                        _record_call(call_site, model, started, "error")
+                        raise
+                    delay = backoff_delay(attempt)
+                    metrics.increment("llm_retries_total", call_site=call_site, model=model)
+                    logger.warning(f"LLM stream {call_site} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+                except Exception:
+                    _record_call(call_site, model, started, "error")
+                    raise
+
+            first_token = True
+            try:
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        record_usage(call_site, model, chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if first_token:
+                            first_token = False
+                            metrics.observe("llm_time_to_first_token_seconds", time.monotonic() - started, call_site=call_site, model=model)
+                        yield delta
+            except Exception:
+                _record_call(call_site, model, started, "error")
+                raise
+            _record_call(call_site, model, started, "success")
@@ -0,0 +1,20 @@
+from app.services.chat_insights_service import mark_chat_insights_stale
+from app.services.chat_session_service import schedule_chat_session_profile_refresh
+from app.services.for_you_service import schedule_for_you_refresh
+from app.services.query_rewrite_service import invalidate_user_query_rewrites
+from app.services.search_query_service import schedule_search_query_refresh
+from app.services.suggestion_service import schedule_suggestion_refresh
+from app.services.user_context_service import invalidate_style_context
+
+async def notify_style_profile_changed(user_id: str):
+    """
+    Single hook for every code path that creates or updates a style profile.
+    Drops caches derived from the old profile and schedules background regeneration.
+    """
+    invalidate_style_context(user_id)
+    invalidate_user_query_rewrites(user_id)
+    schedule_suggestion_refresh(user_id)
+    schedule_chat_session_profile_refresh(user_id)
+    await mark_chat_insights_stale(user_id)
+    schedule_for_you_refresh(user_id)
+    schedule_search_query_refresh(user_id)
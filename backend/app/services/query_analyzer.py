@@ -0,0 +1,151 @@
+import re
+from typing import Dict, List
+
+# Vocabulary used to decide whether a search query is already a concise shopping query.
+GARMENT_TERMS = {
+    "dress", "dresses", "gown", "shirt", "shirts", "t-shirt", "t-shirts", "tee", "tees", "blouse", "blouses",
+    "top", "tops", "tank", "camisole", "polo", "henley", "turtleneck", "sweater", "sweaters", "cardigan",
+    "hoodie", "hoodies", "sweatshirt", "sweatshirts", "jacket", "jackets", "coat", "coats", "blazer", "blazers",
+    "vest", "parka", "trench", "bomber", "windbreaker", "puffer", "pants", "trousers", "jeans", "chinos",
+    "joggers", "sweatpants", "leggings", "shorts", "skirt", "skirts", "jumpsuit", "romper", "overalls", "suit",
+    "suits", "shoes", "sneakers", "trainers", "boots", "loafers", "heels", "sandals", "flats", "mules",
+    "oxfords", "slides", "bag", "bags", "handbag", "tote", "backpack", "crossbody", "hat", "cap", "beanie",
+    "scarf", "belt", "sunglasses", "jewelry", "necklace", "earrings", "bracelet", "ring", "watch", "socks",
+    "kimono", "bodysuit", "corset", "swimsuit", "bikini",
+}
+
+COLOR_TERMS = {
+    "black", "white", "gray", "grey", "charcoal", "beige", "cream", "ivory", "tan", "camel", "brown",
+    "chocolate", "navy", "blue", "red", "burgundy", "maroon", "wine", "pink", "purple", "lavender", "lilac",
+    "green", "olive", "sage", "khaki", "yellow", "mustard", "orange", "rust", "gold", "silver", "teal",
+    "mint", "pastel", "neutral", "multicolor", "nude",
+}
+
+MATERIAL_TERMS = {
+    "leather", "suede", "denim", "cotton", "linen", "silk", "satin", "wool", "cashmere", "knit", "corduroy",
+    "velvet", "nylon", "polyester", "fleece", "tweed", "canvas", "faux", "mesh", "jersey", "chiffon", "lace",
+    "sherpa", "merino",
+}
+
+GENDER_TERMS = {
+    "men": "men", "mens": "men's", "men's": "men's", "man": "men", "male": "men",
+    "women": "women", "womens": "women's", "women's": "women's", "woman": "women", "female": "women",
+    "ladies": "women's", "unisex": "unisex", "boys": "boys", "girls": "girls", "kids": "kids",
+}
+
+STYLE_TERMS = {
+    "oversized", "fitted", "slim", "regular", "relaxed", "loose", "cropped", "high-waisted", "high-rise",
+    "low-rise", "wide-leg", "straight", "straight-leg", "skinny", "baggy", "bootcut", "flared", "tapered",
+    "vintage", "retro", "streetwear", "minimalist", "casual", "formal", "smart", "classic", "preppy",
+    "bohemian", "boho", "y2k", "chunky", "platform", "graphic", "plain", "striped", "floral", "plaid",
+    "checked", "printed", "summer", "winter", "fall", "autumn", "spring", "ankle", "knee-high", "midi",
+    "maxi", "mini", "long", "short", "long-sleeve", "short-sleeve", "sleeveless", "button-down", "button-up",
+    "zip-up", "crewneck", "v-neck", "athletic", "running", "hiking", "work", "waterproof", "designer",
+    "luxury", "affordable", "cargo", "puffer", "quilted", "ribbed", "distressed", "ripped", "wedding",
+    "party", "office", "beach",
+}
+
+BRAND_TERMS = {
+    "nike", "adidas", "levis", "levi's", "zara", "uniqlo", "converse", "vans", "carhartt", "patagonia",
+    "gucci", "prada", "h&m", "cos", "everlane", "arket", "stussy", "supreme",
+}
+
+# Connectors that can appear in a concise query without changing its intent
+CONNECTOR_TERMS = {"and", "for", "with", "in", "&"}
+
+# Words that mark a conversational request GPT should rewrite
+CONVERSATIONAL_TERMS = {
+    "i", "i'm", "im", "me", "my", "want", "need", "looking", "look", "show", "find", "get", "something",
+    "some", "like", "that", "would", "could", "should", "please", "what", "which", "where", "how", "good",
+    "best", "to", "wear", "outfit", "outfits", "ideas", "idea", "help", "a", "an", "the", "can", "you",
+    "goes", "go", "match", "matches", "similar", "recommend",
+}
+
+MAX_WELL_FORMED_TOKENS = 8
+MAX_UNKNOWN_TOKENS = 1
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9'&-]*")
+
+
+def tokenize(query: str) -> List[str]:
+    """Lowercase word tokens, keeping hyphenated terms (t-shirt, wide-leg) and possessives intact."""
+    query = (query or "").lower().replace("’", "'")
+    query = re.sub(r"\bt shirts?\b", lambda m: m.group(0).replace(" ", "-"), query)
+    return _TOKEN_RE.findall(query)
+
+
+def _singular(token: str) -> str:
+    return token[:-1] if token.endswith("s") and token[:-1] in GARMENT_TERMS else token
+
+
+def analyze_query(query: str) -> Dict:
+    """
+    Classify every token of a search query against the fashion vocabulary and decide whether
+    the query is already a well-formed shopping query that does not need an LLM rewrite.
+    """
+    tokens = tokenize(query)
+    analysis = {
+        "tokens": tokens,
+        "garments": [],
+        "colors": [],
+        "materials": [],
+        "genders": [],
+        "styles": [],
+        "brands": [],
+        "conversational": [],
+        "unknown": [],
+    }
+    for token in tokens:
+        if token in CONNECTOR_TERMS:
+            continue
+        if token in CONVERSATIONAL_TERMS:
+            analysis["conversational"].append(token)
+        elif token in GARMENT_TERMS or _singular(token) in GARMENT_TERMS:
+            analysis["garments"].append(token)
+        elif token in COLOR_TERMS:
+            analysis["colors"].append(token)
+        elif token in MATERIAL_TERMS:
+            analysis["materials"].append(token)
+        elif token in GENDER_TERMS:
+            analysis["genders"].append(GENDER_TERMS[token])
+        elif token in STYLE_TERMS:
+            analysis["styles"].append(token)
+        elif token in BRAND_TERMS:
+            analysis["brands"].append(token)
+        else:
+            analysis["unknown"].append(token)
+
+    content_tokens = [t for t in tokens if t not in CONNECTOR_TERMS]
+    has_qualifier = any(analysis[k] for k in ("colors", "materials", "genders", "styles", "brands"))
+    analysis["is_well_formed"] = (
+        2 <= len(content_tokens) <= MAX_WELL_FORMED_TOKENS
+        and bool(analysis["garments"])
+        and has_qualifier
+        and not analysis["conversational"]
+        and len(analysis["unknown"]) <= MAX_UNKNOWN_TOKENS
+    )
+    return analysis
+
+
+def normalize_query(query: str) -> str:
+    """Lowercased, tokenized form of a well-formed query with gender terms normalized."""
+    return " ".join(GENDER_TERMS.get(token, token) for token in tokenize(query))
+
+
+def build_fallback_query(query: str) -> str:
+    """
+    Assemble a short shopping query from the recognised terms of a free-form query.
+    Returns the original query when no garment is recognised.
+    """
+    analysis = analyze_query(query)
+    if not analysis["garments"]:
+        return query
+    parts = (
+        analysis["genders"][:1]
+        + analysis["colors"][:2]
+        + analysis["styles"][:2]
+        + analysis["materials"][:1]
+        + analysis["brands"][:1]
+        + analysis["garments"][:1]
+    )
+    return " ".join(parts)
@@ -0,0 +1,38 @@
+import logging
+from typing import Optional
+from app.config.settings import settings
+from app.services.cache_service import TTLCache
+from app.services.metrics_service import metrics
+from app.services.search_service import canonicalize_query
+from app.services.user_context_service import NO_PROFILE_HASH
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the rewrite prompt in generate_optimized_search_query changes
+QUERY_REWRITE_PROMPT_VERSION = "v1"
+
+# (canonical query, profile hash, prompt version) -> optimized query
+query_rewrite_cache = TTLCache(max_size=5000, ttl_seconds=settings.QUERY_REWRITE_CACHE_TTL_SECONDS)
+
+# user_id -> profile hash last seen for that user, so profile updates can drop their entries
+_user_profile_hashes = TTLCache(max_size=20000, ttl_seconds=settings.QUERY_REWRITE_CACHE_TTL_SECONDS)
+
+def get_cached_rewrite(user_query: str, profile_hash: str, user_id: str = None) -> Optional[str]:
+    if user_id:
+        _user_profile_hashes.set(user_id, profile_hash)
+    cached = query_rewrite_cache.get((canonicalize_query(user_query), profile_hash, QUERY_REWRITE_PROMPT_VERSION))
+    metrics.increment("query_rewrite_cache_total", outcome="hit" if cached else "miss")
+    return cached
+
+def store_rewrite(user_query: str, profile_hash: str, optimized_query: str) -> None:
+    query_rewrite_cache.set((canonicalize_query(user_query), profile_hash, QUERY_REWRITE_PROMPT_VERSION), optimized_query)
+
+def invalidate_user_query_rewrites(user_id: str) -> None:
+    """Drop cached rewrites built from this user's previous style profile."""
+    profile_hash = _user_profile_hashes.get(user_id)
+    _user_profile_hashes.delete(user_id)
+    if not profile_hash or profile_hash == NO_PROFILE_HASH:
+        return
+    removed = query_rewrite_cache.delete_where(lambda key: key[1] == profile_hash)
+    if removed:
+        logger.info(f"Invalidated {removed} cached query rewrites for user {user_id}")
@@ -0,0 +1,109 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo import ReturnDocument
+from app.repository import repo
+
+logger = logging.getLogger(__name__)
+
+# Weekly allowance per quota for non-premium users
+QUOTA_LIMITS = {
+    "fashion_search": 3,
+    "uploads": 3,
+}
+
+def week_bucket(now: Optional[datetime] = None) -> str:
+    """ISO week key for a timestamp (UTC), e.g. '2025-W07'. Buckets roll over Monday 00:00 UTC."""
+    year, week, _ = (now or datetime.utcnow()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+def next_week_start(now: Optional[datetime] = None) -> datetime:
+    """Start of the next ISO week, when every weekly quota resets."""
+    now = now or datetime.utcnow()
+    monday = datetime(now.year, now.month, now.day) - timedelta(days=now.weekday())
+    return monday + timedelta(days=7)
+
+def _usage_field(quota: str, week: str) -> str:
+    return f"quota_usage.{quota}.{week}"
+
+def get_week_usage(user: dict, quota: str, week: Optional[str] = None) -> int:
+    """Read a quota's usage for a week straight from a user document."""
+    return user.get("quota_usage", {}).get(quota, {}).get(week or week_bucket(), 0)
+
+def _status(user: dict, quota: str, week: str, used: int) -> dict:
+    limit = QUOTA_LIMITS[quota]
+    if user.get("subscription_status") == "premium":
+        return {"limit": -1, "used": used, "remaining": -1, "subscription": "premium", "week": week}
+    return {
+        "limit": limit,
+        "used": used,
+        "remaining": max(0, limit - used),
+        "subscription": "basic",
+        "week": week
+    }
+
+async def get_quota_status(user_email: str, quota: str) -> dict:
+    """Read-only view of a user's quota for the current week."""
+    week = week_bucket()
+    user = await repo.users_collection.find_one(
+        {"email": user_email},
+        {"subscription_status": 1, _usage_field(quota, week): 1}
+    )
+    if not user:
+        return {"error": "User not found"}
+    return _status(user, quota, week, get_week_usage(user, quota, week))
+
+async def reserve_quota(user_email: str, quota: str) -> dict:
+    """
+    Atomically reserve one unit of a weekly quota.
+
+    A single conditional find_one_and_update increments the current week's bucket only when
+    the user is premium or still under the limit, so concurrent requests cannot overshoot.
+    Returns the quota status with "allowed" set; pass "week" to release_quota to refund.
+    """
+    limit = QUOTA_LIMITS[quota]
+    now = datetime.utcnow()
+    week = week_bucket(now)
+    previous_week = week_bucket(now - timedelta(days=7))
+    field = _usage_field(quota, week)
+
+    user = await repo.users_collection.find_one_and_update(
+        {
+            "email": user_email,
+            "$or": [
+                {"subscription_status": "premium"},
+                {field: {"$not": {"$gte": limit}}}
+            ]
+        },
+        {
+            "$inc": {field: 1},
+            "$unset": {_usage_field(quota, previous_week): ""}
+        },
+        projection={"subscription_status": 1, field: 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if user:
+        return {**_status(user, quota, week, get_week_usage(user, quota, week)), "allowed": True}
+
+    # Nothing matched: either the user does not exist or the limit is used up
+    if not await repo.users_collection.find_one({"email": user_email}, {"_id": 1}):
+        return {"error": "User not found", "allowed": False}
+    return {
+        "limit": limit,
+        "used": limit,
+        "remaining": 0,
+        "subscription": "basic",
+        "week": week,
+        "allowed": False
+    }
+
+async def release_quota(user_email: str, quota: str, week: str) -> None:
+    """Refund a unit reserved with reserve_quota, e.g. when the guarded work failed."""
+    try:
+        field = _usage_field(quota, week)
+        await repo.users_collection.update_one(
+            {"email": user_email, field: {"$gt": 0}},
+            {"$inc": {field: -1}}
+        )
+    except Exception as e:
+        logger.error(f"Error releasing {quota} quota for {user_email}: {e}")
@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Awaitable, Callable, Optional
+
+from serpapi import GoogleSearch
+from app.config.settings import settings
+from app.services.metrics_service import metrics, percentile
+
+logger = logging.getLogger(__name__)
+
+# Threads used to put a deadline on blocking provider SDK calls (SerpAPI, sync OpenAI client)
+_executor = ThreadPoolExecutor(max_workers=settings.PROVIDER_THREAD_POOL_SIZE, thread_name_prefix="provider")
+
+
+class ProviderUnavailableError(Exception):
+    """Raised when a provider call is rejected because its circuit breaker is open."""
+
+
+class ProviderTimeoutError(ProviderUnavailableError):
+    """Raised when a provider call does not finish within its deadline."""
+
+
+class CircuitState:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+# Numeric encoding used for the circuit state gauge
+CIRCUIT_STATE_VALUES = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. After `failure_threshold` consecutive failures the circuit
+    opens and calls fail fast; after `recovery_seconds` a single trial call is let through
+    (half-open) and its outcome decides whether the circuit closes again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, recovery_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._state = CircuitState.CLOSED
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._publish()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == CircuitState.OPEN and time.monotonic() - self.opened_at >= self.recovery_seconds:
+            self._state = CircuitState.HALF_OPEN
+            self._trial_in_flight = False
+            self._publish()
+        return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == CircuitState.CLOSED:
+                return True
+            if state == CircuitState.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+            if self._state != CircuitState.CLOSED:
+                logger.info("Circuit for %s closed", self.name)
+            self._state = CircuitState.CLOSED
+            self._trial_in_flight = False
+            self._publish()
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial slot for a call that never reached the provider."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._state == CircuitState.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self._state != CircuitState.OPEN:
+                    logger.warning("Circuit for %s opened after %s consecutive failures", self.name, self.consecutive_failures)
+                self._state = CircuitState.OPEN
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+            self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge("provider_circuit_state", CIRCUIT_STATE_VALUES[self._state], provider=self.name)
+
+
+class Provider:
+    """
+    Resilience policy for one external provider: a per-call deadline, a circuit breaker and
+    optional hedging. When hedging is enabled and enough latency samples exist, a duplicate
+    request is started once the original has been running longer than the observed p95; the
+    first successful response wins.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout_seconds: float,
+        failure_threshold: int = settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        recovery_seconds: float = settings.CIRCUIT_BREAKER_RECOVERY_SECONDS,
+        hedge: bool = False,
+        hedge_min_samples: int = 20,
+    ):
+        self.name = name
+        self.timeout_seconds = timeout_seconds
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = CircuitBreaker(name, failure_threshold, recovery_seconds)
+        self._latencies = deque(maxlen=200)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before sending a hedged duplicate, or None when hedging is off."""
+        if not self.hedge or len(self._latencies) < self.hedge_min_samples:
+            return None
+        delay = percentile(list(self._latencies), 95)
+        return delay if delay < self.timeout_seconds else None
+
+    def _admit(self) -> None:
+        if not self.breaker.allow_request():
+            metrics.increment("provider_calls_total", provider=self.name, outcome="rejected")
+            raise ProviderUnavailableError(f"{self.name} circuit is open")
+
+    def _record(self, started: float, outcome: str) -> None:
+        elapsed = time.monotonic() - started
+        metrics.increment("provider_calls_total", provider=self.name, outcome=outcome)
+        metrics.observe("provider_latency_seconds", elapsed, provider=self.name)
+        if outcome == "success":
+            self._latencies.append(elapsed)
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking provider call under this provider's deadline, breaker and hedging policy.
+        The deadline starts when a pool worker picks the call up; a call still queued after
+        timeout_seconds is dropped without counting against the provider. A call that overruns
+        is abandoned but keeps its worker until it returns, so `fn` should bound its own I/O
+        (see serpapi_client).
+        """
+        self._admit()
+        queued = time.monotonic()
+        first_started = threading.Event()
+
+        def run():
+            first_started.set()
+            return fn(*args, **kwargs)
+
+        first = _executor.submit(run)
+        if not first_started.wait(self.timeout_seconds) and first.cancel():
+            self.breaker.release_trial()
+            metrics.increment("provider_calls_total", provider=self.name, outcome="queue_timeout")
+            raise ProviderTimeoutError(f"{self.name} call waited over {self.timeout_seconds}s for a free worker")
+        started = time.monotonic()
+        metrics.observe("provider_queue_seconds", started - queued, provider=self.name)
+        deadline = started + self.timeout_seconds
+        pending = {first}
+        hedge_delay = self.hedge_delay()
+        hedged = False
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait_for = remaining
+                if hedge_delay is not None and not hedged:
+                    wait_for = max(0.0, min(remaining, started + hedge_delay - time.monotonic()))
+                done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        self._record(started, "success")
+                        return future.result()
+                    last_error = future.exception()
+                if not done and hedge_delay is not None and not hedged:
+                    hedged = True
+                    metrics.increment("provider_hedged_requests_total", provider=self.name)
+                    pending.add(_executor.submit(fn, *args, **kwargs))
+        finally:
+            for future in pending:
+                future.cancel()
+
+        if last_error is not None and not pending:
+            self._record(started, "error")
+            raise last_error
+        self._record(started, "timeout")
+        raise ProviderTimeoutError(f"{self.name} call exceeded {self.timeout_seconds}s deadline")
+
+    async def acall(self, make_call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async counterpart of `call`. `make_call` must return a fresh awaitable each time it is
+        invoked so a hedged duplicate can be issued.
+        """
+        self._admit()
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        deadline = started + self.timeout_seconds
+        pending = {asyncio.ensure_future(make_call())}
+        hedge_delay = self.hedge_delay()
+        hedged = False
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait_for = remaining
+                if hedge_delay is not None and not hedged:
+                    wait_for = max(0.0, min(remaining, started + hedge_delay - time.monotonic()))
+                done, pending = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._record(started, "success")
+                        return task.result()
+                    last_error = task.exception()
+                if not done and hedge_delay is not None and not hedged:
+                    hedged = True
+                    metrics.increment("provider_hedged_requests_total", provider=self.name)
+                    pending.add(loop.create_task(make_call()))
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if last_error is not None and not pending:
+            self._record(started, "error")
+            raise last_error
+        self._record(started, "timeout")
+        raise ProviderTimeoutError(f"{self.name} call exceeded {self.timeout_seconds}s deadline")
+
+    def status(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "timeout_seconds": self.timeout_seconds,
+            "hedge_enabled": self.hedge,
+            "hedge_delay_seconds": self.hedge_delay(),
+        }
+
+
+serpapi_provider = Provider(
+    "serpapi",
+    timeout_seconds=settings.SERPAPI_TIMEOUT_SECONDS,
+    hedge=settings.SERPAPI_HEDGE_ENABLED,
+)
+
+
+def serpapi_client(params: dict) -> GoogleSearch:
+    """SerpAPI client whose HTTP request gives up at the provider deadline (the SDK default is 60000s)."""
+    search = GoogleSearch(params)
+    search.timeout = serpapi_provider.timeout_seconds
+    return search
+openai_provider = Provider(
+    "openai",
+    timeout_seconds=settings.OPENAI_TIMEOUT_SECONDS,
+    hedge=settings.OPENAI_HEDGE_ENABLED,
+)
+
+PROVIDERS = {provider.name: provider for provider in (serpapi_provider, openai_provider)}
+
+
+def get_provider_status() -> dict:
+    """Current breaker state and policy for every registered provider."""
+    return {name: provider.status() for name, provider in PROVIDERS.items()}
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import List, Optional
+from app.config.settings import settings
+from app.repository import repo
+from app.services.background_service import spawn_once
+from app.services.llm_gateway import create_response
+from app.services.metrics_service import metrics
+from app.services.resilience_service import ProviderUnavailableError
+from app.services.search_service import canonicalize_query, get_shopping_results_from_serpapi, shopping_results_cache
+from app.services.user_context_service import get_style_context, invalidate_style_context, preference_labels
+from models.user_models import StyleContext
+
+logger = logging.getLogger(__name__)
+
+# The discovery page loads this many shopping results per query
+WARM_RESULTS_PER_QUERY = 10
+
+async def generate_search_queries(context: StyleContext) -> List[str]:
+    """Use GPT to turn a style profile into 5-10 discovery search queries. Raises ValueError on bad output."""
+    user_gender = context.gender or "Not specified"
+    preferences_text = ", ".join(preference_labels(context))
+
+    prompt = f"""Based on the following style summary and preferences, generate a list of 5-10 search queries related to fashion items or styles that this user might be interested in.
+
+IMPORTANT: This user's gender is {user_gender}. ALWAYS include gender-specific terms in your search queries (e.g., "men's", "women's", "men", "women") to ensure the results are appropriate for their gender.
+
+Here is a very brief description of what a user's style preferences are:
+Style Summary: {context.style_summary}
+Style Preferences: {preferences_text}
+User Gender: {user_gender}
+
+Use this information to create a list of 5-10 search queries that you think the user would be most interested in to help them explore and discover styles and clothes that they may like.
+
+CRITICAL REQUIREMENTS:
+- ALWAYS include the user's gender in each search query (e.g., "men's streetwear", "women's minimalist fashion")
+- Make sure all queries are gender-appropriate for {user_gender}
+- Focus on their style preferences while ensuring gender specificity
+
+Please provide the search queries in a JSON array of strings.
+[
+  "query 1",
+  "query 2",
+  ...
+]"""
+
+    response = await create_response(
+        "quiz.search_queries",
+        model="gpt-4.1",
+        input=[
+            {"role": "system", "content": "You are a fashion search query generator. Always respond with a valid JSON array of strings. ALWAYS include gender-specific terms in search queries."},
+            {"role": "user", "content": prompt}
+        ]
+    )
+    try:
+        search_queries = json.loads(response.output_text)
+    except json.JSONDecodeError as e:
+        logger.error(f"Invalid search query JSON from GPT: {response.output_text}")
+        raise ValueError(f"Invalid JSON response from GPT: {e}")
+    if not isinstance(search_queries, list) or not all(isinstance(q, str) for q in search_queries):
+        raise ValueError("Invalid JSON response format: expected a list of strings.")
+    return search_queries
+
+def _is_warm(query: str) -> bool:
+    return shopping_results_cache.get(("google_shopping", canonicalize_query(query), WARM_RESULTS_PER_QUERY)) is not None
+
+async def warm_shopping_results(user_id: str, queries: List[str]) -> int:
+    """
+    Fetch shopping results for every query not already cached, SEARCH_WARM_CONCURRENCY at a time,
+    so the discovery page is served from the shopping cache. Only premium users can load those
+    results, so nothing is fetched for anyone else. Returns the number of queries fetched.
+    """
+    user = await repo.users_collection.find_one({"email": user_id}, {"subscription_status": 1})
+    if not user or user.get("subscription_status") != "premium":
+        return 0
+    cold = [q for q in dict.fromkeys(queries) if not _is_warm(q)]
+    semaphore = asyncio.Semaphore(settings.SEARCH_WARM_CONCURRENCY)
+
+    async def fetch(query: str) -> None:
+        async with semaphore:
+            # Caches successful lookups itself
+            try:
+                await asyncio.to_thread(get_shopping_results_from_serpapi, query, WARM_RESULTS_PER_QUERY)
+            except ProviderUnavailableError as e:
+                logger.warning(f"Skipping shopping warm for '{query}': {e}")
+
+    await asyncio.gather(*(fetch(q) for q in cold))
+    metrics.increment("search_query_warm_total", len(cold))
+    if cold:
+        logger.info(f"Warmed shopping results for {len(cold)} discovery queries for user {user_id}")
+    return len(cold)
+
+def schedule_shopping_warm(user_id: str, queries: List[str]) -> None:
+    spawn_once(("search_query_warm", user_id), lambda: warm_shopping_results(user_id, queries), "shopping result warmer")
+
+async def _queries_for_profile(user_id: str, context: StyleContext) -> List[str]:
+    """Stored queries if they match the profile version, otherwise a newly generated and stored set."""
+    if context.search_queries and context.search_queries_profile_hash == context.fingerprint:
+        metrics.increment("search_queries_cache_total", outcome="hit")
+        return context.search_queries
+    metrics.increment("search_queries_cache_total", outcome="miss")
+    queries = await generate_search_queries(context)
+    await repo.style_profiles_collection.update_one(
+        {"user_id": user_id},
+        {"$set": {
+            "search_queries": queries,
+            "search_queries_profile_hash": context.fingerprint,
+            "search_queries_updated_at": datetime.utcnow()
+        }}
+    )
+    invalidate_style_context(user_id)
+    return queries
+
+async def get_search_queries(user_id: str) -> Optional[List[str]]:
+    """
+    Discovery queries for the user's current profile version. They are generated once per profile
+    fingerprint and stored on the profile; expired shopping results are warmed in the background.
+    Returns None if the user has no profile.
+    """
+    context = await get_style_context(user_id)
+    if not context.has_profile:
+        return None
+    queries = await _queries_for_profile(user_id, context)
+    if not all(_is_warm(q) for q in queries):
+        schedule_shopping_warm(user_id, queries)
+    return queries
+
+async def refresh_search_queries(user_id: str) -> Optional[List[str]]:
+    """
+    After a profile change, regenerate the stored discovery queries and warm their shopping
+    results before the next discovery page load asks for them. Users who never loaded the
+    discovery page have no stored queries and are skipped.
+    """
+    context = await get_style_context(user_id)
+    if not context.has_profile or not context.search_queries:
+        return None
+    queries = await _queries_for_profile(user_id, context)
+    await warm_shopping_results(user_id, queries)
+    return queries
+
+def schedule_search_query_refresh(user_id: str) -> None:
+    spawn_once(("search_queries", user_id), lambda: refresh_search_queries(user_id), "search query refresh")
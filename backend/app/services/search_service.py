@@ -1,13 +1,51 @@
 import logging
-from serpapi import GoogleSearch
 from urllib.parse import quote
 from app.config.settings import settings
 from app.services.similar_service import generate_fashion_search_query
+from app.services.cache_service import SingleFlight, TTLCache
+from app.services.resilience_service import ProviderUnavailableError, serpapi_client, serpapi_provider
 
 logger = logging.getLogger(__name__)
 
 SERP_API_KEY = settings.SERP_API_KEY
 
+# Successful shopping lookups keyed by (engine, canonical query, num_results).
+# The "fashion_search" engine key holds merged results from the streaming fashion search.
+shopping_results_cache = TTLCache(max_size=2048, ttl_seconds=settings.SHOPPING_CACHE_TTL_SECONDS)
+# Concurrent misses for the same shopping cache key share one SerpAPI call
+shopping_flights = SingleFlight()
+
+def canonicalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share cache entries."""
+    return " ".join((query or "").lower().split())
+
+def get_cached_shopping_results(query: str, num_results: int = 10) -> list:
+    """
+    Return cached results for a query without calling SerpAPI.
+    Merged fashion search results are preferred, then full Google Shopping, then Google Shopping Light.
+    """
+    canonical = canonicalize_query(query)
+    for engine in ("fashion_search", "google_shopping", "google_shopping_light"):
+        cached = shopping_results_cache.get((engine, canonical, num_results))
+        if cached:
+            return list(cached)
+    return []
+
+def dedupe_shopping_results(*result_lists: list) -> list:
+    """Merge result lists in order, dropping placeholders and repeated links/titles."""
+    merged = []
+    seen = set()
+    for results in result_lists:
+        for item in results or []:
+            if not item or item.get("title") == "Search failed":
+                continue
+            key = item.get("link") or (item.get("title") or "").lower()
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            merged.append(item)
+    return merged
+
 def get_clothing_from_google_search(image_url: str, category_hint: str = "", color: str = ""):
     """
     Uses Google Lens search via SerpAPI to find clothing items similar to the image.
@@ -34,8 +72,7 @@ def get_clothing_from_google_search(image_url: str, category_hint: str = "", col
         params["text"] = quote(search_term)
 
     try:
-        search = GoogleSearch(params)
-        results = search.get_dict()
+        results = serpapi_provider.call(serpapi_client(params).get_dict)
         visual_matches = results.get("visual_matches", [])[:5]
 
         logger.info("SerpAPI result for %s: %s", image_url, visual_matches[:3])
@@ -59,6 +96,9 @@ def get_clothing_from_google_search(image_url: str, category_hint: str = "", col
                 "thumbnail": m.get("thumbnail")
             } for m in visual_matches
         ]
+    except ProviderUnavailableError:
+        # Open circuit or deadline miss: let the caller report it instead of showing a placeholder
+        raise
     except Exception as e:
         print(f"Search failed for {image_url}: {e}")
         return [{"title": "Search failed", "link": "", "price": "N/A", "thumbnail": ""}]
@@ -67,7 +107,17 @@ def get_shopping_results_from_serpapi(query: str, num_results: int = 10):
     """
     Fetch shopping results from SerpAPI Google Shopping using a text query.
     Returns a list of items with title, link, price, thumbnail, and source/shop name.
+    Concurrent cache misses for the same query share a single SerpAPI call.
+    Raises ProviderUnavailableError when SerpAPI's circuit is open or the call times out.
     """
+    cache_key = ("google_shopping", canonicalize_query(query), num_results)
+    cached = shopping_results_cache.get(cache_key)
+    if cached:
+        print(f"[SerpAPI] Cache hit for shopping query: '{query}'")
+        return list(cached)
+    return list(shopping_flights.do(cache_key, lambda: _fetch_shopping_results(query, num_results, cache_key)))
+
+def _fetch_shopping_results(query: str, num_results: int, cache_key: tuple) -> list:
     print(f"[SerpAPI] Starting shopping search for query: '{query}' with {num_results} results")
     params = {
         "engine": "google_shopping",
@@ -80,8 +130,7 @@ def get_shopping_results_from_serpapi(query: str, num_results: int = 10):
     print(f"[SerpAPI] API Key present: {'Yes' if SERP_API_KEY else 'No'}")
     try:
         print(f"[SerpAPI] Making request to SerpAPI with params: {params}")
-        search = GoogleSearch(params)
-        results = search.get_dict()
+        results = serpapi_provider.call(serpapi_client(params).get_dict)
         print(f"[SerpAPI] Raw response keys: {list(results.keys())}")
         shopping_results = results.get("shopping_results", [])[:num_results]
         print(f"[SerpAPI] Found {len(shopping_results)} shopping results")
@@ -95,7 +144,11 @@ def get_shopping_results_from_serpapi(query: str, num_results: int = 10):
                 "source": item.get("source") or item.get("store")
             })
         print(f"[SerpAPI] Returning {len(items)} processed items")
+        if items:
+            shopping_results_cache.set(cache_key, items)
         return items
+    except ProviderUnavailableError:
+        raise
     except Exception as e:
         print(f"[SerpAPI] SerpAPI shopping search failed for '{query}': {e}")
         print(f"[SerpAPI] Exception type: {type(e)}")
@@ -106,7 +159,13 @@ def get_google_shopping_light_results(query: str, num_results: int = 10):
     Fetch shopping results from SerpAPI Google Shopping Light using a text query.
     This is faster than regular Google Shopping and provides essential product data.
     Returns a list of items with title, link, price, thumbnail, and source/shop name.
+    Raises ProviderUnavailableError when SerpAPI's circuit is open or the call times out.
     """
+    cache_key = ("google_shopping_light", canonicalize_query(query), num_results)
+    cached = shopping_results_cache.get(cache_key)
+    if cached:
+        print(f"[SerpAPI] Cache hit for Google Shopping Light query: '{query}'")
+        return list(cached)
     print(f"[SerpAPI] Starting Google Shopping Light search for query: '{query}' with {num_results} results")
     params = {
         "engine": "google_shopping_light",
@@ -119,8 +178,7 @@ def get_google_shopping_light_results(query: str, num_results: int = 10):
     print(f"[SerpAPI] API Key present: {'Yes' if SERP_API_KEY else 'No'}")
     try:
         print(f"[SerpAPI] Making request to SerpAPI Google Shopping Light with params: {params}")
-        search = GoogleSearch(params)
-        results = search.get_dict()
+        results = serpapi_provider.call(serpapi_client(params).get_dict)
         print(f"[SerpAPI] Raw response keys: {list(results.keys())}")
         
         # Google Shopping Light returns results in different fields
@@ -142,7 +200,11 @@ def get_google_shopping_light_results(query: str, num_results: int = 10):
                 "extracted_price": item.get("extracted_price")
             })
         print(f"[SerpAPI] Returning {len(items)} processed Google Shopping Light items")
+        if items:
+            shopping_results_cache.set(cache_key, items)
         return items
+    except ProviderUnavailableError:
+        raise
     except Exception as e:
         print(f"[SerpAPI] SerpAPI Google Shopping Light search failed for '{query}': {e}")
         print(f"[SerpAPI] Exception type: {type(e)}")
@@ -1,14 +1,15 @@
 import logging
-from openai import OpenAI
 from app.config.settings import settings
+from app.services.llm_gateway import chat_completion, chat_completion_sync
+from app.services.resilience_service import serpapi_client, serpapi_provider
+from app.services.user_context_service import get_style_context, QUIZ_CONTEXT_FIELDS
+from app.services.color_service import nearest_color_names
 import time
-from serpapi import GoogleSearch
 from urllib.parse import quote
 import re, json
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
 SERP_API_KEY = settings.SERP_API_KEY
 
 def get_initial_search_results(image_url: str, category: str) -> list:
@@ -22,8 +23,7 @@ def get_initial_search_results(image_url: str, category: str) -> list:
             "gl": "us"
         }
         
-        search = GoogleSearch(params)
-        results = search.get_dict()
+        results = serpapi_provider.call(serpapi_client(params).get_dict)
         return results.get("visual_matches", [])[:3]  # Get top 3 matches for context
     except Exception as e:
         logger.error("Failed to get initial search results: %s", e)
@@ -49,7 +49,8 @@ def generate_fashion_search_query(title: str, category: str, context: str = "",
             return f"{category} {title}"
 
         # Prepare the vision-based prompt
-        response = client.chat.completions.create(
+        response = chat_completion_sync(
+            "similar.fashion_query",
             model="gpt-4o",  # Use GPT-4o for vision/multimodal
             messages=[
                 {
@@ -113,153 +114,116 @@ Generate a search query that will find visually similar items:"""
         logger.warning("Using fallback query: %s", fallback)
         return fallback
 
-def hex_to_color_name(hex_color: str) -> str:
+async def load_user_characteristics(user_id: str = None) -> dict:
     """
-    Convert hex color to a human-readable color name.
+    Collect the style profile and completed quiz answers that personalize search queries.
     """
-    if not hex_color or not hex_color.startswith('#'):
-        return ""
-    
-    # Common color mappings
-    color_map = {
-        '#000000': 'black', '#ffffff': 'white', '#ff0000': 'red', '#00ff00': 'green',
-        '#0000ff': 'blue', '#ffff00': 'yellow', '#ff00ff': 'magenta', '#00ffff': 'cyan',
-        '#808080': 'gray', '#c0c0c0': 'silver', '#800000': 'maroon', '#808000': 'olive',
-        '#008000': 'green', '#800080': 'purple', '#008080': 'teal', '#000080': 'navy',
-        '#ffa500': 'orange', '#ffc0cb': 'pink', '#a52a2a': 'brown', '#dda0dd': 'plum',
-        '#f0e68c': 'khaki', '#98fb98': 'pale green', '#87ceeb': 'sky blue', '#d2691e': 'chocolate',
-        '#ff6347': 'tomato', '#40e0d0': 'turquoise', '#ee82ee': 'violet', '#f5deb3': 'wheat',
-        '#9b968a': 'taupe', '#8b4513': 'saddle brown', '#2f4f4f': 'dark slate gray',
-        '#696969': 'dim gray', '#b8860b': 'dark goldenrod', '#cd853f': 'peru'
-    }
-    
-    # Try exact match first
-    if hex_color.lower() in color_map:
-        return color_map[hex_color.lower()]
-    
-    # If no exact match, try to find closest color
+    user_characteristics = {}
+    if not user_id:
+        return user_characteristics
     try:
-        # Convert hex to RGB
-        hex_color = hex_color.lstrip('#')
-        r = int(hex_color[0:2], 16)
-        g = int(hex_color[2:4], 16)
-        b = int(hex_color[4:6], 16)
-        
-        # Simple color classification
-        if r > 200 and g > 200 and b > 200:
-            return 'white'
-        elif r < 50 and g < 50 and b < 50:
-            return 'black'
-        elif r > g and r > b:
-            return 'red'
-        elif g > r and g > b:
-            return 'green'
-        elif b > r and b > g:
-            return 'blue'
-        elif r > 200 and g > 200:
-            return 'yellow'
-        elif r > 200 and b > 200:
-            return 'magenta'
-        elif g > 200 and b > 200:
-            return 'cyan'
-        else:
-            return 'neutral'
-    except:
-        return 'neutral'
+        context = await get_style_context(user_id)
+        if context.has_profile:
+            user_characteristics["style_summary"] = context.style_summary
+            user_characteristics["style_preferences"] = context.style_preferences
+        for field in QUIZ_CONTEXT_FIELDS:
+            if getattr(context, field):
+                user_characteristics[field] = getattr(context, field)
+    except Exception as e:
+        print(f"Error fetching user style profile: {e}")
+    return user_characteristics
+
+def format_user_characteristics(user_characteristics: dict) -> str:
+    """Render user characteristics as the "User Profile" block of a prompt."""
+    if not user_characteristics:
+        return ""
+    labels = [
+        ("gender", "Gender"),
+        ("age_range", "Age Range"),
+        ("primary_style", "Primary Style"),
+        ("silhouette_preference", "Silhouette Preference"),
+        ("color_palette", "Color Palette"),
+        ("material_preference", "Material Preference"),
+        ("price_sensitivity", "Price Range"),
+        ("season_focus", "Season Focus"),
+    ]
+    user_context = "User Profile:\n"
+    for key, label in labels:
+        if user_characteristics.get(key):
+            user_context += f"- {label}: {user_characteristics[key]}\n"
+    return user_context
+
+def format_search_metadata(clothing_items: list) -> str:
+    """Summarize reverse image search results for a prompt."""
+    titles = [item.get("title", "") for item in clothing_items if item.get("title")]
+    sources = [item.get("source", "") for item in clothing_items if item.get("source")]
+    metadata_context = ""
+    if titles:
+        metadata_context += f"Product titles found: {', '.join(titles[:3])}\n"
+    if sources:
+        metadata_context += f"Sources: {', '.join(set(sources[:3]))}\n"
+    return metadata_context
 
-async def generate_similar_item_queries(component_name: str, color: str = "", clothing_items: list = None, user_id: str = None) -> list:
+def fallback_similar_queries(component_name: str, color_name: str, user_characteristics: dict, count: int = 5) -> list:
+    """Template queries used when GPT output is missing or unusable."""
+    query = f"{component_name} {color_name}"
+    if user_characteristics.get("gender"):
+        query += f" {str(user_characteristics['gender']).lower()}"
+    return [query.strip()] * count
+
+def parse_batch_similar_queries(content: str, count: int) -> dict:
     """
-    Generate search queries based on metadata from reverse image search results
-    AND user's universal style characteristics from their style profile.
-    This creates much more personalized and relevant search queries.
+    Parse a batched GPT response of the form
+    {"components": [{"index": 0, "queries": [...]}, ...]} into {index: queries}.
     """
-    try:
-        # Convert hex color to color name
-        color_name = hex_to_color_name(color) if color else ""
-        
-        # Get user's style profile for universal characteristics
-        user_characteristics = {}
-        if user_id:
-            try:
-                from app.database import style_profiles_collection, style_quizzes_collection
-                
-                # Get user's style profile
-                style_profile = style_profiles_collection.find_one({"user_id": user_id})
-                if style_profile:
-                    user_characteristics["style_summary"] = style_profile.get("style_summary", "")
-                    user_characteristics["style_preferences"] = style_profile.get("style_preferences", [])
-                
-                # Get user's quiz responses for specific characteristics
-                quiz = style_quizzes_collection.find_one({"user_id": user_id, "completed": True})
-                if quiz:
-                    for response in quiz.get("responses", []):
-                        if response["question_id"] == "gender":
-                            user_characteristics["gender"] = response["response"]
-                        elif response["question_id"] == "age_range":
-                            user_characteristics["age_range"] = response["response"]
-                        elif response["question_id"] == "primary_style":
-                            user_characteristics["primary_style"] = response["response"]
-                        elif response["question_id"] == "silhouette_preference":
-                            user_characteristics["silhouette_preference"] = response["response"]
-                        elif response["question_id"] == "color_palette":
-                            user_characteristics["color_palette"] = response["response"]
-                        elif response["question_id"] == "material_preference":
-                            user_characteristics["material_preference"] = response["response"]
-                        elif response["question_id"] == "price_sensitivity":
-                            user_characteristics["price_sensitivity"] = response["response"]
-                        elif response["question_id"] == "season_focus":
-                            user_characteristics["season_focus"] = response["response"]
-            except Exception as e:
-                print(f"Error fetching user style profile: {e}")
-        
-        if not clothing_items or len(clothing_items) == 0:
-            # Fallback if no reverse image search results
-            base_query = f"{component_name} {color_name}".strip()
-            return [base_query]
-        
-        # Extract metadata from reverse image search results
-        titles = [item.get("title", "") for item in clothing_items if item.get("title")]
-        sources = [item.get("source", "") for item in clothing_items if item.get("source")]
-        
-        # Build context from reverse image search metadata
-        metadata_context = ""
-        if titles:
-            metadata_context += f"Product titles found: {', '.join(titles[:3])}\n"
-        if sources:
-            metadata_context += f"Sources: {', '.join(set(sources[:3]))}\n"
-        
-        # Build user characteristics context
-        user_context = ""
-        if user_characteristics:
-            user_context = "User Profile:\n"
-            if user_characteristics.get("gender"):
-                user_context += f"- Gender: {user_characteristics['gender']}\n"
-            if user_characteristics.get("age_range"):
-                user_context += f"- Age Range: {user_characteristics['age_range']}\n"
-            if user_characteristics.get("primary_style"):
-                user_context += f"- Primary Style: {user_characteristics['primary_style']}\n"
-            if user_characteristics.get("silhouette_preference"):
-                user_context += f"- Silhouette Preference: {user_characteristics['silhouette_preference']}\n"
-            if user_characteristics.get("color_palette"):
-                user_context += f"- Color Palette: {user_characteristics['color_palette']}\n"
-            if user_characteristics.get("material_preference"):
-                user_context += f"- Material Preference: {user_characteristics['material_preference']}\n"
-            if user_characteristics.get("price_sensitivity"):
-                user_context += f"- Price Range: {user_characteristics['price_sensitivity']}\n"
-            if user_characteristics.get("season_focus"):
-                user_context += f"- Season Focus: {user_characteristics['season_focus']}\n"
-        
-        # Create the prompt for GPT
-        prompt = f"""
-You are a fashion expert creating search queries for Google Shopping. Based on the following information, generate 5 highly specific and personalized search queries.
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.strip("`")
+        content = content[content.find("{"):]
+    start, end = content.find("{"), content.rfind("}")
+    if start == -1 or end == -1:
+        return {}
+    data = json.loads(content[start:end + 1])
+    parsed = {}
+    for entry in data.get("components", []):
+        index = entry.get("index")
+        queries = [q.strip() for q in entry.get("queries", []) if isinstance(q, str) and q.strip()]
+        if isinstance(index, int) and 0 <= index < count and queries:
+            parsed[index] = queries
+    return parsed
 
-{user_context}
+async def generate_similar_item_queries_batch(components: list, user_id: str = None) -> list:
+    """
+    Generate similar-item search queries for every component of an analysis in a single GPT call.
+    The user's style context is loaded once and shared by all components; components without
+    reverse image search results get a plain name + color query without an LLM round trip.
+    Returns one list of up to 5 queries per component, in input order.
+    """
+    user_characteristics = await load_user_characteristics(user_id)
+    # analyze_image names component colors already; older results only carry the hex value
+    color_names = [component.get("color_name") for component in components]
+    if not all(name is not None for name in color_names):
+        color_names = nearest_color_names([component.get("dominant_color", "") for component in components])
+    results = [[f"{component['name']} {color_names[i]}".strip()] for i, component in enumerate(components)]
 
-Reverse Image Search Results:
-{metadata_context}
+    llm_indexes = [i for i, component in enumerate(components) if component.get("clothing_items")]
+    if not llm_indexes:
+        return results
 
-Item Details:
-- Component: {component_name}
+    component_blocks = ""
+    for i in llm_indexes:
+        component_blocks += f"""
+Component {i}:
+- Component: {components[i]['name']}
+{format_search_metadata(components[i]['clothing_items'])}"""
+
+    prompt = f"""
+You are a fashion expert creating search queries for Google Shopping. For EACH component below, generate 5 highly specific and personalized search queries.
+
+{format_user_characteristics(user_characteristics)}
+
+Components with their reverse image search results:
+{component_blocks}
 
 Requirements:
 - Each query should be descriptive and 20 words or less
@@ -271,74 +235,27 @@ Requirements:
 - Focus on the user's price sensitivity and material preferences
 - Consider the user's silhouette preferences (tailored, oversized, form-fitting, etc.)
 
-Generate 5 search queries that would help this specific user find similar items:
+Respond with JSON only: {{"components": [{{"index": <component number>, "queries": ["...", "...", "...", "...", "..."]}}]}}
 """
-        
-        # Call GPT to generate queries
-        import openai
-        from app.config.settings import settings
-        
-        client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        
-        response = await client.chat.completions.create(
+
+    parsed = {}
+    try:
+        response = await chat_completion(
+            "similar.item_queries_batch",
             model="gpt-4",
             messages=[
-                {"role": "system", "content": "You are a fashion expert specializing in creating precise search queries for online shopping. Always respond with a JSON array of exactly 5 search query strings."},
+                {"role": "system", "content": "You are a fashion expert specializing in creating precise search queries for online shopping. Always respond with a JSON object containing exactly 5 search query strings per component."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
-            max_tokens=300
+            max_tokens=150 + 120 * len(llm_indexes)
         )
-        
-        # Parse the response
-        try:
-            import json
-            content = response.choices[0].message.content.strip()
-            
-            # Try to extract JSON array from the response
-            if content.startswith('[') and content.endswith(']'):
-                queries = json.loads(content)
-            else:
-                # If not JSON, try to extract queries from text
-                lines = content.split('\n')
-                queries = []
-                for line in lines:
-                    line = line.strip()
-                    if line and not line.startswith('#') and not line.startswith('-'):
-                        # Remove numbering and quotes
-                        line = line.replace('"', '').replace("'", "")
-                        if line.startswith(('1.', '2.', '3.', '4.', '5.')):
-                            line = line[2:].strip()
-                        if line:
-                            queries.append(line)
-            
-            # Ensure we have exactly 5 queries
-            if len(queries) > 5:
-                queries = queries[:5]
-            elif len(queries) < 5:
-                # Fill with fallback queries
-                while len(queries) < 5:
-                    fallback = f"{component_name} {color_name}"
-                    if user_characteristics.get("gender"):
-                        fallback += f" {user_characteristics['gender'].lower()}"
-                    queries.append(fallback)
-            
-            return queries
-            
-        except Exception as e:
-            print(f"Error parsing GPT response: {e}")
-            # Fallback queries
-            fallback_queries = []
-            for i in range(5):
-                query = f"{component_name} {color_name}"
-                if user_characteristics.get("gender"):
-                    query += f" {user_characteristics['gender'].lower()}"
-                if user_characteristics.get("primary_style"):
-                    query += f" {user_characteristics['primary_style'].lower()}"
-                fallback_queries.append(query)
-            return fallback_queries
-            
+        parsed = parse_batch_similar_queries(response.choices[0].message.content, len(components))
     except Exception as e:
-        print(f"Error in generate_similar_item_queries: {e}")
-        # Ultimate fallback
-        return [f"{component_name} {color_name}".strip()]
+        logger.error(f"Error generating batched similar queries: {e}")
+
+    for i in llm_indexes:
+        fallback = fallback_similar_queries(components[i]["name"], color_names[i], user_characteristics)
+        queries = parsed.get(i, [])[:5]
+        results[i] = queries + fallback[:5 - len(queries)]
+    return results
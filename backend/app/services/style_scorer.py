@@ -0,0 +1,55 @@
+import math
+from typing import Dict, List
+from app.data.style_quiz_weights import QUIZ_STYLE_WEIGHTS
+
+# Categories below this confidence are left out of the profile
+MIN_CONFIDENCE = 0.2
+MAX_PREFERENCES = 5
+
+def _answers(response) -> List[str]:
+    if isinstance(response, list):
+        return [str(r) for r in response if r]
+    return [str(response)] if response else []
+
+def score_style_categories(responses: List[dict]) -> Dict[str, float]:
+    """Sum the weight table over every structured answer. Free-text answers are ignored."""
+    scores: Dict[str, float] = {}
+    for response in responses:
+        weights = QUIZ_STYLE_WEIGHTS.get(response.get("question_id"), {})
+        for answer in _answers(response.get("response")):
+            for category, weight in weights.get(answer, {}).items():
+                scores[category] = scores.get(category, 0.0) + weight
+    return scores
+
+def score_style_preferences(responses: List[dict]) -> List[dict]:
+    """
+    Style preferences with confidence scores, strongest first. Raw scores saturate toward 1
+    (1 - e^-score), so a selected primary style alone maps to ~0.63 and corroborating answers
+    push it higher.
+    """
+    scores = score_style_categories(responses)
+    preferences = [
+        {"category": category, "confidence_score": round(1 - math.exp(-score), 2)}
+        for category, score in sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    ]
+    return [p for p in preferences if p["confidence_score"] >= MIN_CONFIDENCE][:MAX_PREFERENCES]
+
+def _first_answer(responses: List[dict], question_id: str) -> str:
+    for response in responses:
+        if response.get("question_id") == question_id:
+            answers = _answers(response.get("response"))
+            return answers[0] if answers else ""
+    return ""
+
+def local_style_summary(responses: List[dict], preferences: List[dict]) -> str:
+    """Template summary used until the LLM-written one is ready."""
+    categories = [p["category"] for p in preferences[:2]]
+    if not categories:
+        return "Your style profile is ready - keep exploring to help us learn your taste."
+    summary = f"You gravitate toward {' and '.join(categories)} styles"
+    palette = _first_answer(responses, "color_palette")
+    silhouette = _first_answer(responses, "silhouette_preference")
+    details = [d.lower() for d in (palette, silhouette and f"{silhouette} silhouettes") if d]
+    if details:
+        summary += f", favoring {' and '.join(details)}"
+    return summary + "."
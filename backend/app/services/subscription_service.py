@@ -4,6 +4,8 @@ from datetime import datetime, timedelta
 from typing import List, Optional
 from app.config.settings import settings
 from app.models.user import SubscriptionTier
+from app.repository import repo
+from app.services.quota_service import get_quota_status, reserve_quota, release_quota
 
 logger = logging.getLogger(__name__)
 
@@ -203,23 +205,23 @@ def create_checkout_session(tier_id: str, customer_email: str, success_url: str,
         logger.error(f"Error creating checkout session: {e}")
         raise
 
-def handle_subscription_webhook(event: dict) -> dict:
+async def handle_subscription_webhook(event: dict) -> dict:
     """Handle Stripe webhook events for subscription management"""
     try:
         event_type = event['type']
         
         if event_type == 'checkout.session.completed':
             session = event['data']['object']
-            return handle_checkout_completed(session)
+            return await handle_checkout_completed(session)
         elif event_type == 'customer.subscription.created':
             subscription = event['data']['object']
-            return handle_subscription_created(subscription)
+            return await handle_subscription_created(subscription)
         elif event_type == 'customer.subscription.updated':
             subscription = event['data']['object']
-            return handle_subscription_updated(subscription)
+            return await handle_subscription_updated(subscription)
         elif event_type == 'customer.subscription.deleted':
             subscription = event['data']['object']
-            return handle_subscription_deleted(subscription)
+            return await handle_subscription_deleted(subscription)
         else:
             return {'status': 'ignored', 'message': f'Unhandled event type: {event_type}'}
             
@@ -227,9 +229,8 @@ def handle_subscription_webhook(event: dict) -> dict:
         logger.error(f"Error handling webhook: {e}")
         raise
 
-def handle_checkout_completed(session: dict) -> dict:
+async def handle_checkout_completed(session: dict) -> dict:
     """Handle successful checkout completion"""
-    from app.database import users_collection
     import logging
     logger = logging.getLogger(__name__)
 
@@ -261,7 +262,7 @@ def handle_checkout_completed(session: dict) -> dict:
     # Calculate subscription end date (1 month from now)
     subscription_end_date = datetime.utcnow() + timedelta(days=30)
 
-    users_collection.update_one(
+    await repo.users_collection.update_one(
         {'email': customer_email},
         {
             '$set': {
@@ -280,15 +281,14 @@ def handle_checkout_completed(session: dict) -> dict:
         'tier': tier_id
     }
 
-def handle_subscription_created(subscription: dict) -> dict:
+async def handle_subscription_created(subscription: dict) -> dict:
     """Handle subscription creation"""
-    from app.database import users_collection
     
     customer_id = subscription['customer']
     subscription_id = subscription['id']
     
     # Find user by Stripe customer ID
-    user = users_collection.find_one({'stripe_customer_id': customer_id})
+    user = await repo.users_collection.find_one({'stripe_customer_id': customer_id})
     if not user:
         return {'status': 'error', 'message': 'User not found'}
     
@@ -299,7 +299,7 @@ def handle_subscription_created(subscription: dict) -> dict:
     else:
         subscription_end_date = datetime.utcnow() + timedelta(days=30)
     
-    users_collection.update_one(
+    await repo.users_collection.update_one(
         {'stripe_customer_id': customer_id},
         {
             '$set': {
@@ -315,15 +315,14 @@ def handle_subscription_created(subscription: dict) -> dict:
         'message': f'Subscription created for {user["email"]}'
     }
 
-def handle_subscription_updated(subscription: dict) -> dict:
+async def handle_subscription_updated(subscription: dict) -> dict:
     """Handle subscription updates"""
-    from app.database import users_collection
     
     customer_id = subscription['customer']
     subscription_id = subscription['id']
     
     # Find user by Stripe customer ID
-    user = users_collection.find_one({'stripe_customer_id': customer_id})
+    user = await repo.users_collection.find_one({'stripe_customer_id': customer_id})
     if not user:
         return {'status': 'error', 'message': 'User not found'}
     
@@ -332,7 +331,7 @@ def handle_subscription_updated(subscription: dict) -> dict:
     else:
         subscription_end_date = None
     
-    users_collection.update_one(
+    await repo.users_collection.update_one(
         {'stripe_customer_id': customer_id},
         {
             '$set': {
@@ -347,15 +346,14 @@ def handle_subscription_updated(subscription: dict) -> dict:
         'message': f'Subscription updated for {user["email"]}'
     }
 
-def handle_subscription_deleted(subscription: dict) -> dict:
+async def handle_subscription_deleted(subscription: dict) -> dict:
     """Handle subscription cancellation"""
-    from app.database import users_collection
     
     customer_id = subscription['customer']
     subscription_id = subscription['id']
     
     # Downgrade user to basic tier (not free) and clear subscription ID, and clear pending_cancellation
-    users_collection.update_one(
+    await repo.users_collection.update_one(
         {'stripe_customer_id': customer_id},
         {
             '$set': {
@@ -385,85 +383,47 @@ def cancel_subscription(subscription_id: str) -> dict:
         logger.error(f"Error canceling subscription: {e}")
         raise
 
-def check_upload_limit(user_email: str) -> dict:
-    """Check if user can upload based on their subscription and limits"""
-    from app.database import users_collection
-    
-    user = users_collection.find_one({'email': user_email})
-    if not user:
-        return {'can_upload': False, 'reason': 'User not found'}
-    
-    subscription_status = user.get('subscription_status', 'free')
-    
-    if subscription_status == 'premium':
-        return {'can_upload': True, 'reason': 'Premium user'}
-    
-    # Check weekly upload limit for free users
-    weekly_uploads_used = user.get('weekly_uploads_used', 0)
-    weekly_uploads_reset_date = user.get('weekly_uploads_reset_date')
-    
-    # Reset weekly count if it's a new week
-    if weekly_uploads_reset_date:
-        # Handle both string and datetime types
-        if isinstance(weekly_uploads_reset_date, str):
-            try:
-                reset_date = datetime.fromisoformat(weekly_uploads_reset_date.replace('Z', '+00:00'))
-            except Exception:
-                reset_date = datetime.utcnow()  # fallback to now if parsing fails
-        else:
-            reset_date = weekly_uploads_reset_date
-        if datetime.utcnow() > reset_date:
-            weekly_uploads_used = 0
-            weekly_uploads_reset_date = datetime.utcnow() + timedelta(days=7)
-            users_collection.update_one(
-                {'email': user_email},
-                {
-                    '$set': {
-                        'weekly_uploads_used': 0,
-                        'weekly_uploads_reset_date': weekly_uploads_reset_date
-                    }
-                }
-            )
-    
-    if weekly_uploads_used >= 3:  # Free users get 3 uploads per week
+def _upload_limit_result(status: dict) -> dict:
+    """Shape quota status the way upload limit callers expect it"""
+    if status.get('subscription') == 'premium':
+        return {'can_upload': status.get('allowed', True), 'reason': 'Premium user', 'week': status.get('week')}
+    if status.get('remaining', 0) <= 0 and not status.get('allowed'):
         return {
-            'can_upload': False, 
+            'can_upload': False,
             'reason': 'Weekly upload limit reached',
-            'uploads_used': weekly_uploads_used,
-            'uploads_limit': 3
+            'uploads_used': status['used'],
+            'uploads_limit': status['limit'],
+            'week': status.get('week')
         }
-    
     return {
         'can_upload': True,
         'reason': 'Within weekly limit',
-        'uploads_used': weekly_uploads_used,
-        'uploads_limit': 3
+        'uploads_used': status['used'],
+        'uploads_limit': status['limit'],
+        'week': status.get('week')
     }
 
-def increment_upload_count(user_email: str) -> None:
-    """Increment the user's upload count"""
-    from app.database import users_collection
-    
-    user = users_collection.find_one({'email': user_email})
-    if not user:
-        return
-    
-    weekly_uploads_used = user.get('weekly_uploads_used', 0)
-    weekly_uploads_reset_date = user.get('weekly_uploads_reset_date')
-    
-    # Set reset date if not exists
-    if not weekly_uploads_reset_date:
-        weekly_uploads_reset_date = datetime.utcnow() + timedelta(days=7)
-    
-    users_collection.update_one(
-        {'email': user_email},
-        {
-            '$set': {
-                'weekly_uploads_used': weekly_uploads_used + 1,
-                'weekly_uploads_reset_date': weekly_uploads_reset_date
-            }
-        }
-    )
+async def check_upload_limit(user_email: str) -> dict:
+    """Check if user can upload based on their subscription and limits (read-only)"""
+    status = await get_quota_status(user_email, 'uploads')
+    if 'error' in status:
+        return {'can_upload': False, 'reason': status['error']}
+    return _upload_limit_result(status)
+
+async def increment_upload_count(user_email: str) -> dict:
+    """
+    Atomically reserve one upload from the user's weekly allowance.
+    Free users are rejected once the weekly limit is reached; pass the returned
+    'week' to refund_upload_count if the upload is not processed.
+    """
+    reservation = await reserve_quota(user_email, 'uploads')
+    if 'error' in reservation:
+        return {'can_upload': False, 'reason': reservation['error']}
+    return _upload_limit_result(reservation)
+
+async def refund_upload_count(user_email: str, week: str) -> None:
+    """Give back an upload reserved with increment_upload_count"""
+    await release_quota(user_email, 'uploads', week)
 
 def cancel_subscription_for_user(user_email: str) -> dict:
     """Cancel the user's active subscription using their email (and stripe_customer_id)."""
@@ -0,0 +1,98 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+from app.config.settings import settings
+from app.repository import repo
+from app.services.background_service import spawn_once
+from app.services.llm_gateway import chat_completion
+from app.services.user_context_service import get_style_context, invalidate_style_context, preference_labels
+from models.user_models import StyleContext
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_SUGGESTIONS = [
+    "summer dresses",
+    "streetwear hoodies",
+    "vintage denim",
+    "formal shoes",
+    "casual sneakers",
+    "oversized sweaters",
+    "minimalist tops",
+    "pastel colored clothing"
+]
+
+async def generate_search_suggestions(context: StyleContext) -> List[str]:
+    """
+    Use GPT to generate 8 natural language search suggestions for a style profile.
+    """
+    preferences_str = ', '.join(preference_labels(context)) or 'Not specified'
+
+    prompt = f"""
+Based on this user's style profile, generate 8 personalized fashion search suggestions:
+
+Style Summary: {context.style_summary}
+Style Preferences: {preferences_str}
+
+Generate 8 natural language search queries that this user might want to search for.
+Make them diverse and relevant to their style preferences.
+Respond with only a JSON array of strings, no additional text.
+"""
+
+    response = await chat_completion(
+        "search.suggestions",
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": "You are a fashion expert. Respond with only a JSON array of strings."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.7,
+        max_tokens=200
+    )
+
+    try:
+        suggestions = json.loads(response.choices[0].message.content.strip())
+        if not isinstance(suggestions, list):
+            suggestions = []
+    except Exception:
+        suggestions = []
+    return [str(s) for s in suggestions]
+
+def suggestions_are_stale(context: StyleContext) -> bool:
+    """True when stored suggestions are missing, older than the max age, or built from an older profile."""
+    if not context.search_suggestions:
+        return True
+    if context.search_suggestions_profile_hash != context.fingerprint:
+        return True
+    updated_at = context.search_suggestions_updated_at
+    max_age = timedelta(seconds=settings.SEARCH_SUGGESTIONS_MAX_AGE_SECONDS)
+    return not updated_at or datetime.utcnow() - updated_at > max_age
+
+async def refresh_search_suggestions(user_id: str) -> Optional[List[str]]:
+    """Regenerate and store search suggestions on the user's style profile, unless they are still current."""
+    context = await get_style_context(user_id)
+    if not context.has_profile:
+        return None
+    if not suggestions_are_stale(context):
+        return context.search_suggestions
+    suggestions = await generate_search_suggestions(context)
+    if not suggestions:
+        logger.warning(f"GPT returned no search suggestions for user {user_id}")
+        return None
+    await repo.style_profiles_collection.update_one(
+        {"user_id": user_id},
+        {
+            "$set": {
+                "search_suggestions": suggestions,
+                "search_suggestions_profile_hash": context.fingerprint,
+                "search_suggestions_updated_at": datetime.utcnow()
+            }
+        }
+    )
+    invalidate_style_context(user_id)
+    logger.info(f"Stored {len(suggestions)} search suggestions for user {user_id}")
+    return suggestions
+
+def schedule_suggestion_refresh(user_id: str):
+    """Regenerate a user's search suggestions in the background, coalescing duplicate requests."""
+    spawn_once(("search_suggestions", user_id), lambda: refresh_search_suggestions(user_id), "search suggestion refresh")
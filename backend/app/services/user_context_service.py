@@ -0,0 +1,139 @@
+import hashlib
+import itertools
+import json
+import logging
+import threading
+from typing import List, Optional
+from app.config.settings import settings
+from app.repository import repo
+from app.services.cache_service import TTLCache
+from app.services.metrics_service import metrics
+from models.user_models import StyleContext
+
+logger = logging.getLogger(__name__)
+
+NO_PROFILE_HASH = "no-profile"
+
+# Quiz questions copied onto the snapshot
+QUIZ_CONTEXT_FIELDS = [
+    "gender", "age_range", "primary_style", "silhouette_preference",
+    "color_palette", "material_preference", "price_sensitivity", "season_focus"
+]
+
+PROFILE_LIST_FIELDS = ["style_categories", "color_preferences", "fit_preferences", "occasion_preferences"]
+
+# user_id -> StyleContext
+_context_cache = TTLCache(max_size=5000, ttl_seconds=settings.STYLE_CONTEXT_CACHE_TTL_SECONDS)
+
+# user_id -> version stamp; bumped on every invalidation so a snapshot built from data read
+# before a concurrent update is never cached. Versions come from a global counter so an
+# evicted stamp can never be reissued.
+_versions = TTLCache(max_size=50000, ttl_seconds=settings.STYLE_CONTEXT_CACHE_TTL_SECONDS * 2)
+_version_counter = itertools.count(1)
+_version_lock = threading.Lock()
+
+def _current_version(user_id: str) -> int:
+    return _versions.get(user_id) or 0
+
+def _answer_text(answer) -> Optional[str]:
+    if isinstance(answer, list):
+        answer = ", ".join(str(a) for a in answer if a)
+    return str(answer) if answer else None
+
+def _as_list(value) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [str(v) for v in value if v]
+    return [str(value)]
+
+def profile_fingerprint(style_profile: Optional[dict]) -> str:
+    """Stable hash of the profile fields that feed prompts (summary and preferences)."""
+    if not style_profile:
+        return NO_PROFILE_HASH
+    payload = json.dumps(
+        {
+            "style_summary": style_profile.get("style_summary", ""),
+            "style_preferences": style_profile.get("style_preferences", []),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+async def build_style_context(user_id: str, version: int = 0) -> StyleContext:
+    """Read the user's style profile and completed quiz and fold them into one snapshot."""
+    profile = await repo.style_profiles_collection.find_one({"user_id": user_id})
+    quiz = await repo.style_quizzes_collection.find_one(
+        {"user_id": user_id, "completed": True, "archived": {"$ne": True}},
+        {"responses": 1}
+    )
+
+    context = {"user_id": user_id, "version": version, "fingerprint": profile_fingerprint(profile)}
+    if profile:
+        context.update(
+            has_profile=True,
+            style_summary=profile.get("style_summary") or "",
+            style_preferences=profile.get("style_preferences") or [],
+            profile_updated_at=profile.get("updated_at"),
+            lifestyle=str(profile.get("lifestyle") or ""),
+            budget_range=str(profile.get("budget_range") or ""),
+            search_suggestions=profile.get("search_suggestions") or [],
+            search_suggestions_profile_hash=profile.get("search_suggestions_profile_hash"),
+            search_suggestions_updated_at=profile.get("search_suggestions_updated_at"),
+            search_queries=profile.get("search_queries") or [],
+            search_queries_profile_hash=profile.get("search_queries_profile_hash"),
+        )
+        for field in PROFILE_LIST_FIELDS:
+            context[field] = _as_list(profile.get(field))
+    if quiz:
+        context["has_completed_quiz"] = True
+        for response in quiz.get("responses", []):
+            if response.get("question_id") in QUIZ_CONTEXT_FIELDS:
+                context[response["question_id"]] = _answer_text(response.get("response"))
+    return StyleContext(**context)
+
+async def get_style_context(user_id: str) -> StyleContext:
+    """
+    Cached style snapshot for a user. Snapshots are dropped by invalidate_style_context whenever
+    the quiz or profile changes; the TTL only bounds staleness for writes made outside this process.
+    """
+    version = _current_version(user_id)
+    cached = _context_cache.get(user_id)
+    if cached is not None and cached.version == version:
+        metrics.increment("style_context_cache_total", outcome="hit")
+        return cached
+
+    metrics.increment("style_context_cache_total", outcome="miss")
+    context = await build_style_context(user_id, version)
+    with _version_lock:
+        if _current_version(user_id) == version:
+            _context_cache.set(user_id, context)
+    return context
+
+def invalidate_style_context(user_id: str) -> None:
+    """Drop the cached snapshot and bump the user's version stamp."""
+    with _version_lock:
+        _versions.set(user_id, next(_version_counter))
+        _context_cache.delete(user_id)
+
+def preference_labels(context: StyleContext) -> List[str]:
+    """Style preferences as plain labels; stored preferences may be dicts or strings."""
+    labels = []
+    for pref in context.style_preferences:
+        if isinstance(pref, dict):
+            labels.append(str(pref.get("category") or pref.get("value") or pref))
+        else:
+            labels.append(str(pref))
+    return labels
+
+def format_style_profile(context: StyleContext) -> str:
+    """The "User Style Profile" block shared by prompts that personalize on the profile summary."""
+    if not context.has_profile:
+        return ""
+    preferences_str = ", ".join(preference_labels(context)) or "Not specified"
+    return f"""
+User Style Profile:
+- Style Summary: {context.style_summary}
+- Style Preferences: {preferences_str}
+"""
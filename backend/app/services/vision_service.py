@@ -8,6 +8,7 @@ from google.cloud import vision
 from app.services.s3_service import upload_to_s3
 from app.services.search_service import get_clothing_from_google_search
 from app.services.remove_bg_service import remove_background
+from app.services.color_service import nearest_color_names
 from app.config.settings import settings
 
 client = vision.ImageAnnotatorClient()
@@ -152,6 +153,10 @@ def analyze_image(filepath: str, filename: str):
                 logger.warning("\u26a0\ufe0f Component processing failed: %s", e)
                 continue
 
+        # Name every component color in one vectorized lookup
+        for component, name in zip(components, nearest_color_names([c["dominant_color"] for c in components])):
+            component["color_name"] = name
+
         try:
             _, buffer = cv2.imencode(".jpg", annotated_image)
             base64_image = base64.b64encode(buffer).decode("utf-8")
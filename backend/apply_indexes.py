@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Apply the index registry (app/indexes.py) and report which indexes changed.
+Pass --rebuild to drop and recreate indexes whose keys or options differ from the registry
+(each one is unavailable to queries while it rebuilds).
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.indexes import apply_indexes, check_query_plans
+
+SYMBOLS = {
+    "created": "➕",
+    "updated": "✏️",
+    "rebuilt": "🔁",
+    "unchanged": "✅",
+    "mismatched": "⚠️",
+    "unmanaged": "⚠️",
+    "failed": "❌",
+}
+
+if __name__ == "__main__":
+    report = apply_indexes(rebuild="--rebuild" in sys.argv[1:])
+    for entry in report:
+        error = f" ({entry['error']})" if entry.get("error") else ""
+        print(f"{SYMBOLS[entry['action']]} {entry['collection']}.{entry['index']}: {entry['action']}{error}")
+    changed = sum(entry["action"] in ("created", "updated", "rebuilt") for entry in report)
+    print(f"\n{changed} index(es) changed")
+    if any(entry["action"] == "mismatched" for entry in report):
+        print("Run with --rebuild to recreate mismatched indexes")
+
+    for scan in check_query_plans():
+        print(f"⚠️  Collection scan: {scan['collection']} {scan['query']} sort={scan['sort']}")
+
+    if any(entry["action"] == "failed" for entry in report):
+        sys.exit(1)
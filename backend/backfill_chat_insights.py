@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+Backfill the running chat insights aggregates from the interaction log
+"""
+
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.chat_insights_service import backfill_chat_insights
+
+if __name__ == "__main__":
+    email = sys.argv[1] if len(sys.argv) > 1 else None
+    created = asyncio.run(backfill_chat_insights(email))
+    print(f"✅ Created chat insights for {created} user(s)")
@@ -1,6 +1,7 @@
 from typing import List, Optional, Union
 from pydantic import BaseModel, Field
 from uuid import UUID, uuid4
+from datetime import datetime
 
 class StylePreference(BaseModel):
     category: str
@@ -35,3 +36,41 @@ class StyleQuiz(BaseModel):
 class SubmitQuizResponseRequest(BaseModel):
     question_id: str
     response: Union[str, List[str]]
+
+class BulkQuizSubmitRequest(BaseModel):
+    responses: List[SubmitQuizResponseRequest]
+    complete: bool = False
+
+class StyleContext(BaseModel):
+    """Compact snapshot of the style profile and quiz answers used to personalize LLM prompts."""
+    user_id: str
+    version: int = 0
+    fingerprint: str
+    has_profile: bool = False
+    has_completed_quiz: bool = False
+    style_summary: str = ""
+    style_preferences: List[Union[dict, str]] = []
+    profile_updated_at: Optional[datetime] = None
+    # Quiz answers (multi-select answers are joined with ", ")
+    gender: Optional[str] = None
+    age_range: Optional[str] = None
+    primary_style: Optional[str] = None
+    silhouette_preference: Optional[str] = None
+    color_palette: Optional[str] = None
+    material_preference: Optional[str] = None
+    price_sensitivity: Optional[str] = None
+    season_focus: Optional[str] = None
+    # Extended profile fields written by the chatbot
+    style_categories: List[str] = []
+    color_preferences: List[str] = []
+    fit_preferences: List[str] = []
+    occasion_preferences: List[str] = []
+    lifestyle: str = ""
+    budget_range: str = ""
+    # Search suggestions precomputed on the profile
+    search_suggestions: List[str] = []
+    search_suggestions_profile_hash: Optional[str] = None
+    search_suggestions_updated_at: Optional[datetime] = None
+    # Discovery page search queries, stored per profile version
+    search_queries: List[str] = []
+    search_queries_profile_hash: Optional[str] = None
@@ -119,6 +119,50 @@ export const fetchGoogleShoppingLightResults = async (query: string) => {
   }
 }
 
+/**
+ * Runs a fashion search against the streaming endpoint, calling onEvent for each
+ * newline-delimited JSON event ("start", "results", "query", "done", "error").
+ * "results" events carry the full merged result list for the current stage.
+ * @param query The natural language search query.
+ * @param numResults Number of results to fetch (default 10).
+ * @param onEvent Callback invoked for every streamed event.
+ */
+export const streamFashionSearch = async (
+  query: string,
+  numResults: number = 10,
+  onEvent: (event: any) => void
+) => {
+  const baseUrl = (process.env.NEXT_PUBLIC_API_URL || "http://127.0.0.1:8000") + "/api"
+  const response = await fetch(
+    `${baseUrl}/fashion/fashion-search/stream?query=${encodeURIComponent(query)}&num_results=${numResults}`,
+    {
+      method: 'POST',
+      headers: { 'Authorization': `Bearer ${localStorage.getItem('token')}` },
+    }
+  )
+  if (!response.ok || !response.body) {
+    const error: any = new Error(`Fashion search failed with status ${response.status}`)
+    error.status = response.status
+    error.detail = await response.json().then((data) => data.detail).catch(() => undefined)
+    throw error
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    const lines = buffer.split('\n')
+    buffer = lines.pop() || ''
+    for (const line of lines) {
+      if (line.trim()) onEvent(JSON.parse(line))
+    }
+  }
+  if (buffer.trim()) onEvent(JSON.parse(buffer))
+}
+
 /**
  * Starts a new style chat conversation.
  * @returns Promise with initial chat response
@@ -152,6 +196,53 @@ export const sendChatMessage = async (message: string, context: any = {}) => {
   }
 }
 
+/**
+ * Sends a message to the style chatbot and streams the reply (Server-Sent Events).
+ * onEvent receives { event: 'token', data: { text } } while the reply is generated,
+ * then { event: 'final', data: { response, suggestions, style_insights, next_questions } }
+ * and finally { event: 'done' }. Failures arrive as { event: 'error', data: { detail } }.
+ */
+export const streamChatMessage = async (
+  message: string,
+  context: any = {},
+  onEvent: (event: { event: string; data: any }) => void
+) => {
+  const baseUrl = (process.env.NEXT_PUBLIC_API_URL || "http://127.0.0.1:8000") + "/api"
+  const response = await fetch(`${baseUrl}/users/chat/style/stream`, {
+    method: 'POST',
+    headers: {
+      'Authorization': `Bearer ${localStorage.getItem('token')}`,
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ message, context }),
+  })
+  if (!response.ok || !response.body) {
+    throw new Error(`Chat stream failed with status ${response.status}`)
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  const dispatch = (block: string) => {
+    let event = 'message'
+    let data = ''
+    for (const line of block.split('\n')) {
+      if (line.startsWith('event:')) event = line.slice(6).trim()
+      else if (line.startsWith('data:')) data += line.slice(5).trim()
+    }
+    if (data) onEvent({ event, data: JSON.parse(data) })
+  }
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    const blocks = buffer.split('\n\n')
+    buffer = blocks.pop() || ''
+    blocks.forEach(dispatch)
+  }
+  if (buffer.trim()) dispatch(buffer)
+}
+
 /**
  * Gets the user's style profile from chat interactions.
  * @returns Promise with style profile data
@@ -193,6 +284,8 @@ export const closet = {
   addItem: (item: any) => api.post('/closet/', item),
   deleteItem: (itemId: string) => api.delete(`/closet/delete?id=${itemId}`),
   getUserCloset: (username: string) => api.get(`/closet/user/${username}`),
+  getCategory: (name: string, after?: string | null) =>
+    api.get(`/closet/category/${encodeURIComponent(name)}${after ? `?after=${encodeURIComponent(after)}` : ''}`),
 }
 
 // Wishlist endpoints
@@ -232,6 +325,8 @@ export const subscription = {
 export const styleQuiz = {
   getQuestions: () => api.get('/style/quiz/questions'),
   submitResponse: (data: any) => api.post('/style/quiz/response', data),
+  submitResponses: (responses: { question_id: string; response: string | string[] }[], complete = false) =>
+    api.post('/style/quiz/submit-responses', { responses, complete }),
   getRecommendations: () => api.get('/style/recommendations'),
 }
 
@@ -3,6 +3,7 @@ from fastapi.testclient import TestClient
 
 from app.main import app
 import app.database as db
+from app.repository import MongomockAsyncDatabase, repo
 
 client = TestClient(app)
 
@@ -16,6 +17,7 @@ db.wishlist_collection = mock_db["wishlists"]
 db.style_profiles_collection = mock_db["style_profiles"]
 db.user_interactions_collection = mock_db["interactions"]
 db.style_quizzes_collection = mock_db["quizzes"]
+repo.use_database(MongomockAsyncDatabase(mock_db))
 
 
 def test_register_and_login():
@@ -0,0 +1,22 @@
+import asyncio
+
+from app.services.background_service import debounce
+
+
+def test_debounce_coalesces_bursts_and_reruns_for_late_calls():
+    runs = []
+
+    async def work():
+        runs.append(len(runs))
+        if len(runs) == 1:
+            # A call that lands while the work runs schedules exactly one more run
+            debounce("profile", work, 0.01)
+            debounce("profile", work, 0.01)
+
+    async def scenario():
+        for _ in range(10):
+            debounce("profile", work, 0.01)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+    assert runs == [0, 1]
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+
+from app.repository import MongomockAsyncDatabase, repo
+from app.services import chat_insights_service
+from app.services.chat_insights_service import backfill_chat_insights, get_chat_insights, record_chat_interaction
+
+mock_db = mongomock.MongoClient()["test_db"]
+
+
+@pytest.fixture(autouse=True)
+def mongomock_repository(monkeypatch):
+    repo.use_database(MongomockAsyncDatabase(mock_db))
+    # Refreshes are driven explicitly below
+    monkeypatch.setattr(chat_insights_service, "schedule_chat_insights_refresh", lambda user_id: None)
+
+
+def test_view_is_materialized_and_recommendations_reused(monkeypatch):
+    calls = []
+
+    async def fake_recommendations(profile, insights):
+        calls.append(insights)
+        return ["Try a camel coat"]
+
+    monkeypatch.setattr(chat_insights_service, "generate_chat_recommendations", fake_recommendations)
+    user_id = "insights@example.com"
+    mock_db["style_profiles"].insert_one({
+        "user_id": user_id, "style_summary": "Relaxed neutrals", "style_preferences": ["Navy"], "quiz_responses": {"q": "a"}
+    })
+    asyncio.run(record_chat_interaction(user_id, "chat_start"))
+    asyncio.run(record_chat_interaction(user_id, "chat_message", {"favorite_color": "navy"}))
+    asyncio.run(record_chat_interaction(user_id, "chat_message", {"fit": "relaxed", "favorite_color": "olive"}))
+
+    view = asyncio.run(get_chat_insights(user_id))
+    assert view["chat_insights"]["total_interactions"] == 3
+    assert view["chat_insights"]["favorite_color"] == "olive"
+    assert view["style_evolution"] == {
+        "early_preferences": ["favorite_color"],
+        "recent_preferences": ["favorite_color", "fit"],
+        "total_interactions": 2
+    }
+    assert view["recommendations"] == ["Try a camel coat"]
+    assert view["existing_profile"] == {"style_summary": "Relaxed neutrals", "style_preferences": ["Navy"]}
+
+    # Served from the stored document; nothing changed, so recommendations are not regenerated
+    assert asyncio.run(get_chat_insights(user_id)) == view
+    asyncio.run(chat_insights_service.refresh_chat_insights(user_id))
+    assert len(calls) == 1
+
+    # A new value for a known topic keeps the recommendations; a new topic regenerates them
+    asyncio.run(record_chat_interaction(user_id, "chat_message", {"favorite_color": "rust"}))
+    assert asyncio.run(chat_insights_service.refresh_chat_insights(user_id))["chat_insights"]["favorite_color"] == "rust"
+    assert len(calls) == 1
+    asyncio.run(record_chat_interaction(user_id, "chat_message", {"budget": "mid"}))
+    asyncio.run(chat_insights_service.refresh_chat_insights(user_id))
+    assert len(calls) == 2
+
+
+def test_backfill_matches_the_interaction_log():
+    start = datetime(2025, 1, 1)
+    log = [
+        ("chat_start", {}),
+        ("chat_message", {"insights": {"fit": "slim"}}),
+        ("chat_message", {}),
+        ("chat_message", {"insights": {"fit": "relaxed", "budget": "mid"}}),
+        ("chat_message", {"insights": {"budget": "high"}}),
+    ]
+    mock_db["user_interactions"].insert_many([
+        {"user_id": "backfill@example.com", "interaction_type": kind, "metadata": metadata, "created_at": start + timedelta(minutes=i)}
+        for i, (kind, metadata) in enumerate(log)
+    ])
+
+    assert asyncio.run(backfill_chat_insights()) == 1
+    doc = mock_db["chat_insights"].find_one({"user_id": "backfill@example.com"})
+    assert (doc["total_interactions"], doc["message_count"]) == (5, 4)
+    assert doc["insights"] == {"fit": "relaxed", "budget": "high"}
+    assert chat_insights_service.style_evolution(doc) == {
+        "early_preferences": ["fit"],
+        "recent_preferences": ["budget", "fit"],
+        "total_interactions": 4
+    }
+
+    # Users that already have aggregates are left alone
+    assert asyncio.run(backfill_chat_insights()) == 0
@@ -0,0 +1,84 @@
+import asyncio
+from types import SimpleNamespace
+
+import mongomock
+import pytest
+
+from app.config.settings import settings
+from app.repository import MongomockAsyncDatabase, repo
+from app.services import chat_session_service
+from app.services.chat_session_service import append_chat_turn, format_conversation, load_chat_session
+
+mock_db = mongomock.MongoClient()["test_db"]
+
+
+@pytest.fixture(autouse=True)
+def mongomock_repository():
+    repo.use_database(MongomockAsyncDatabase(mock_db))
+
+
+def test_turns_are_kept_as_a_rolling_window(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_SESSION_MAX_TURNS", 3)
+
+    for i in range(5):
+        asyncio.run(append_chat_turn("session@example.com", {"user_message": f"question {i}", "bot_response": f"answer {i}"}))
+
+    stored = mock_db["chat_sessions"].find_one({"user_id": "session@example.com"})
+    assert [turn["user_message"] for turn in stored["turns"]] == ["question 2", "question 3", "question 4"]
+    assert stored["profile"]["summary"].startswith("No existing style profile")
+
+    # A fresh process reads the same window back with a single document read
+    chat_session_service._session_cache.clear()
+    session = asyncio.run(load_chat_session("session@example.com"))
+    assert [turn["bot_response"] for turn in session["turns"]] == ["answer 2", "answer 3", "answer 4"]
+
+
+def test_older_turns_are_folded_into_the_summary(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_RECENT_TURNS", 2)
+    user_id = "summary@example.com"
+    for i in range(4):
+        asyncio.run(append_chat_turn(user_id, {"user_message": f"question {i}", "bot_response": f"answer {i}"}))
+
+    async def fake_completion(call_site, **params):
+        assert "question 1" in params["messages"][1]["content"]
+        assert "question 2" not in params["messages"][1]["content"]
+        message = SimpleNamespace(content="Asked about questions 0 and 1.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(chat_session_service, "chat_completion", fake_completion)
+    asyncio.run(chat_session_service.compact_chat_session(user_id))
+
+    stored = mock_db["chat_sessions"].find_one({"user_id": user_id})
+    assert stored["summary"] == "Asked about questions 0 and 1."
+    assert [turn["user_message"] for turn in stored["turns"]] == ["question 2", "question 3"]
+
+    conversation = format_conversation(asyncio.run(load_chat_session(user_id)))
+    assert conversation.startswith("Summary of earlier conversation: Asked about questions 0 and 1.")
+    assert "question 0" not in conversation and "User: question 3" in conversation
+
+
+def test_concurrent_first_requests_store_the_history_once(monkeypatch):
+    user_id = "racing@example.com"
+    mock_db["user_interactions"].insert_one({
+        "user_id": user_id,
+        "interaction_type": "chat_message",
+        "metadata": {"user_message": "earlier question", "bot_response": "earlier answer"},
+    })
+    bootstrap_turns = chat_session_service._bootstrap_turns
+
+    async def slow_bootstrap(user_id):
+        turns = await bootstrap_turns(user_id)
+        await asyncio.sleep(0.01)
+        return turns
+
+    monkeypatch.setattr(chat_session_service, "_bootstrap_turns", slow_bootstrap)
+
+    async def first_requests():
+        await asyncio.gather(*(
+            append_chat_turn(user_id, {"user_message": f"question {i}", "bot_response": f"answer {i}"})
+            for i in range(2)
+        ))
+
+    asyncio.run(first_requests())
+    stored = mock_db["chat_sessions"].find_one({"user_id": user_id})
+    assert sorted(turn.get("user_message") for turn in stored["turns"]) == ["earlier question", "question 0", "question 1"]
@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth.dependencies import get_current_user_id
+from app.routes import users
+from app.services import chatbot_service
+from app.services.chatbot_service import STRUCTURED_DELIMITER, StyleChatbot
+
+
+@pytest.fixture
+def chunks(monkeypatch):
+    """Replace the model stream with whatever chunks the test puts in the returned list."""
+    stream = []
+
+    async def fake_stream(call_site, **kwargs):
+        for chunk in stream:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    async def fake_prompt(self, user_id, message):
+        return ""
+
+    monkeypatch.setattr(chatbot_service, "stream_chat_completion", fake_stream)
+    monkeypatch.setattr(StyleChatbot, "_build_message_prompt", fake_prompt)
+    monkeypatch.setattr(chatbot_service, "spawn", lambda coro, name: coro.close())
+    return stream
+
+
+def run_stream():
+    async def collect():
+        return [event async for event in StyleChatbot().stream_message("chat@example.com", "hi")]
+    events = asyncio.run(collect())
+    tokens = [e["text"] for e in events if e["type"] == "token"]
+    assert [e["type"] for e in events][-1] == "final"
+    return tokens, events[-1]
+
+
+def test_delimiter_split_across_chunks_is_never_streamed(chunks):
+    chunks += ["Try a camel ", "coat.\n<<<STY", "LE_DA", 'TA>>>{"style_insights": {"fit": "relaxed"}, "next_questions": ["What shoes?"]}']
+
+    tokens, final = run_stream()
+
+    assert "".join(tokens) == "Try a camel coat."
+    assert not any("<" in token for token in tokens)
+    assert final["message"] == "Try a camel coat."
+    assert final["style_insights"] == {"fit": "relaxed"}
+    assert final["next_questions"] == ["What shoes?"]
+    assert final["suggestions"] == []
+
+
+def test_reply_without_delimiter_is_streamed_in_full(chunks):
+    chunks += ["Layer a ", "knit over ", "the shirt."]
+
+    tokens, final = run_stream()
+
+    assert "".join(tokens) == "Layer a knit over the shirt."
+    # The last few characters are held back until the stream ends
+    assert tokens[-1].endswith("shirt.")
+    assert final["message"] == "Layer a knit over the shirt."
+    assert final["style_insights"] == {} and final["next_questions"] == []
+
+
+def test_trailing_partial_delimiter_is_flushed_as_text(chunks):
+    chunks += ["Short answer ", STRUCTURED_DELIMITER[:5]]
+
+    tokens, final = run_stream()
+
+    assert "".join(tokens) == final["message"] == "Short answer " + STRUCTURED_DELIMITER[:5]
+
+
+def test_sse_framing(monkeypatch):
+    async def fake_stream_message(user_id, message, context=None):
+        yield {"type": "token", "text": "Hello"}
+        yield {"type": "final", "message": "Hello", "style_insights": {"fit": "slim"}, "next_questions": [], "suggestions": ["More"]}
+
+    monkeypatch.setattr(users.style_chatbot, "stream_message", fake_stream_message)
+    app = FastAPI()
+    app.include_router(users.router, prefix="/api/users")
+    app.dependency_overrides[get_current_user_id] = lambda: "chat@example.com"
+
+    res = TestClient(app).post("/api/users/chat/style/stream", json={"message": "hi"})
+
+    assert res.headers["content-type"].startswith("text/event-stream")
+    frames = [frame.split("\n") for frame in res.text.split("\n\n") if frame]
+    assert [(event, json.loads(data[len("data: "):])) for event, data in frames] == [
+        ("event: token", {"text": "Hello"}),
+        ("event: final", {"response": "Hello", "suggestions": ["More"], "style_insights": {"fit": "slim"}, "next_questions": []}),
+        ("event: done", {}),
+    ]
@@ -0,0 +1,59 @@
+import asyncio
+
+import mongomock
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth.dependencies import get_current_user_id
+from app.repository import MongomockAsyncDatabase, repo
+from app.routes import closet
+from app.routes.closet import get_closet_preview
+
+mock_db = mongomock.MongoClient()["test_db"]
+
+
+@pytest.fixture(autouse=True)
+def mongomock_repository():
+    repo.use_database(MongomockAsyncDatabase(mock_db))
+
+
+def test_preview_groups_by_category_and_counts_every_color():
+    mock_db["closets"].insert_many(
+        [{"user_id": "closet@example.com", "category": "tops", "name": f"Top {i}", "thumbnail": f"top{i}.png", "color": "#000000"} for i in range(8)]
+        + [{"user_id": "closet@example.com", "category": "shoes", "name": "Boot", "thumbnail": "boot.png", "color": "#ffffff"}]
+        + [{"user_id": "closet@example.com", "category": "bags", "name": "Tote", "thumbnail": "tote.png"}]
+    )
+
+    preview = asyncio.run(get_closet_preview("closet@example.com"))
+
+    assert [g["name"] for g in preview["closet"]] == ["tops", "shoes", "bags"]
+    tops = preview["closet"][0]
+    assert tops["image_url"] == "top0.png"
+    assert [item["name"] for item in tops["clothing_items"]] == [f"Top {i}" for i in range(6)]
+    assert isinstance(tops["clothing_items"][0]["_id"], str)
+    assert tops["clothing_items"][0]["color_name"] == "black"
+    # Facets count the whole closet, not just the preview
+    assert {f["name"]: f["count"] for f in preview["color_facets"]} == {"black": 8, "white": 1}
+    assert asyncio.run(get_closet_preview("empty@example.com")) == {"closet": [], "color_facets": []}
+
+
+def test_category_pages_follow_the_cursor():
+    app = FastAPI()
+    app.include_router(closet.router, prefix="/api/closet")
+    app.dependency_overrides[get_current_user_id] = lambda: "pages@example.com"
+    client = TestClient(app)
+    mock_db["closets"].insert_many(
+        [{"user_id": "pages@example.com", "category": "shoes", "name": f"Shoe {i}", "thumbnail": ""} for i in range(5)]
+        + [{"user_id": "pages@example.com", "category": "tops", "name": "Tee", "thumbnail": ""}]
+    )
+
+    names, after = [], None
+    for _ in range(3):
+        res = client.get("/api/closet/category/shoes", params={"limit": 2, **({"after": after} if after else {})})
+        assert res.status_code == 200
+        names += [item["name"] for item in res.json()["clothing_items"]]
+        after = res.json()["next_cursor"]
+    assert names == [f"Shoe {i}" for i in range(5)]
+    assert after is None
+    assert client.get("/api/closet/category/shoes", params={"after": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,11 @@
+from app.services.color_service import nearest_color_names, parse_hex
+
+
+def test_batch_lookup_names_colors_in_input_order():
+    names = nearest_color_names(["#000000", "#FFF", "#1a2540", "not-a-color", "#c4a57a"])
+    assert names == ["black", "white", "navy blue", "", "camel"]
+
+
+def test_parse_hex_requires_hash_prefix():
+    assert parse_hex("#AbC") == "#aabbcc"
+    assert parse_hex("abc") is None
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import time
+
+import anyio
+import mongomock
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth.dependencies import get_current_user_id
+from app.repository import MongomockAsyncDatabase, repo
+from app.routes import fashion_search
+from app.services.search_service import canonicalize_query, dedupe_shopping_results, shopping_results_cache
+
+app = FastAPI()
+app.include_router(fashion_search.router, prefix="/api/fashion")
+app.dependency_overrides[get_current_user_id] = lambda: "stream@example.com"
+client = TestClient(app)
+
+
+def item(title, link=None):
+    return {"title": title, "link": link if link is not None else f"https://shop.example/{title}"}
+
+
+@pytest.fixture
+def refunds(monkeypatch):
+    refunded = []
+
+    async def fake_reserve(user_id):
+        return {"week": "2025-W01", "remaining": 2}
+
+    async def fake_refund(user_id, reservation):
+        refunded.append(reservation)
+        return reservation
+
+    monkeypatch.setattr(fashion_search, "reserve_search", fake_reserve)
+    monkeypatch.setattr(fashion_search, "refund_search", fake_refund)
+
+    async def fake_optimize(query, user_id=None):
+        return "women's linen dress"
+
+    monkeypatch.setattr(fashion_search, "generate_optimized_search_query", fake_optimize)
+    return refunded
+
+
+def stream(query):
+    res = client.post("/api/fashion/fashion-search/stream", params={"query": query})
+    assert res.status_code == 200
+    return [json.loads(line) for line in res.text.splitlines() if line]
+
+
+def test_canonicalize_query_and_dedupe():
+    assert canonicalize_query("  Linen   DRESS ") == "linen dress"
+    assert canonicalize_query(None) == ""
+    merged = dedupe_shopping_results(
+        [item("A"), {"title": "Search failed", "link": ""}],
+        [item("A"), item("B", link=""), item("b", link=""), None],
+        [item("C")]
+    )
+    assert [i["title"] for i in merged] == ["A", "B", "C"]
+
+
+def test_stream_event_order(monkeypatch, refunds):
+    shopping_results_cache.set(("fashion_search", "summer linen dress", 10), [item("cached")])
+    monkeypatch.setattr(fashion_search, "get_google_shopping_light_results", lambda q, n: [item("cached"), item("light")])
+    monkeypatch.setattr(fashion_search, "get_shopping_results_from_serpapi", lambda q, n: [item("light"), item("full")])
+
+    events = stream("Summer  linen dress")
+
+    assert [(e["type"], e.get("stage")) for e in events] == [
+        ("start", None), ("results", "cached"), ("results", "light"), ("query", None), ("results", "full"), ("done", None)
+    ]
+    assert [i["title"] for i in events[2]["results"]] == ["cached", "light"]
+    assert [i["title"] for i in events[4]["results"]] == ["cached", "light", "full"]
+    assert events[3]["optimized_query"] == "women's linen dress"
+    assert events[-1]["total_results"] == 3
+    assert refunds == []
+
+
+def test_stream_reports_errors_and_refunds(monkeypatch, refunds):
+    def failing(q, n):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(fashion_search, "get_google_shopping_light_results", lambda q, n: [])
+    monkeypatch.setattr(fashion_search, "get_shopping_results_from_serpapi", failing)
+
+    events = stream("uncached query")
+
+    assert [e["type"] for e in events] == ["start", "query", "error"]
+    assert "provider down" in events[-1]["detail"]
+    assert len(refunds) == 1
+
+
+def test_client_disconnect_refunds_the_search(monkeypatch, refunds):
+    monkeypatch.setattr(fashion_search, "get_google_shopping_light_results", lambda q, n: [item("light")])
+
+    async def disconnect_after_light_results():
+        response = await fashion_search.fashion_search_stream(query="wool coat", num_results=10, user_id="stream@example.com")
+        body = response.body_iterator
+        assert json.loads(await body.__anext__())["type"] == "start"
+        assert json.loads(await body.__anext__())["stage"] == "light"
+        await body.aclose()
+
+    asyncio.run(disconnect_after_light_results())
+    assert len(refunds) == 1
+
+
+class YieldingCollection:
+    """Async collection whose every call suspends once, like a real driver round trip."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return await method(*args, **kwargs)
+        return call
+
+
+def test_cancelled_stream_still_refunds_in_mongo(monkeypatch):
+    mock_db = mongomock.MongoClient()["stream_db"]
+    repo.use_database(MongomockAsyncDatabase(mock_db))
+    monkeypatch.setattr(repo, "users_collection", YieldingCollection(repo.users_collection))
+    mock_db["users"].insert_one({"email": "cancel@example.com", "subscription_status": "free"})
+
+    async def fake_optimize(query, user_id=None):
+        return query
+
+    monkeypatch.setattr(fashion_search, "generate_optimized_search_query", fake_optimize)
+    monkeypatch.setattr(fashion_search, "get_google_shopping_light_results", lambda q, n: time.sleep(0.5) or [])
+
+    async def cancel_mid_stream():
+        response = await fashion_search.fashion_search_stream(query="cancelled coat", num_results=10, user_id="cancel@example.com")
+        started = anyio.Event()
+
+        async def consume():
+            async for _ in response.body_iterator:
+                started.set()
+
+        # Starlette cancels the response's task group when the client goes away
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(consume)
+            await started.wait()
+            tg.cancel_scope.cancel()
+
+    asyncio.run(cancel_mid_stream())
+    usage = mock_db["users"].find_one({"email": "cancel@example.com"})["quota_usage"]["fashion_search"]
+    assert list(usage.values()) == [0]
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+
+from app.config.settings import settings
+from app.repository import MongomockAsyncDatabase, repo
+from app.services import for_you_service
+from app.services.for_you_service import get_for_you_recommendations, refresh_for_you_recommendations
+from app.services.user_context_service import invalidate_style_context
+
+mock_db = mongomock.MongoClient()["test_db"]
+
+USER_ID = "foryou@example.com"
+
+
+@pytest.fixture(autouse=True)
+def mongomock_repository(monkeypatch):
+    repo.use_database(MongomockAsyncDatabase(mock_db))
+    calls = []
+
+    async def fake_generate(context, recent_interactions):
+        calls.append(len(recent_interactions))
+        return [{"item_type": "coat", "description": f"Pick #{len(calls)}"}]
+
+    monkeypatch.setattr(for_you_service, "generate_recommendations", fake_generate)
+    return calls
+
+
+def set_preferences(*categories):
+    mock_db["style_profiles"].update_one(
+        {"user_id": USER_ID},
+        {"$set": {"style_summary": "Clean lines", "style_preferences": [
+            {"category": c, "confidence_score": 0.9 - i * 0.1} for i, c in enumerate(categories)
+        ]}},
+        upsert=True
+    )
+    invalidate_style_context(USER_ID)
+
+
+def test_stored_copy_is_served_and_regenerated_only_when_stale(mongomock_repository):
+    calls = mongomock_repository
+    set_preferences("minimalist", "preppy")
+
+    first = asyncio.run(get_for_you_recommendations(USER_ID))
+    assert first["recommendations"][0]["description"] == "Pick #1"
+    assert first["stale"] is False
+    assert isinstance(first["generated_at"], datetime)
+    assert asyncio.run(get_for_you_recommendations(USER_ID))["generated_at"] == first["generated_at"]
+
+    # Confidence nudges keep the same top categories, so nothing is regenerated
+    mock_db["style_profiles"].update_one({"user_id": USER_ID}, {"$set": {"style_preferences.0.confidence_score": 0.95}})
+    invalidate_style_context(USER_ID)
+    asyncio.run(refresh_for_you_recommendations(USER_ID))
+    assert len(calls) == 1
+
+    # A new top category does
+    set_preferences("streetwear", "minimalist")
+    asyncio.run(refresh_for_you_recommendations(USER_ID))
+    assert len(calls) == 2
+
+    # So do enough new interactions
+    generated_at = mock_db["for_you_recommendations"].find_one({"user_id": USER_ID})["generated_at"]
+    mock_db["user_interactions"].insert_many([
+        {"user_id": USER_ID, "interaction_type": "like", "created_at": generated_at + timedelta(seconds=i + 1)}
+        for i in range(settings.FOR_YOU_REFRESH_INTERACTIONS)
+    ])
+    asyncio.run(refresh_for_you_recommendations(USER_ID))
+    assert len(calls) == 3
+    assert asyncio.run(get_for_you_recommendations(USER_ID))["recommendations"][0]["description"] == "Pick #3"
@@ -0,0 +1,60 @@
+import mongomock
+from pymongo.errors import OperationFailure
+
+from app import indexes
+from app.indexes import INDEXES, IndexSpec, apply_indexes
+
+
+def test_registry_reports_created_mismatched_and_unmanaged_indexes():
+    db = mongomock.MongoClient()["test_db"]
+    # As left behind by the old import-time create_index calls
+    db["analysis_jobs"].create_index([("created_at", 1)])
+    db["user_interactions"].create_index([("user_id", 1)])
+    db["users"].create_index([("username", 1)])
+
+    report = {(e["collection"], e["index"]): e["action"] for e in apply_indexes(db)}
+    assert report[("users", "email_1")] == "created"
+    assert report[("user_interactions", "user_id_1")] == "unmanaged"
+    # The job TTL is opt-in, so existing job history is left alone
+    assert report[("analysis_jobs", "created_at_1")] == "unchanged"
+    assert "expireAfterSeconds" not in db["analysis_jobs"].index_information()["created_at_1"]
+    # Not unique yet; startup never drops an index to fix that
+    assert report[("users", "username_1")] == "mismatched"
+    assert "unique" not in db["users"].index_information()["username_1"]
+
+    rebuilt = {(e["collection"], e["index"]): e["action"] for e in apply_indexes(db, rebuild=True)}
+    assert rebuilt[("users", "username_1")] == "rebuilt"
+    assert db["users"].index_information()["username_1"]["unique"] is True
+
+    again = apply_indexes(db)
+    assert {e["action"] for e in again} == {"unchanged", "unmanaged"}
+    assert sum(e["action"] == "unchanged" for e in again) == sum(len(specs) for specs in INDEXES.values())
+
+
+def test_ttl_changes_use_collmod_and_failures_are_reported(monkeypatch):
+    db = mongomock.MongoClient()["ttl_db"]
+    db["analysis_jobs"].create_index([("created_at", 1)])
+    db["sessions"].create_index([("created_at", 1)])
+    commands = []
+
+    def command(name, collection_name, **kwargs):
+        if collection_name == "sessions":
+            raise OperationFailure("not authorized on ttl_db to execute command collMod", code=13)
+        commands.append((name, collection_name, kwargs))
+        return {"ok": 1}
+
+    db.command = command
+    monkeypatch.setattr(indexes, "INDEXES", {
+        "sessions": [IndexSpec([("created_at", 1)], expire_after_seconds=60)],
+        "analysis_jobs": [IndexSpec([("created_at", 1)], expire_after_seconds=3600), IndexSpec([("job_id", 1)], unique=True)],
+    })
+
+    report = {(e["collection"], e["index"]): e for e in apply_indexes(db)}
+    assert report[("sessions", "created_at_1")]["action"] == "failed"
+    assert "not authorized" in report[("sessions", "created_at_1")]["error"]
+    # One failure does not stop the rest of the registry
+    assert report[("analysis_jobs", "created_at_1")]["action"] == "updated"
+    assert report[("analysis_jobs", "job_id_1")]["action"] == "created"
+    assert commands == [("collMod", "analysis_jobs", {"index": {"name": "created_at_1", "expireAfterSeconds": 3600}})]
+    # Modified in place, never dropped
+    assert "created_at_1" in db["analysis_jobs"].index_information()
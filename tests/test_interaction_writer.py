@@ -0,0 +1,77 @@
+import asyncio
+
+import mongomock
+import pytest
+from bson.errors import InvalidDocument
+from pymongo.errors import ServerSelectionTimeoutError
+
+from app.repository import MongomockAsyncDatabase, repo
+from app.services.interaction_writer import InteractionWriter
+
+mock_db = mongomock.MongoClient()["test_db"]
+
+
+@pytest.fixture(autouse=True)
+def mongomock_repository():
+    repo.use_database(MongomockAsyncDatabase(mock_db))
+
+
+def test_batches_are_flushed_on_size_and_visible_while_pending(tmp_path):
+    writer = InteractionWriter(batch_size=3, flush_interval=60, spill_dir=str(tmp_path))
+
+    async def scenario():
+        writer.add({"user_id": "writer@example.com", "interaction_type": "like"})
+        writer.add({"user_id": "other@example.com", "interaction_type": "view"})
+        assert [e["interaction_type"] for e in writer.pending("writer@example.com")] == ["like"]
+        assert mock_db["user_interactions"].count_documents({}) == 0
+
+        writer.add({"user_id": "writer@example.com", "interaction_type": "save"})
+        await writer._flush_task
+        assert writer.pending("writer@example.com") == []
+
+    asyncio.run(scenario())
+    assert mock_db["user_interactions"].count_documents({"user_id": "writer@example.com"}) == 2
+
+
+def test_failed_flush_spills_to_disk_and_is_replayed(tmp_path, monkeypatch):
+    writer = InteractionWriter(batch_size=10, flush_interval=60, spill_dir=str(tmp_path))
+    collection = repo.user_interactions_collection
+
+    async def unavailable(*args, **kwargs):
+        raise ServerSelectionTimeoutError("no servers")
+
+    async def scenario():
+        writer.add({"user_id": "spill@example.com", "interaction_type": "like"})
+        monkeypatch.setattr(collection, "insert_many", unavailable)
+        assert await writer.flush() == 0
+        assert len(list(tmp_path.iterdir())) == 1
+
+        monkeypatch.undo()
+        writer.add({"user_id": "spill@example.com", "interaction_type": "view"})
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert mock_db["user_interactions"].count_documents({"user_id": "spill@example.com"}) == 2
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("error", [InvalidDocument("cannot encode object"), asyncio.CancelledError()])
+def test_non_mongo_errors_and_cancellation_spill_the_batch(tmp_path, monkeypatch, error):
+    writer = InteractionWriter(batch_size=10, flush_interval=60, spill_dir=str(tmp_path))
+
+    async def failing(*args, **kwargs):
+        raise error
+
+    async def scenario():
+        writer.add({"user_id": "cancel@example.com", "interaction_type": "like"})
+        monkeypatch.setattr(repo.user_interactions_collection, "insert_many", failing)
+        if isinstance(error, asyncio.CancelledError):
+            with pytest.raises(asyncio.CancelledError):
+                await writer.flush()
+        else:
+            assert await writer.flush() == 0
+
+    asyncio.run(scenario())
+    assert writer.pending("cancel@example.com") == []
+    spilled = list(tmp_path.iterdir())
+    assert len(spilled) == 1 and "cancel@example.com" in spilled[0].read_text()
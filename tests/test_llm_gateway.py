@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+import openai
+
+import app.services.llm_gateway as llm_gateway
+from app.services.metrics_service import metrics
+
+
+class Usage:
+    prompt_tokens = 12
+    completion_tokens = 3
+
+
+class Response:
+    usage = Usage()
+
+
+def test_transient_errors_are_retried_and_tokens_recorded(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "backoff_delay", lambda attempt: 0)
+    attempts = []
+
+    async def flaky_call():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+        return Response()
+
+    response = asyncio.run(llm_gateway._acall("test.retry", "gpt-test", flaky_call))
+
+    assert isinstance(response, Response)
+    assert len(attempts) == 2
+    assert metrics.get_counter("llm_retries_total", call_site="test.retry", model="gpt-test") == 1
+    assert metrics.get_counter("llm_tokens_total", call_site="test.retry", model="gpt-test", kind="prompt") == 12
+
+
+def test_concurrency_limits_work_across_event_loops(monkeypatch):
+    monkeypatch.setattr(llm_gateway.settings, "LLM_MAX_CONCURRENCY_PER_CALL_SITE", 1)
+
+    async def slow_call():
+        await asyncio.sleep(0.01)
+        return Response()
+
+    async def contended():
+        # The second call waits on the semaphore, which binds it to the running loop
+        return await asyncio.gather(*(llm_gateway._acall("test.loops", "gpt-test", slow_call) for _ in range(2)))
+
+    for _ in range(2):
+        assert len(asyncio.run(contended())) == 2
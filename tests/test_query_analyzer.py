@@ -0,0 +1,18 @@
+from app.services.query_analyzer import analyze_query, build_fallback_query, normalize_query
+
+
+def test_concise_shopping_queries_are_well_formed():
+    assert analyze_query("black leather boots men")["is_well_formed"]
+    assert analyze_query("vintage denim jacket")["is_well_formed"]
+    assert normalize_query("Mens white T shirt") == "men's white t-shirt"
+
+
+def test_conversational_queries_need_rewrite():
+    assert not analyze_query("I want a summer dress")["is_well_formed"]
+    assert not analyze_query("something cozy for winter")["is_well_formed"]
+    assert not analyze_query("jeans")["is_well_formed"]
+
+
+def test_fallback_query_keeps_recognised_terms():
+    assert build_fallback_query("Show me streetwear hoodies") == "streetwear hoodies"
+    assert build_fallback_query("cute outfit for a date") == "cute outfit for a date"
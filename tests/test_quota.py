@@ -0,0 +1,38 @@
+import asyncio
+
+import mongomock
+import pytest
+
+from app.repository import MongomockAsyncDatabase, repo
+from app.services.quota_service import get_quota_status, release_quota, reserve_quota
+
+mock_db = mongomock.MongoClient()["test_db"]
+
+
+@pytest.fixture(autouse=True)
+def mongomock_repository():
+    repo.use_database(MongomockAsyncDatabase(mock_db))
+
+
+def test_reserve_until_limit_then_refund():
+    mock_db["users"].insert_one({"email": "quota@example.com", "subscription_status": "free"})
+
+    for expected_used in (1, 2, 3):
+        reservation = asyncio.run(reserve_quota("quota@example.com", "fashion_search"))
+        assert reservation["allowed"]
+        assert reservation["used"] == expected_used
+
+    rejected = asyncio.run(reserve_quota("quota@example.com", "fashion_search"))
+    assert not rejected["allowed"]
+    assert rejected["remaining"] == 0
+
+    asyncio.run(release_quota("quota@example.com", "fashion_search", rejected["week"]))
+    assert asyncio.run(get_quota_status("quota@example.com", "fashion_search"))["remaining"] == 1
+
+
+def test_premium_users_are_never_rejected():
+    mock_db["users"].insert_one({"email": "premium@example.com", "subscription_status": "premium"})
+
+    for _ in range(5):
+        assert asyncio.run(reserve_quota("premium@example.com", "uploads"))["allowed"]
+    assert asyncio.run(get_quota_status("premium@example.com", "uploads"))["limit"] == -1
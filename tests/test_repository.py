@@ -0,0 +1,26 @@
+import asyncio
+
+import mongomock
+
+from app.repository import MongomockAsyncDatabase, Repository
+
+
+def test_mongomock_backend_mirrors_the_async_api():
+    repo = Repository(MongomockAsyncDatabase(mongomock.MongoClient()["test_db"]))
+
+    async def scenario():
+        await repo.wishlist_collection.insert_many([
+            {"user_id": "repo@example.com", "title": f"item {i}", "likes": i} for i in range(5)
+        ])
+        top = await repo.wishlist_collection.find({"user_id": "repo@example.com"}).sort("likes", -1).skip(1).limit(2).to_list(2)
+        titles = [item["title"] async for item in repo.wishlist_collection.find({"likes": {"$lt": 2}})]
+        cursor = await repo.wishlist_collection.aggregate([{"$group": {"_id": None, "likes": {"$sum": "$likes"}}}])
+        totals = await cursor.to_list(None)
+        deleted = await repo.wishlist_collection.delete_many({"likes": {"$gte": 3}})
+        return top, titles, totals, deleted.deleted_count
+
+    top, titles, totals, deleted = asyncio.run(scenario())
+    assert [item["title"] for item in top] == ["item 3", "item 2"]
+    assert sorted(titles) == ["item 0", "item 1"]
+    assert totals[0]["likes"] == 10
+    assert deleted == 2
@@ -0,0 +1,107 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.config.settings import settings
+from app.routes import metrics as metrics_route
+from app.services import resilience_service, search_service
+from app.services.resilience_service import (
+    CircuitState,
+    Provider,
+    ProviderTimeoutError,
+    ProviderUnavailableError,
+    serpapi_client,
+    serpapi_provider,
+)
+
+
+def test_circuit_opens_after_repeated_timeouts_and_recovers():
+    provider = Provider("test", timeout_seconds=0.05, failure_threshold=2, recovery_seconds=0.1)
+
+    for _ in range(2):
+        with pytest.raises(ProviderTimeoutError):
+            provider.call(time.sleep, 0.5)
+    assert provider.breaker.state == CircuitState.OPEN
+
+    with pytest.raises(ProviderUnavailableError):
+        provider.call(lambda: "fast")
+
+    time.sleep(0.15)
+    assert provider.call(lambda: "fast") == "fast"
+    assert provider.breaker.state == CircuitState.CLOSED
+
+
+def test_hedged_request_wins_when_original_is_slow():
+    provider = Provider("hedged", timeout_seconds=2, hedge=True, hedge_min_samples=3)
+    for _ in range(3):
+        provider.call(time.sleep, 0.01)
+
+    calls = []
+
+    def slow_first_call():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(1)
+        return len(calls)
+
+    started = time.monotonic()
+    assert provider.call(slow_first_call) == 2
+    assert time.monotonic() - started < 0.5
+
+
+def test_open_circuit_reaches_the_caller_instead_of_a_placeholder(monkeypatch):
+    provider = Provider("serpapi-test", timeout_seconds=1, failure_threshold=1, recovery_seconds=60)
+    provider.breaker.record_failure()
+    monkeypatch.setattr(search_service, "serpapi_provider", provider)
+
+    with pytest.raises(ProviderUnavailableError):
+        search_service.get_shopping_results_from_serpapi("circuit open query")
+    with pytest.raises(ProviderUnavailableError):
+        search_service.get_google_shopping_light_results("circuit open query")
+
+
+def test_metrics_require_the_operator_token(monkeypatch):
+    app = FastAPI()
+    app.include_router(metrics_route.router, prefix="/api/metrics")
+    client = TestClient(app)
+
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    assert client.get("/api/metrics/").status_code == 404
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "s3cret")
+    assert client.get("/api/metrics/").status_code == 403
+    assert client.get("/api/metrics/", headers={"X-Metrics-Token": "wrong"}).status_code == 403
+    res = client.get("/api/metrics/", headers={"X-Metrics-Token": "s3cret"})
+    assert res.status_code == 200
+    assert "providers" in res.json()
+
+
+def test_deadline_starts_when_a_worker_picks_the_call_up(monkeypatch):
+    monkeypatch.setattr(resilience_service, "_executor", ThreadPoolExecutor(max_workers=1))
+    provider = Provider("queued", timeout_seconds=0.3)
+    busy = threading.Thread(target=provider.call, args=(time.sleep, 0.2))
+    busy.start()
+    time.sleep(0.02)
+
+    # Queued ~0.18s behind the busy worker, then runs 0.15s: over 0.3s in total but within its own deadline
+    assert provider.call(lambda: time.sleep(0.15) or "done") == "done"
+    busy.join()
+
+
+def test_call_that_never_gets_a_worker_does_not_trip_the_breaker(monkeypatch):
+    monkeypatch.setattr(resilience_service, "_executor", ThreadPoolExecutor(max_workers=1))
+    provider = Provider("saturated", timeout_seconds=0.1, failure_threshold=1)
+    release = threading.Event()
+    resilience_service._executor.submit(release.wait)
+
+    with pytest.raises(ProviderTimeoutError, match="free worker"):
+        provider.call(lambda: "never runs")
+    release.set()
+    assert provider.breaker.state == CircuitState.CLOSED
+
+
+def test_serpapi_http_request_is_bounded_by_the_deadline():
+    assert serpapi_client({"q": "linen shirt"}).timeout == serpapi_provider.timeout_seconds
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+import mongomock
+import pytest
+
+from app.repository import MongomockAsyncDatabase, repo
+from app.services import search_query_service, search_service
+from app.services.search_query_service import get_search_queries, refresh_search_queries, warm_shopping_results
+from app.services.search_service import shopping_results_cache
+
+mock_db = mongomock.MongoClient()["test_db"]
+
+USER_ID = "discover@example.com"
+
+
+@pytest.fixture(autouse=True)
+def mongomock_repository():
+    repo.use_database(MongomockAsyncDatabase(mock_db))
+
+
+def test_queries_are_stored_per_profile_version(monkeypatch):
+    generated = []
+    warmed = []
+
+    async def fake_generate(context):
+        generated.append(context.fingerprint)
+        return [f"women's {context.style_summary.lower()} #{len(generated)}"]
+
+    monkeypatch.setattr(search_query_service, "generate_search_queries", fake_generate)
+    monkeypatch.setattr(search_query_service, "schedule_shopping_warm", lambda user_id, queries: warmed.append(queries))
+    mock_db["style_profiles"].insert_one({"user_id": USER_ID, "style_summary": "Minimalist", "style_preferences": []})
+
+    first = asyncio.run(get_search_queries(USER_ID))
+    assert asyncio.run(get_search_queries(USER_ID)) == first
+    assert len(generated) == 1
+    assert warmed == [first, first]
+
+    # A new profile version gets a new set
+    mock_db["style_profiles"].update_one({"user_id": USER_ID}, {"$set": {"style_summary": "Bohemian"}})
+    search_query_service.invalidate_style_context(USER_ID)
+    assert asyncio.run(get_search_queries(USER_ID)) == ["women's bohemian #2"]
+
+
+def test_warmer_fetches_only_cold_queries(monkeypatch):
+    fetched = []
+
+    def fake_shopping(query, num_results):
+        fetched.append(query)
+        shopping_results_cache.set(("google_shopping", query, num_results), [{"title": query}])
+        return [{"title": query}]
+
+    monkeypatch.setattr(search_query_service, "get_shopping_results_from_serpapi", fake_shopping)
+    mock_db["users"].insert_one({"email": "premium@example.com", "subscription_status": "premium"})
+    shopping_results_cache.set(("google_shopping", "warm query", 10), [{"title": "cached"}])
+
+    queries = ["Warm query", "cold a", "cold b", "cold a"]
+    assert asyncio.run(warm_shopping_results("premium@example.com", queries)) == 2
+    assert sorted(fetched) == ["cold a", "cold b"]
+    assert asyncio.run(warm_shopping_results("premium@example.com", queries)) == 0
+    # Basic users cannot load shopping results, so nothing is fetched for them
+    assert asyncio.run(warm_shopping_results("basic@example.com", ["cold c"])) == 0
+
+
+def test_profile_change_regenerates_and_warms_stored_queries(monkeypatch):
+    warmed = []
+
+    async def fake_generate(context):
+        return [f"women's {context.style_summary.lower()}"]
+
+    async def fake_warm(user_id, queries):
+        warmed.append(queries)
+        return len(queries)
+
+    monkeypatch.setattr(search_query_service, "generate_search_queries", fake_generate)
+    monkeypatch.setattr(search_query_service, "warm_shopping_results", fake_warm)
+    mock_db["style_profiles"].insert_many([
+        {"user_id": "refresh@example.com", "style_summary": "Preppy", "style_preferences": [],
+         "search_queries": ["women's minimalist"], "search_queries_profile_hash": "old"},
+        {"user_id": "never-browsed@example.com", "style_summary": "Preppy", "style_preferences": []},
+    ])
+
+    assert asyncio.run(refresh_search_queries("refresh@example.com")) == ["women's preppy"]
+    assert warmed == [["women's preppy"]]
+    assert mock_db["style_profiles"].find_one({"user_id": "refresh@example.com"})["search_queries"] == ["women's preppy"]
+    # Users who never loaded the discovery page are not charged a generation or a warm
+    assert asyncio.run(refresh_search_queries("never-browsed@example.com")) is None
+    assert len(warmed) == 1
+
+
+def test_concurrent_shopping_lookups_share_one_serpapi_call(monkeypatch):
+    calls = []
+
+    class SlowProvider:
+        def call(self, fn):
+            calls.append(fn)
+            time.sleep(0.2)
+            return {"shopping_results": [{"title": "Linen shirt", "link": "https://shop.example/linen"}]}
+
+    monkeypatch.setattr(search_service, "serpapi_provider", SlowProvider())
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(search_service.get_shopping_results_from_serpapi("Men's linen shirt", 7)))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [[item["title"] for item in r] for r in results] == [["Linen shirt"]] * 3
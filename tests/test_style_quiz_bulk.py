@@ -0,0 +1,108 @@
+import mongomock
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth.dependencies import get_current_user_id
+from app.repository import MongomockAsyncDatabase, repo
+from app.routers import style_quiz
+
+mock_db = mongomock.MongoClient()["test_db"]
+
+
+@pytest.fixture(autouse=True)
+def mongomock_repository():
+    repo.use_database(MongomockAsyncDatabase(mock_db))
+
+
+app = FastAPI()
+app.include_router(style_quiz.router, prefix="/api/style")
+app.dependency_overrides[get_current_user_id] = lambda: "bulk@example.com"
+client = TestClient(app)
+
+
+def test_invalid_answers_are_rejected_before_writing():
+    mock_db["style_quizzes"].insert_one({"user_id": "bulk@example.com", "responses": [], "completed": False})
+
+    res = client.post("/api/style/quiz/submit-responses", json={"responses": [
+        {"question_id": "primary_style", "response": ["Minimalist", "Streetwear", "Bohemian", "Preppy / Classic"]},
+        {"question_id": "gender", "response": "Robot"},
+        {"question_id": "not_a_question", "response": "x"},
+    ]})
+    assert res.status_code == 400
+    assert set(res.json()["detail"]["errors"]) == {"primary_style", "gender", "not_a_question"}
+    assert mock_db["style_quizzes"].find_one({"user_id": "bulk@example.com"})["responses"] == []
+
+
+PATTERN_OPTIONS = [
+    "All-over bold prints (florals, geometrics)",
+    "Subtle textures (pinstripes, tweed)",
+    "Graphic logos & slogans",
+    "Color-blocking",
+    "I prefer solids only",
+]
+
+
+@pytest.mark.parametrize("question_id, response, error", [
+    # pattern_prints has no max_selections, so the limit is its number of options
+    ("pattern_prints", PATTERN_OPTIONS + ["Plaid"], "Select at most 5 options"),
+    ("primary_style", ["Minimalist", "Minimalist"], "Duplicate options"),
+    ("primary_style", [], "Select at least one option"),
+])
+def test_multi_select_answers_are_validated(question_id, response, error):
+    res = client.post("/api/style/quiz/submit-responses", json={"responses": [
+        {"question_id": question_id, "response": response},
+    ]})
+    assert res.status_code == 400
+    assert res.json()["detail"]["errors"] == {question_id: error}
+
+
+def test_answers_and_completion_in_one_request(monkeypatch):
+    monkeypatch.setattr(style_quiz, "spawn", lambda coro, name: coro.close())
+    client.post("/api/style/quiz/submit-responses", json={"responses": [
+        {"question_id": "primary_style", "response": ["Streetwear"]},
+    ]})
+
+    res = client.post("/api/style/quiz/submit-responses", json={"complete": True, "responses": [
+        {"question_id": "primary_style", "response": ["Minimalist"]},
+        {"question_id": "color_palette", "response": ["Neutrals (black, white, gray, beige)"]},
+        {"question_id": "favorite_outfit", "response": "A grey suit"},
+    ]})
+    assert res.status_code == 200
+    body = res.json()
+    assert body["completed"] is True
+    assert body["style_profile"]["style_preferences"][0]["category"] == "minimalist"
+
+    quiz = mock_db["style_quizzes"].find_one({"user_id": "bulk@example.com"})
+    assert quiz["completed"] is True
+    assert [r["question_id"] for r in quiz["responses"]] == ["primary_style", "color_palette", "favorite_outfit"]
+    assert quiz["responses"][0]["response"] == ["Minimalist"]
+    assert mock_db["style_profiles"].count_documents({"user_id": "bulk@example.com"}) == 1
+
+
+def test_bulk_submit_keeps_an_answer_that_lands_concurrently(monkeypatch):
+    user_id = "bulk@example.com"
+    mock_db["style_quizzes"].delete_many({"user_id": user_id})
+    mock_db["style_quizzes"].insert_one({"user_id": user_id, "responses": [], "responses_version": 0, "completed": False})
+    quizzes = repo.style_quizzes_collection
+    find_one = quizzes.find_one
+    reads = []
+
+    async def find_one_then_answer(*args, **kwargs):
+        quiz = await find_one(*args, **kwargs)
+        if not reads:
+            # A single-answer submission lands between the bulk read and its write
+            client.post("/api/style/quiz/submit-response", json={"question_id": "gender", "response": "Female"})
+        reads.append(quiz)
+        return quiz
+
+    monkeypatch.setattr(quizzes, "find_one", find_one_then_answer, raising=False)
+    res = client.post("/api/style/quiz/submit-responses", json={"responses": [
+        {"question_id": "primary_style", "response": ["Minimalist"]},
+    ]})
+    assert res.status_code == 200
+    assert len(reads) == 2
+
+    quiz = mock_db["style_quizzes"].find_one({"user_id": user_id})
+    assert [r["question_id"] for r in quiz["responses"]] == ["gender", "primary_style"]
+    assert quiz["responses_version"] == 2
@@ -0,0 +1,29 @@
+from app.data.style_quiz_questions import STYLE_QUIZ_QUESTIONS
+from app.data.style_quiz_weights import QUIZ_STYLE_WEIGHTS, STYLE_CATEGORIES
+from app.services.style_scorer import local_style_summary, score_style_preferences
+
+
+def test_weight_tables_match_the_quiz():
+    options = {q["id"]: set(q.get("options", [])) for q in STYLE_QUIZ_QUESTIONS}
+    for question_id, table in QUIZ_STYLE_WEIGHTS.items():
+        assert set(table) <= options[question_id], question_id
+        for weights in table.values():
+            assert set(weights) <= set(STYLE_CATEGORIES)
+
+
+def test_structured_answers_produce_ranked_preferences():
+    responses = [
+        {"question_id": "primary_style", "response": ["Minimalist", "Streetwear"]},
+        {"question_id": "color_palette", "response": ["Neutrals (black, white, gray, beige)"]},
+        {"question_id": "pattern_prints", "response": ["I prefer solids only"]},
+        {"question_id": "favorite_outfit", "response": "Black jeans and a white tee"},
+    ]
+
+    preferences = score_style_preferences(responses)
+    assert preferences[0] == {"category": "minimalist", "confidence_score": 0.85}
+    assert preferences[1]["category"] == "streetwear"
+    assert all(0.2 <= p["confidence_score"] <= 1 for p in preferences)
+    assert score_style_preferences(responses) == preferences
+
+    summary = local_style_summary(responses, preferences)
+    assert summary.startswith("You gravitate toward minimalist and streetwear styles, favoring neutrals")
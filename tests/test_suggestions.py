@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime
+
+import mongomock
+import pytest
+
+from app.repository import MongomockAsyncDatabase, repo
+from app.services import chatbot_service, suggestion_service
+from app.services.chatbot_service import StyleChatbot
+from app.services.suggestion_service import refresh_search_suggestions
+from app.services.user_context_service import invalidate_style_context, profile_fingerprint
+
+mock_db = mongomock.MongoClient()["test_db"]
+
+
+@pytest.fixture(autouse=True)
+def mongomock_repository():
+    repo.use_database(MongomockAsyncDatabase(mock_db))
+
+
+@pytest.fixture
+def generated(monkeypatch):
+    calls = []
+
+    async def fake_generate(context):
+        calls.append(context.user_id)
+        return ["wide leg trousers"]
+
+    monkeypatch.setattr(suggestion_service, "generate_search_suggestions", fake_generate)
+    return calls
+
+
+def test_current_suggestions_are_not_regenerated(generated):
+    profile = {"user_id": "current@example.com", "style_summary": "Tailored", "style_preferences": []}
+    mock_db["style_profiles"].insert_one({
+        **profile,
+        "search_suggestions": ["pleated trousers"],
+        "search_suggestions_profile_hash": profile_fingerprint(profile),
+        "search_suggestions_updated_at": datetime.utcnow(),
+    })
+
+    assert asyncio.run(refresh_search_suggestions("current@example.com")) == ["pleated trousers"]
+    assert generated == []
+
+    mock_db["style_profiles"].update_one({"user_id": "current@example.com"}, {"$set": {"style_summary": "Relaxed"}})
+    invalidate_style_context("current@example.com")
+    assert asyncio.run(refresh_search_suggestions("current@example.com")) == ["wide leg trousers"]
+    assert generated == ["current@example.com"]
+
+
+def test_chat_turns_only_notify_when_preferences_change(monkeypatch):
+    notified = []
+
+    async def fake_notify(user_id):
+        notified.append(user_id)
+
+    monkeypatch.setattr(chatbot_service, "notify_style_profile_changed", fake_notify)
+    mock_db["style_profiles"].insert_one({"user_id": "chatty@example.com", "style_summary": "Sporty", "style_preferences": []})
+    bot = StyleChatbot()
+
+    asyncio.run(bot._update_style_profile("chatty@example.com", {"mood": "curious"}))
+    assert notified == []
+    asyncio.run(bot._update_style_profile("chatty@example.com", {"new_preferences": [{"category": "athleisure"}]}))
+    assert notified == ["chatty@example.com"]
+    assert mock_db["style_profiles"].find_one({"user_id": "chatty@example.com"})["chat_insights"] == {"new_preferences": [{"category": "athleisure"}]}
@@ -0,0 +1,46 @@
+import asyncio
+
+import mongomock
+import pytest
+
+from app.repository import MongomockAsyncDatabase, repo
+from app.services.user_context_service import get_style_context, invalidate_style_context
+
+mock_db = mongomock.MongoClient()["test_db"]
+
+
+@pytest.fixture(autouse=True)
+def mongomock_repository():
+    repo.use_database(MongomockAsyncDatabase(mock_db))
+
+
+def test_snapshot_is_cached_until_invalidated():
+    mock_db["style_profiles"].insert_one({
+        "user_id": "context@example.com",
+        "style_summary": "Minimalist neutrals",
+        "style_preferences": [{"category": "minimalist", "confidence_score": 0.9}],
+    })
+    mock_db["style_quizzes"].insert_one({
+        "user_id": "context@example.com",
+        "completed": True,
+        "responses": [
+            {"question_id": "gender", "response": "Women"},
+            {"question_id": "color_palette", "response": ["Black", "White"]},
+        ],
+    })
+
+    context = asyncio.run(get_style_context("context@example.com"))
+    assert context.gender == "Women"
+    assert context.color_palette == "Black, White"
+    assert asyncio.run(get_style_context("context@example.com")) is context
+
+    mock_db["style_profiles"].update_one(
+        {"user_id": "context@example.com"},
+        {"$set": {"style_summary": "Streetwear layers"}}
+    )
+    assert asyncio.run(get_style_context("context@example.com")).style_summary == "Minimalist neutrals"
+
+    invalidate_style_context("context@example.com")
+    refreshed = asyncio.run(get_style_context("context@example.com"))
+    assert refreshed.style_summary == "Streetwear layers"
+    assert refreshed.fingerprint != context.fingerprint